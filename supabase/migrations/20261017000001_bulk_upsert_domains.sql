@@ -0,0 +1,47 @@
+-- TikTok Domain Harvester - Bulk Domain Upsert
+-- One round trip per harvest for every domain it found, with mention counts
+-- aggregated by the worker and merged here
+
+-- =============================================================================
+-- BULK DOMAIN UPSERT
+-- =============================================================================
+
+-- Upsert a batch of domains given as a JSON array of
+-- {domain_name, tld, subdomain, first_seen_at, last_seen_at, mention_count}.
+-- Existing rows keep the earliest first_seen_at and latest last_seen_at, and
+-- mention_count is incremented by the batch count. Pass p_count_mentions =>
+-- false when the matching domain_mention rows are inserted as well, since the
+-- mention trigger already counts those.
+CREATE OR REPLACE FUNCTION upsert_domains(
+    p_domains JSONB,
+    p_count_mentions BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE(id UUID, domain_name TEXT) AS $$
+    INSERT INTO domain AS d (domain_name, tld, subdomain, first_seen_at, last_seen_at, mention_count)
+    SELECT
+        e.domain_name,
+        MIN(e.tld),
+        MIN(e.subdomain),
+        MIN(COALESCE(e.first_seen_at, NOW())),
+        MAX(COALESCE(e.last_seen_at, NOW())),
+        CASE WHEN p_count_mentions THEN SUM(COALESCE(e.mention_count, 1)) ELSE 0 END
+    FROM jsonb_to_recordset(p_domains) AS e(
+        domain_name TEXT,
+        tld TEXT,
+        subdomain TEXT,
+        first_seen_at TIMESTAMPTZ,
+        last_seen_at TIMESTAMPTZ,
+        mention_count INTEGER
+    )
+    -- Duplicate names in one batch would make ON CONFLICT touch a row twice
+    GROUP BY e.domain_name
+    ON CONFLICT (domain_name) DO UPDATE SET
+        first_seen_at = LEAST(d.first_seen_at, EXCLUDED.first_seen_at),
+        last_seen_at = GREATEST(d.last_seen_at, EXCLUDED.last_seen_at),
+        mention_count = d.mention_count + EXCLUDED.mention_count
+    RETURNING d.id, d.domain_name;
+$$ LANGUAGE sql;
+
+GRANT EXECUTE ON FUNCTION upsert_domains(JSONB, BOOLEAN) TO service_role;
+
+COMMENT ON FUNCTION upsert_domains(JSONB, BOOLEAN) IS 'Bulk upsert of domains with aggregated mention counts, returns id per domain_name';
@@ -0,0 +1,148 @@
+-- TikTok Domain Harvester - Single Round-Trip Harvest Ingestion
+-- Persists one harvested video (crawl status, comments, domains, mentions)
+-- in a single call and a single transaction
+
+-- =============================================================================
+-- HARVEST INGESTION
+-- =============================================================================
+
+-- p_payload shape:
+-- {
+--   "video":    {"video_id": "<tiktok id>", "username": ..., "comment_count": ..., ...},
+--   "comments": [{"comment_id": ..., "username": ..., "text": ..., "like_count": ...,
+--                 "reply_count": ..., "posted_at": ..., "metadata": {...}}, ...],
+--   "mentions": [{"comment_index": <0-based index into comments>, "domain_name": ...,
+--                 "tld": ..., "subdomain": ..., "mention_text": ...,
+--                 "position_start": ..., "position_end": ..., "context": ...}, ...]
+-- }
+-- The video is matched on its TikTok video_id and created when unknown.
+-- Comment and domain ids are resolved here, so the caller never needs them.
+-- Mention counts are left to the domain_mention trigger.
+CREATE OR REPLACE FUNCTION ingest_harvest(p_payload JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_video JSONB := p_payload->'video';
+    v_video_uuid UUID;
+    v_comment_ids UUID[];
+    v_comment_count INTEGER;
+    v_domain_count INTEGER := 0;
+    v_mention_count INTEGER := 0;
+BEGIN
+    IF v_video IS NULL OR v_video->>'video_id' IS NULL THEN
+        RAISE EXCEPTION 'ingest_harvest: payload.video.video_id is required';
+    END IF;
+
+    -- Video: update crawl status, inserting the video if it is new
+    UPDATE video SET
+        last_crawled_at = NOW(),
+        comment_count = COALESCE((v_video->>'comment_count')::BIGINT, comment_count),
+        view_count = COALESCE((v_video->>'view_count')::BIGINT, view_count),
+        like_count = COALESCE((v_video->>'like_count')::BIGINT, like_count),
+        share_count = COALESCE((v_video->>'share_count')::BIGINT, share_count),
+        caption = COALESCE(v_video->>'caption', caption),
+        metadata = COALESCE(metadata, '{}'::JSONB) || COALESCE(v_video->'metadata', '{}'::JSONB)
+    WHERE video_id = v_video->>'video_id'
+    RETURNING id INTO v_video_uuid;
+
+    IF v_video_uuid IS NULL THEN
+        INSERT INTO video (video_id, username, caption, video_url, thumbnail_url,
+                           view_count, like_count, comment_count, share_count,
+                           posted_at, last_crawled_at, metadata)
+        VALUES (
+            v_video->>'video_id',
+            v_video->>'username',
+            v_video->>'caption',
+            v_video->>'video_url',
+            v_video->>'thumbnail_url',
+            COALESCE((v_video->>'view_count')::BIGINT, 0),
+            COALESCE((v_video->>'like_count')::BIGINT, 0),
+            COALESCE((v_video->>'comment_count')::BIGINT, 0),
+            COALESCE((v_video->>'share_count')::BIGINT, 0),
+            (v_video->>'posted_at')::TIMESTAMPTZ,
+            NOW(),
+            COALESCE(v_video->'metadata', '{}'::JSONB)
+        )
+        RETURNING id INTO v_video_uuid;
+    END IF;
+
+    -- Comments: ids are generated up front so mentions can refer to them by index
+    v_comment_count := COALESCE(jsonb_array_length(p_payload->'comments'), 0);
+    v_comment_ids := ARRAY(SELECT uuid_generate_v4() FROM generate_series(1, v_comment_count));
+
+    INSERT INTO comment (id, video_id, comment_id, username, text, like_count,
+                         reply_count, is_reply, posted_at, metadata)
+    SELECT
+        v_comment_ids[c.ord],
+        v_video_uuid,
+        c.comment_id,
+        c.username,
+        c.text,
+        COALESCE(c.like_count, 0),
+        COALESCE(c.reply_count, 0),
+        COALESCE(c.is_reply, false),
+        c.posted_at,
+        COALESCE(c.metadata, '{}'::JSONB)
+    FROM ROWS FROM (
+        jsonb_to_recordset(COALESCE(p_payload->'comments', '[]'::JSONB)) AS (
+            comment_id TEXT,
+            username TEXT,
+            text TEXT,
+            like_count INTEGER,
+            reply_count INTEGER,
+            is_reply BOOLEAN,
+            posted_at TIMESTAMPTZ,
+            metadata JSONB
+        )
+    ) WITH ORDINALITY AS c(comment_id, username, text, like_count, reply_count,
+                           is_reply, posted_at, metadata, ord);
+
+    -- Domains: upsert every mentioned domain without counting (the trigger counts mentions)
+    IF jsonb_array_length(COALESCE(p_payload->'mentions', '[]'::JSONB)) > 0 THEN
+        SELECT COUNT(*) INTO v_domain_count
+        FROM upsert_domains(
+            (SELECT jsonb_agg(jsonb_build_object(
+                        'domain_name', m->>'domain_name',
+                        'tld', m->>'tld',
+                        'subdomain', m->>'subdomain'))
+             FROM jsonb_array_elements(p_payload->'mentions') AS m
+             WHERE (m->>'comment_index')::INTEGER BETWEEN 0 AND v_comment_count - 1),
+            false
+        );
+
+        INSERT INTO domain_mention (domain_id, comment_id, video_id, mention_text,
+                                    position_start, position_end, context)
+        SELECT
+            d.id,
+            v_comment_ids[m.comment_index + 1],
+            v_video_uuid,
+            COALESCE(m.mention_text, m.domain_name),
+            m.position_start,
+            m.position_end,
+            m.context
+        FROM jsonb_to_recordset(p_payload->'mentions') AS m(
+            comment_index INTEGER,
+            domain_name TEXT,
+            mention_text TEXT,
+            position_start INTEGER,
+            position_end INTEGER,
+            context TEXT
+        )
+        JOIN domain d ON d.domain_name = m.domain_name
+        WHERE m.comment_index BETWEEN 0 AND v_comment_count - 1
+        ON CONFLICT DO NOTHING;
+
+        GET DIAGNOSTICS v_mention_count = ROW_COUNT;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'video_id', v_video_uuid,
+        'comments', v_comment_count,
+        'domains', v_domain_count,
+        'mentions', v_mention_count
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+GRANT EXECUTE ON FUNCTION ingest_harvest(JSONB) TO service_role;
+
+COMMENT ON FUNCTION ingest_harvest(JSONB) IS 'Persist a harvested video with its comments, domains and mentions in one transaction';
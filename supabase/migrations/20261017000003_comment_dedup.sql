@@ -0,0 +1,211 @@
+-- TikTok Domain Harvester - Comment Deduplication
+-- Re-crawling a video fetches the same top comments again. A unique key per
+-- (video, comment) lets inserts skip comments that are already stored with
+-- ON CONFLICT DO NOTHING instead of adding them as new rows.
+
+-- =============================================================================
+-- DEDUP KEY
+-- =============================================================================
+
+-- TikTok comment_id when the scraper provides one, otherwise a hash of the
+-- commenter and text (text alone would merge the same spam posted by
+-- different accounts). The worker computes the same key for its local filter.
+CREATE OR REPLACE FUNCTION comment_dedup_key(p_comment_id TEXT, p_username TEXT, p_text TEXT)
+RETURNS TEXT AS $$
+    SELECT COALESCE(p_comment_id, 'h:' || md5(COALESCE(p_username, '') || E'\n' || COALESCE(p_text, '')))
+$$ LANGUAGE sql IMMUTABLE;
+
+ALTER TABLE comment
+    ADD COLUMN IF NOT EXISTS dedup_key TEXT
+    GENERATED ALWAYS AS (comment_dedup_key(comment_id, username, text)) STORED;
+
+-- =============================================================================
+-- REMOVE EXISTING DUPLICATES
+-- =============================================================================
+
+-- Keep the first stored copy of each comment; replies are re-pointed at it and
+-- the duplicates' mentions are removed with them (the trigger uncounts them)
+WITH duplicate AS (
+    SELECT id, keep_id
+    FROM (
+        SELECT
+            id,
+            FIRST_VALUE(id) OVER w AS keep_id,
+            ROW_NUMBER() OVER w AS copy_number
+        FROM comment
+        WINDOW w AS (PARTITION BY video_id, dedup_key ORDER BY discovered_at, id)
+    ) copies
+    WHERE copy_number > 1
+)
+UPDATE comment c
+SET parent_comment_id = d.keep_id
+FROM duplicate d
+WHERE c.parent_comment_id = d.id;
+
+DELETE FROM comment c
+USING (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY video_id, dedup_key ORDER BY discovered_at, id) AS copy_number
+    FROM comment
+) copies
+WHERE c.id = copies.id
+  AND copies.copy_number > 1;
+
+-- =============================================================================
+-- UNIQUE KEY
+-- =============================================================================
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_comment_video_dedup_key
+  ON comment(video_id, dedup_key);
+
+COMMENT ON COLUMN comment.dedup_key IS 'comment_dedup_key(comment_id, username, text); unique per video';
+
+-- =============================================================================
+-- HARVEST INGESTION
+-- =============================================================================
+
+-- Same payload as before (see 20261017000002_ingest_harvest.sql). Comments that
+-- are already stored for the video are skipped, and mentions in them resolve to
+-- the stored comment, where the domain_mention unique index drops repeats.
+CREATE OR REPLACE FUNCTION ingest_harvest(p_payload JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_video JSONB := p_payload->'video';
+    v_video_uuid UUID;
+    v_comment_ids UUID[];
+    v_comment_count INTEGER;
+    v_inserted_count INTEGER;
+    v_domain_count INTEGER := 0;
+    v_mention_count INTEGER := 0;
+BEGIN
+    IF v_video IS NULL OR v_video->>'video_id' IS NULL THEN
+        RAISE EXCEPTION 'ingest_harvest: payload.video.video_id is required';
+    END IF;
+
+    -- Video: update crawl status, inserting the video if it is new
+    UPDATE video SET
+        last_crawled_at = NOW(),
+        comment_count = COALESCE((v_video->>'comment_count')::BIGINT, comment_count),
+        view_count = COALESCE((v_video->>'view_count')::BIGINT, view_count),
+        like_count = COALESCE((v_video->>'like_count')::BIGINT, like_count),
+        share_count = COALESCE((v_video->>'share_count')::BIGINT, share_count),
+        caption = COALESCE(v_video->>'caption', caption),
+        metadata = COALESCE(metadata, '{}'::JSONB) || COALESCE(v_video->'metadata', '{}'::JSONB)
+    WHERE video_id = v_video->>'video_id'
+    RETURNING id INTO v_video_uuid;
+
+    IF v_video_uuid IS NULL THEN
+        INSERT INTO video (video_id, username, caption, video_url, thumbnail_url,
+                           view_count, like_count, comment_count, share_count,
+                           posted_at, last_crawled_at, metadata)
+        VALUES (
+            v_video->>'video_id',
+            v_video->>'username',
+            v_video->>'caption',
+            v_video->>'video_url',
+            v_video->>'thumbnail_url',
+            COALESCE((v_video->>'view_count')::BIGINT, 0),
+            COALESCE((v_video->>'like_count')::BIGINT, 0),
+            COALESCE((v_video->>'comment_count')::BIGINT, 0),
+            COALESCE((v_video->>'share_count')::BIGINT, 0),
+            (v_video->>'posted_at')::TIMESTAMPTZ,
+            NOW(),
+            COALESCE(v_video->'metadata', '{}'::JSONB)
+        )
+        RETURNING id INTO v_video_uuid;
+    END IF;
+
+    -- Comments: insert the ones not stored yet, then resolve every payload
+    -- comment (new or already stored) to its id so mentions can refer to
+    -- them by index
+    v_comment_count := COALESCE(jsonb_array_length(p_payload->'comments'), 0);
+
+    INSERT INTO comment (video_id, comment_id, username, text, like_count,
+                         reply_count, is_reply, posted_at, metadata)
+    SELECT
+        v_video_uuid,
+        c.comment_id,
+        c.username,
+        c.text,
+        COALESCE(c.like_count, 0),
+        COALESCE(c.reply_count, 0),
+        COALESCE(c.is_reply, false),
+        c.posted_at,
+        COALESCE(c.metadata, '{}'::JSONB)
+    FROM jsonb_to_recordset(COALESCE(p_payload->'comments', '[]'::JSONB)) AS c(
+        comment_id TEXT,
+        username TEXT,
+        text TEXT,
+        like_count INTEGER,
+        reply_count INTEGER,
+        is_reply BOOLEAN,
+        posted_at TIMESTAMPTZ,
+        metadata JSONB
+    )
+    ON CONFLICT (video_id, dedup_key) DO NOTHING;
+
+    GET DIAGNOSTICS v_inserted_count = ROW_COUNT;
+
+    v_comment_ids := ARRAY(
+        SELECT stored.id
+        FROM ROWS FROM (
+            jsonb_to_recordset(COALESCE(p_payload->'comments', '[]'::JSONB)) AS (
+                comment_id TEXT,
+                username TEXT,
+                text TEXT
+            )
+        ) WITH ORDINALITY AS c(comment_id, username, text, ord)
+        LEFT JOIN comment stored
+          ON stored.video_id = v_video_uuid
+         AND stored.dedup_key = comment_dedup_key(c.comment_id, c.username, c.text)
+        ORDER BY c.ord
+    );
+
+    -- Domains: upsert every mentioned domain without counting (the trigger counts mentions)
+    IF jsonb_array_length(COALESCE(p_payload->'mentions', '[]'::JSONB)) > 0 THEN
+        SELECT COUNT(*) INTO v_domain_count
+        FROM upsert_domains(
+            (SELECT jsonb_agg(jsonb_build_object(
+                        'domain_name', m->>'domain_name',
+                        'tld', m->>'tld',
+                        'subdomain', m->>'subdomain'))
+             FROM jsonb_array_elements(p_payload->'mentions') AS m
+             WHERE (m->>'comment_index')::INTEGER BETWEEN 0 AND v_comment_count - 1),
+            false
+        );
+
+        INSERT INTO domain_mention (domain_id, comment_id, video_id, mention_text,
+                                    position_start, position_end, context)
+        SELECT
+            d.id,
+            v_comment_ids[m.comment_index + 1],
+            v_video_uuid,
+            COALESCE(m.mention_text, m.domain_name),
+            m.position_start,
+            m.position_end,
+            m.context
+        FROM jsonb_to_recordset(p_payload->'mentions') AS m(
+            comment_index INTEGER,
+            domain_name TEXT,
+            mention_text TEXT,
+            position_start INTEGER,
+            position_end INTEGER,
+            context TEXT
+        )
+        JOIN domain d ON d.domain_name = m.domain_name
+        WHERE m.comment_index BETWEEN 0 AND v_comment_count - 1
+        ON CONFLICT DO NOTHING;
+
+        GET DIAGNOSTICS v_mention_count = ROW_COUNT;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'video_id', v_video_uuid,
+        'comments', v_inserted_count,
+        'duplicate_comments', v_comment_count - v_inserted_count,
+        'domains', v_domain_count,
+        'mentions', v_mention_count
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION ingest_harvest(JSONB) IS 'Persist a harvested video with its new comments, domains and mentions in one transaction';
@@ -0,0 +1,79 @@
+-- TikTok Domain Harvester - Crawl Candidate Queue
+-- Keyset-paginated candidates for comment crawling: never-crawled videos
+-- first (by id), then videos last crawled before a cutoff, stalest first
+-- (by last_crawled_at, id). Each page is a short range scan of one index.
+
+-- =============================================================================
+-- INDEX
+-- =============================================================================
+
+-- The NULL prefix is ordered by id and the rest by (last_crawled_at, id), so
+-- one partial index serves both phases. On a large live table, create it
+-- CONCURRENTLY outside a transaction instead.
+CREATE INDEX IF NOT EXISTS idx_video_crawl_queue
+  ON video(last_crawled_at ASC NULLS FIRST, id)
+  WHERE is_active = true;
+
+-- =============================================================================
+-- CANDIDATES
+-- =============================================================================
+
+-- Pass the last returned row's (last_crawled_at, id) as the cursor for the next
+-- page; a NULL last_crawled_at continues among never-crawled videos. Only the
+-- columns the harvester needs are returned.
+CREATE OR REPLACE FUNCTION crawl_candidates(
+    p_cutoff TIMESTAMPTZ,
+    p_limit INTEGER DEFAULT 100,
+    p_after_crawled_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    video_id TEXT,
+    username TEXT,
+    video_url TEXT,
+    comment_count BIGINT,
+    last_crawled_at TIMESTAMPTZ
+) AS $$
+DECLARE
+    v_count INTEGER := 0;
+BEGIN
+    IF p_after_crawled_at IS NULL THEN
+        RETURN QUERY
+        SELECT v.id, v.video_id, v.username, v.video_url, v.comment_count, v.last_crawled_at
+        FROM video v
+        WHERE v.is_active = true
+          AND v.last_crawled_at IS NULL
+          AND v.id > COALESCE(p_after_id, '00000000-0000-0000-0000-000000000000'::UUID)
+        ORDER BY v.last_crawled_at ASC NULLS FIRST, v.id
+        LIMIT p_limit;
+
+        GET DIAGNOSTICS v_count = ROW_COUNT;
+        IF v_count >= p_limit THEN
+            RETURN;
+        END IF;
+
+        -- Never-crawled videos exhausted; continue with the stalest crawled ones
+        RETURN QUERY
+        SELECT v.id, v.video_id, v.username, v.video_url, v.comment_count, v.last_crawled_at
+        FROM video v
+        WHERE v.is_active = true
+          AND v.last_crawled_at < p_cutoff
+        ORDER BY v.last_crawled_at ASC NULLS FIRST, v.id
+        LIMIT p_limit - v_count;
+    ELSE
+        RETURN QUERY
+        SELECT v.id, v.video_id, v.username, v.video_url, v.comment_count, v.last_crawled_at
+        FROM video v
+        WHERE v.is_active = true
+          AND v.last_crawled_at < p_cutoff
+          AND (v.last_crawled_at, v.id) > (p_after_crawled_at, p_after_id)
+        ORDER BY v.last_crawled_at ASC NULLS FIRST, v.id
+        LIMIT p_limit;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+GRANT EXECUTE ON FUNCTION crawl_candidates(TIMESTAMPTZ, INTEGER, TIMESTAMPTZ, UUID) TO service_role;
+
+COMMENT ON FUNCTION crawl_candidates(TIMESTAMPTZ, INTEGER, TIMESTAMPTZ, UUID) IS 'Keyset page of videos due for comment crawling, never-crawled first then stalest';
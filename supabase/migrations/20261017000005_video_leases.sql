@@ -0,0 +1,104 @@
+-- TikTok Domain Harvester - Video Claim Leases
+-- Lets several workers take crawl candidates from the same queue without
+-- crawling the same video twice. A claim leases videos to one worker until
+-- lease_expires_at; a crashed worker's videos become claimable again once
+-- the lease runs out.
+
+-- =============================================================================
+-- LEASE COLUMNS
+-- =============================================================================
+
+ALTER TABLE video ADD COLUMN IF NOT EXISTS claimed_by TEXT;
+ALTER TABLE video ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+
+COMMENT ON COLUMN video.claimed_by IS 'WORKER_ID holding the crawl lease';
+COMMENT ON COLUMN video.lease_expires_at IS 'When the crawl lease lapses and the video can be claimed again';
+
+-- =============================================================================
+-- CLAIM / RELEASE / EXTEND
+-- =============================================================================
+
+-- Claim up to p_limit videos due for crawling (never crawled, or last crawled
+-- before p_cutoff), stalest first. Rows locked by a concurrent claim are
+-- skipped rather than waited for, so concurrent workers get disjoint batches.
+CREATE OR REPLACE FUNCTION claim_videos(
+    p_worker_id TEXT,
+    p_limit INTEGER DEFAULT 10,
+    p_lease_seconds INTEGER DEFAULT 600,
+    p_cutoff TIMESTAMPTZ DEFAULT NOW() - INTERVAL '24 hours'
+)
+RETURNS TABLE (
+    id UUID,
+    video_id TEXT,
+    username TEXT,
+    video_url TEXT,
+    comment_count BIGINT,
+    last_crawled_at TIMESTAMPTZ,
+    lease_expires_at TIMESTAMPTZ
+) AS $$
+    WITH claimed AS (
+        UPDATE video v SET
+            claimed_by = p_worker_id,
+            lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+        WHERE v.id IN (
+            SELECT c.id
+            FROM video c
+            WHERE c.is_active = true
+              AND (c.last_crawled_at IS NULL OR c.last_crawled_at < p_cutoff)
+              AND (c.lease_expires_at IS NULL OR c.lease_expires_at <= NOW())
+            ORDER BY c.last_crawled_at ASC NULLS FIRST, c.id
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING v.id, v.video_id, v.username, v.video_url, v.comment_count,
+                  v.last_crawled_at, v.lease_expires_at
+    )
+    -- RETURNING order is unspecified, so sort the claimed rows explicitly
+    SELECT cl.id, cl.video_id, cl.username, cl.video_url, cl.comment_count,
+           cl.last_crawled_at, cl.lease_expires_at
+    FROM claimed cl
+    ORDER BY cl.last_crawled_at ASC NULLS FIRST, cl.id;
+$$ LANGUAGE sql;
+
+-- Give up leases held by p_worker_id. With p_crawled the videos are marked as
+-- crawled now, so they are not due again until the recrawl interval passes.
+CREATE OR REPLACE FUNCTION release_videos(
+    p_worker_id TEXT,
+    p_video_ids UUID[],
+    p_crawled BOOLEAN DEFAULT false
+)
+RETURNS INTEGER AS $$
+    WITH released AS (
+        UPDATE video SET
+            claimed_by = NULL,
+            lease_expires_at = NULL,
+            last_crawled_at = CASE WHEN p_crawled THEN NOW() ELSE last_crawled_at END
+        WHERE id = ANY(p_video_ids)
+          AND claimed_by = p_worker_id
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM released;
+$$ LANGUAGE sql;
+
+-- Push back the lease on videos p_worker_id still holds. Videos another worker
+-- has claimed since the lease lapsed are not returned.
+CREATE OR REPLACE FUNCTION extend_video_leases(
+    p_worker_id TEXT,
+    p_video_ids UUID[],
+    p_lease_seconds INTEGER DEFAULT 600
+)
+RETURNS TABLE (id UUID, lease_expires_at TIMESTAMPTZ) AS $$
+    UPDATE video v SET
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE v.id = ANY(p_video_ids)
+      AND v.claimed_by = p_worker_id
+    RETURNING v.id, v.lease_expires_at;
+$$ LANGUAGE sql;
+
+GRANT EXECUTE ON FUNCTION claim_videos(TEXT, INTEGER, INTEGER, TIMESTAMPTZ) TO service_role;
+GRANT EXECUTE ON FUNCTION release_videos(TEXT, UUID[], BOOLEAN) TO service_role;
+GRANT EXECUTE ON FUNCTION extend_video_leases(TEXT, UUID[], INTEGER) TO service_role;
+
+COMMENT ON FUNCTION claim_videos(TEXT, INTEGER, INTEGER, TIMESTAMPTZ) IS 'Lease up to p_limit crawl candidates to a worker (FOR UPDATE SKIP LOCKED)';
+COMMENT ON FUNCTION release_videos(TEXT, UUID[], BOOLEAN) IS 'Release a worker''s video leases, optionally marking the videos crawled';
+COMMENT ON FUNCTION extend_video_leases(TEXT, UUID[], INTEGER) IS 'Extend the leases a worker still holds';
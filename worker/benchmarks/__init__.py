@@ -0,0 +1,5 @@
+"""
+Reproducible performance benchmarks for the worker
+
+Run from the worker directory, e.g. ``python -m benchmarks.bench_extractor``.
+"""
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+DomainExtractor throughput benchmark.
+
+Runs extraction over each seeded synthetic corpus and reports comments/sec,
+p50/p99 per-comment latency and memory allocation, as human-readable text
+and optionally as JSON for comparing commits.
+
+Usage (from the worker directory):
+    python -m benchmarks.bench_extractor --output bench.json
+    python -m benchmarks.bench_extractor --compare bench.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import structlog
+
+from benchmarks.corpus import GENERATORS, generate_corpus
+from domain_extractor import DomainExtractor
+
+# Default corpus sizes; long comments are large, so fewer of them
+DEFAULT_SIZES = {
+    'clean': 20000,
+    'domain_spam': 20000,
+    'dot_runs': 2000,
+    'emoji': 20000,
+    'long': 200,
+}
+
+
+def percentile(sorted_values: List[int], fraction: float) -> float:
+    """Nearest-rank percentile of pre-sorted values."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return float(sorted_values[index])
+
+
+def bench_corpus(texts: List[str], repeat: int) -> Dict[str, float]:
+    """Time extraction of every text, keeping the best of repeat passes."""
+    extract = DomainExtractor.extract_matches
+    clock = time.perf_counter_ns
+
+    # Warm-up pass so first-call costs aren't measured
+    for text in texts[:100]:
+        extract(text)
+
+    best_total = None
+    best_latencies = None
+    domains_found = 0
+    for _ in range(repeat):
+        latencies = []
+        found = 0
+        started = clock()
+        for text in texts:
+            t0 = clock()
+            found += len(extract(text))
+            latencies.append(clock() - t0)
+        total = clock() - started
+        if best_total is None or total < best_total:
+            best_total, best_latencies, domains_found = total, latencies, found
+
+    best_latencies.sort()
+
+    # Allocation profile in a separate pass; tracemalloc distorts timings
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    blocks_before = sys.getallocatedblocks()
+    for text in texts:
+        extract(text)
+    blocks_after = sys.getallocatedblocks()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'comments': len(texts),
+        'bytes': sum(len(text.encode('utf-8')) for text in texts),
+        'domains_found': domains_found,
+        'comments_per_sec': len(texts) / (best_total / 1e9) if best_total else 0.0,
+        'p50_us': percentile(best_latencies, 0.50) / 1000,
+        'p99_us': percentile(best_latencies, 0.99) / 1000,
+        'max_us': best_latencies[-1] / 1000 if best_latencies else 0.0,
+        'peak_alloc_bytes': peak,
+        'retained_blocks': blocks_after - blocks_before,
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Current commit hash, if run inside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> bool:
+    """Print throughput/latency deltas against a baseline; False on regression."""
+    ok = True
+    print("\nComparison with baseline:")
+    for kind, current in results.items():
+        previous = baseline.get(kind)
+        if not previous:
+            continue
+        speed = current['comments_per_sec'] / previous['comments_per_sec'] - 1
+        p99 = current['p99_us'] / previous['p99_us'] - 1 if previous['p99_us'] else 0.0
+        regressed = speed < -threshold
+        ok = ok and not regressed
+        marker = "REGRESSION" if regressed else "ok"
+        print(f"  {kind:12s} throughput {speed:+7.1%}  p99 {p99:+7.1%}  {marker}")
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark DomainExtractor on synthetic corpora")
+    parser.add_argument('--seed', type=int, default=42, help="Corpus generator seed")
+    parser.add_argument('--corpus', action='append', choices=sorted(GENERATORS),
+                        help="Corpus to run (repeatable, default all)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply default corpus sizes")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed passes per corpus (best is kept)")
+    parser.add_argument('--with-cache', action='store_true',
+                        help="Keep the verbatim-comment cache enabled (measures cache hits, not scanning)")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('--fail-threshold', type=float, default=0.10,
+                        help="Throughput drop vs baseline that counts as a regression")
+    args = parser.parse_args(argv)
+
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(sys.stderr))
+    if not args.with_cache:
+        DomainExtractor.extraction_cache = None
+
+    # Load the blocklist up front so its one-time cost isn't timed
+    DomainExtractor.domain_filter.reload_if_changed()
+
+    results = {}
+    for kind in args.corpus or list(DEFAULT_SIZES):
+        texts = generate_corpus(kind, max(1, int(DEFAULT_SIZES[kind] * args.scale)), seed=args.seed)
+        results[kind] = stats = bench_corpus(texts, args.repeat)
+        print(f"{kind:12s} {stats['comments_per_sec']:>12,.0f} comments/s  "
+              f"p50 {stats['p50_us']:8.1f}us  p99 {stats['p99_us']:9.1f}us  "
+              f"peak {stats['peak_alloc_bytes'] / 1024:8.1f} KiB  "
+              f"domains {stats['domains_found']:,}")
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'scale': args.scale,
+        'repeat': args.repeat,
+        'text_cache': args.with_cache,
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline.get('results', {}), args.fail_threshold):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
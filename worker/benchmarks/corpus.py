@@ -0,0 +1,145 @@
+"""
+Seeded synthetic TikTok comment corpora for benchmarks
+
+Vocabulary mirrors the generators in scripts/seed_db.py (domain keywords,
+TLDs, suspicious keywords, comment templates) so the spam looks like the
+seeded development data. The same seed always yields the same corpus.
+"""
+
+import random
+from typing import Callable, Dict, List
+
+DOMAIN_PATTERNS = {
+    'ecommerce': ['shop', 'store', 'mart', 'deals', 'buy', 'sale', 'market', 'bazaar',
+                  'outlet', 'wholesale', 'retail', 'express', 'direct', 'online'],
+    'health': ['health', 'wellness', 'fit', 'nutrition', 'supplement', 'vitamin',
+               'organic', 'natural', 'pure', 'bio', 'life', 'care', 'med'],
+    'business': ['biz', 'pro', 'success', 'wealth', 'money', 'profit', 'income',
+                 'entrepreneur', 'startup', 'venture', 'invest', 'trade', 'earn'],
+    'tech': ['tech', 'digital', 'cyber', 'web', 'net', 'app', 'soft', 'sys',
+             'data', 'cloud', 'smart', 'ai', 'crypto', 'blockchain'],
+    'fashion': ['style', 'fashion', 'trend', 'chic', 'glamour', 'boutique',
+                'couture', 'design', 'wear', 'closet', 'outfit', 'look'],
+}
+
+TLDS = ['.com', '.org', '.net', '.shop', '.store', '.online', '.xyz', '.io',
+        '.co', '.biz', '.info', '.pro', '.club', '.site', '.space', '.top']
+
+SUSPICIOUS_KEYWORDS = [
+    'get-rich', 'make-money-fast', 'crypto-gains', 'instant-profit',
+    'weight-loss-miracle', 'anti-aging-secret', 'free-money',
+    'bitcoin-doubler', 'investment-scam', 'fake-reviews'
+]
+
+DOMAIN_TEMPLATES = [
+    "Check out {domain} for amazing deals!",
+    "I got mine from {domain} and it's incredible",
+    "Visit {domain} for the best prices",
+    "Found this on {domain} - game changer!",
+    "Use code SAVE20 at {domain}",
+    "{domain} has the best selection",
+    "Just ordered from {domain} - can't wait!",
+    "Link: {domain}/special-offer",
+    "Go to {domain} now before it's sold out",
+    "I work with {domain} and love their products",
+]
+
+CLEAN_COMMENTS = [
+    "This is so helpful, thank you!",
+    "I need to try this ASAP",
+    "Love your content! Keep it up 💕",
+    "Where did you get this info?",
+    "This changed my life!",
+    "Can you make a tutorial about this?",
+    "I've been looking for something like this",
+    "Amazing results! How long did it take?",
+    "Is this actually legit?",
+    "First! Love your videos",
+    "This is exactly what I needed",
+    "How much does it cost?",
+    "This looks too good to be true",
+    "You're my favorite creator",
+]
+
+EMOJI = ['🔥', '💕', '😂', '✨', '💯', '🙏', '😍', '👀', '💸', '🤯', '🎁', '📈', '👗', '💄']
+
+
+def random_domain(rng: random.Random) -> str:
+    """Domain name built the way scripts/seed_db.py builds them"""
+    if rng.random() < 0.1:
+        base = rng.choice(SUSPICIOUS_KEYWORDS)
+    else:
+        keyword = rng.choice(DOMAIN_PATTERNS[rng.choice(list(DOMAIN_PATTERNS))])
+        base = rng.choice([
+            f"{keyword}{rng.randint(1, 999)}", f"get{keyword}", f"best{keyword}",
+            f"{keyword}now", f"{keyword}pro", f"my{keyword}", f"{keyword}hub", f"{keyword}zone"
+        ])
+    domain = base + rng.choice(TLDS)
+    
+    roll = rng.random()
+    if roll < 0.2:
+        return "https://" + domain
+    if roll < 0.35:
+        return "www." + domain
+    return domain
+
+
+def clean_comment(rng: random.Random) -> str:
+    """Ordinary comment without domains"""
+    return rng.choice(CLEAN_COMMENTS)
+
+
+def domain_spam_comment(rng: random.Random) -> str:
+    """Promotional comment with one to three domains"""
+    parts = [rng.choice(DOMAIN_TEMPLATES).format(domain=random_domain(rng))
+             for _ in range(rng.randint(1, 3))]
+    return " ".join(parts)
+
+
+def dot_run_comment(rng: random.Random) -> str:
+    """Pathological dotted filler: version strings, price lists, a.b.c.d..."""
+    filler = rng.choice([
+        lambda: ".".join(str(rng.randint(0, 99)) for _ in range(rng.randint(20, 200))),
+        lambda: ".".join(rng.choice("abcdefghij") for _ in range(rng.randint(50, 500))),
+        lambda: " ".join(f"${rng.randint(1, 999)}.{rng.randint(0, 99):02d}" for _ in range(50)),
+        lambda: "v" + ".".join(str(rng.randint(0, 9)) for _ in range(rng.randint(100, 400))) + "x",
+    ])()
+    if rng.random() < 0.3:
+        filler += " " + random_domain(rng)
+    return filler
+
+
+def emoji_comment(rng: random.Random) -> str:
+    """Emoji-heavy comment, sometimes with a domain glued to the emoji"""
+    text = "".join(rng.choice(EMOJI) for _ in range(rng.randint(5, 40)))
+    if rng.random() < 0.4:
+        text += random_domain(rng) + rng.choice(EMOJI)
+    return text
+
+
+def long_comment(rng: random.Random) -> str:
+    """Very long comment (5-50 KB) mixing clean text and a few domains"""
+    pieces = []
+    size = 0
+    target = rng.randint(5_000, 50_000)
+    while size < target:
+        piece = domain_spam_comment(rng) if rng.random() < 0.05 else clean_comment(rng)
+        pieces.append(piece)
+        size += len(piece) + 1
+    return " ".join(pieces)
+
+
+GENERATORS: Dict[str, Callable[[random.Random], str]] = {
+    'clean': clean_comment,
+    'domain_spam': domain_spam_comment,
+    'dot_runs': dot_run_comment,
+    'emoji': emoji_comment,
+    'long': long_comment,
+}
+
+
+def generate_corpus(kind: str, count: int, seed: int = 42) -> List[str]:
+    """Generate count comments of one kind, deterministic for a given seed"""
+    rng = random.Random(f"{seed}:{kind}")
+    generator = GENERATORS[kind]
+    return [generator(rng) for _ in range(count)]
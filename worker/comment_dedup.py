@@ -0,0 +1,152 @@
+"""
+Per-worker filter for comments that were already harvested
+
+Re-crawling a video fetches the same top comments again. A Bloom filter
+keyed on (video, comment) lets the harvester drop those before extraction
+and writes. The filter can report false positives at roughly error_rate,
+so the database keeps the authoritative check: comment has a unique
+(video_id, dedup_key) index and inserts skip conflicts.
+"""
+
+import hashlib
+import math
+from typing import Optional, Dict, Any, Iterable, List
+
+from config import config
+
+
+def comment_dedup_key(comment: Dict[str, Any]) -> str:
+    """
+    Identity of a comment within its video
+
+    Mirrors the comment_dedup_key() SQL function: the TikTok comment_id when
+    present, otherwise an md5 of the commenter and text.
+    """
+    comment_id = comment.get("comment_id")
+    if comment_id is not None:
+        return str(comment_id)
+    content = f"{comment.get('username') or ''}\n{comment.get('text') or ''}"
+    return "h:" + hashlib.md5(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        Size the filter for capacity keys at the given false positive rate
+
+        Args:
+            capacity: Expected number of keys
+            error_rate: Target false positive rate once capacity keys are added
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str) -> bool:
+        """
+        Add a key
+
+        Returns:
+            True if the key was (probably) not in the filter before
+        """
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self._bits[p >> 3] & mask:
+                self._bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+
+class CommentDeduplicator:
+    """
+    Remembers harvested comments across two Bloom filter generations
+
+    When the current generation reaches capacity it becomes the previous
+    one and a fresh filter takes over, which bounds memory and keeps the
+    false positive rate near error_rate. Comments are remembered for
+    between one and two generations' worth of newer comments.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, error_rate: Optional[float] = None):
+        """
+        Initialize the deduplicator
+
+        Args:
+            capacity: Comments per generation
+            error_rate: Bloom filter false positive rate
+        """
+        self.capacity = capacity or config.comment_dedup_capacity
+        self.error_rate = error_rate or config.comment_dedup_error_rate
+        self._current = BloomFilter(self.capacity, self.error_rate)
+        self._previous: Optional[BloomFilter] = None
+
+        self.checked = 0
+        self.duplicates = 0
+        self.rotations = 0
+
+    def seen(self, video_id: str, comment: Dict[str, Any]) -> bool:
+        """
+        Check a comment and remember it
+
+        Args:
+            video_id: Video the comment belongs to (TikTok video_id)
+            comment: Comment row with comment_id, or username and text
+
+        Returns:
+            True if the comment was (probably) harvested before
+        """
+        key = f"{video_id}/{comment_dedup_key(comment)}"
+        self.checked += 1
+
+        if self._previous is not None and key in self._previous:
+            self.duplicates += 1
+            return True
+        if not self._current.add(key):
+            self.duplicates += 1
+            return True
+
+        if self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self.rotations += 1
+        return False
+
+    def filter_new(self, video_id: str, comments: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep only comments not harvested before (also drops repeats within the batch)"""
+        return [comment for comment in comments if not self.seen(video_id, comment)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and filter size for monitoring"""
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "duplicate_rate": self.duplicates / self.checked if self.checked else 0.0,
+            "generation_fill": self._current.count / self.capacity,
+            "rotations": self.rotations,
+            "memory_bytes": self._current.memory_bytes * (2 if self._previous else 1)
+        }
+
+
+# Global comment deduplicator instance
+comment_dedup = CommentDeduplicator()
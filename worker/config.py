@@ -14,10 +14,35 @@ class WorkerConfig(BaseSettings):
     # Supabase Configuration
     supabase_url: str = Field(..., env="SUPABASE_URL")
     supabase_service_key: str = Field(..., env="SUPABASE_SERVICE_KEY")
+    database_pool_size: int = Field(default=10, env="DATABASE_POOL_SIZE")
+    database_http2: bool = Field(default=True, env="DATABASE_HTTP2")
+    database_timeout_seconds: float = Field(default=30.0, env="DATABASE_TIMEOUT")
+    database_keepalive_seconds: float = Field(default=30.0, env="DATABASE_KEEPALIVE")
+    database_backend: str = Field(default="rest", env="DATABASE_BACKEND")  # rest or postgres
+    database_url: Optional[str] = Field(None, env="DATABASE_URL")  # required for postgres
+    
+    # Write-behind buffer for comment/domain/mention writes
+    write_buffer_flush_size: int = Field(default=500, env="WRITE_BUFFER_FLUSH_SIZE")
+    write_buffer_max_age_seconds: float = Field(default=2.0, env="WRITE_BUFFER_MAX_AGE")
+    write_buffer_max_pending: int = Field(default=10000, env="WRITE_BUFFER_MAX_PENDING")
+    
+    # Comment deduplication (per-generation Bloom filter size and error rate)
+    comment_dedup_capacity: int = Field(default=1000000, env="COMMENT_DEDUP_CAPACITY")
+    comment_dedup_error_rate: float = Field(default=0.001, env="COMMENT_DEDUP_ERROR_RATE")
+    
+    # Durable local outbox for harvest results (SQLite, WAL mode)
+    outbox_path: str = Field(default="data/outbox.db", env="OUTBOX_PATH")
+    outbox_batch_size: int = Field(default=50, env="OUTBOX_BATCH_SIZE")
+    outbox_drain_interval: float = Field(default=1.0, env="OUTBOX_DRAIN_INTERVAL")
+    outbox_max_backoff: float = Field(default=60.0, env="OUTBOX_MAX_BACKOFF")
     
     # Redis/Upstash Configuration for Rate Limiting
     upstash_redis_rest_url: Optional[str] = Field(None, env="UPSTASH_REDIS_REST_URL")
     upstash_redis_rest_token: Optional[str] = Field(None, env="UPSTASH_REDIS_REST_TOKEN")
+    upstash_pool_size: int = Field(default=4, env="UPSTASH_POOL_SIZE")
+    upstash_http2: bool = Field(default=True, env="UPSTASH_HTTP2")
+    upstash_timeout_seconds: float = Field(default=5.0, env="UPSTASH_TIMEOUT")
+    upstash_keepalive_seconds: float = Field(default=60.0, env="UPSTASH_KEEPALIVE")
     
     # Worker Configuration
     worker_id: str = Field(default_factory=lambda: os.getenv("WORKER_ID", "worker-1"))
@@ -31,11 +56,29 @@ class WorkerConfig(BaseSettings):
     comments_per_page: int = Field(default=50, env="COMMENTS_PER_PAGE")
     scrape_timeout: int = Field(default=30000, env="SCRAPE_TIMEOUT")  # milliseconds
     navigation_timeout: int = Field(default=60000, env="NAVIGATION_TIMEOUT")  # milliseconds
+    recrawl_interval_hours: float = Field(default=24.0, env="RECRAWL_INTERVAL_HOURS")
+    crawl_page_size: int = Field(default=100, env="CRAWL_PAGE_SIZE")
+    video_lease_seconds: int = Field(default=600, env="VIDEO_LEASE_SECONDS")
     
     # Rate Limiting Configuration
     rate_limit_enabled: bool = Field(default=True, env="RATE_LIMIT_ENABLED")
     rate_limit_requests_per_minute: int = Field(default=30, env="RATE_LIMIT_RPM")
     rate_limit_burst_size: int = Field(default=10, env="RATE_LIMIT_BURST")
+    rate_limit_bucket_scope: str = Field(default="worker", env="RATE_LIMIT_BUCKET_SCOPE")
+    rate_limit_leasing: bool = Field(default=False, env="RATE_LIMIT_LEASING")
+    rate_limit_lease_seconds: float = Field(default=5.0, env="RATE_LIMIT_LEASE_SECONDS")
+    rate_limit_lease_max_tokens: int = Field(default=10, env="RATE_LIMIT_LEASE_MAX_TOKENS")
+    
+    # Domain Filtering Configuration (defaults to the bundled blocklist)
+    domain_blocklist_path: Optional[str] = Field(None, env="DOMAIN_BLOCKLIST_PATH")
+    domain_allowlist_path: Optional[str] = Field(None, env="DOMAIN_ALLOWLIST_PATH")
+    classification_cache_size: int = Field(default=65536, env="CLASSIFICATION_CACHE_SIZE")
+    extraction_cache_max_mb: int = Field(default=16, env="EXTRACTION_CACHE_MAX_MB")
+    extraction_cache_path: Optional[str] = Field(None, env="EXTRACTION_CACHE_PATH")
+    extraction_max_text_length: int = Field(default=100000, env="EXTRACTION_MAX_TEXT_LENGTH")
+    extraction_time_budget_ms: float = Field(default=50.0, env="EXTRACTION_TIME_BUDGET_MS")
+    domain_cache_size: int = Field(default=50000, env="DOMAIN_CACHE_SIZE")
+    domain_cache_warm_size: int = Field(default=5000, env="DOMAIN_CACHE_WARM_SIZE")
     
     # Retry Configuration
     max_retries: int = Field(default=3, env="MAX_RETRIES")
@@ -71,6 +114,22 @@ class WorkerConfig(BaseSettings):
             raise ValueError(f"Environment must be one of {valid_envs}")
         return v.lower()
     
+    @validator("rate_limit_bucket_scope")
+    def validate_rate_limit_bucket_scope(cls, v):
+        """Validate rate limit bucket scope ("worker": RPM per worker, "shared": RPM for the cluster)"""
+        valid_scopes = ["worker", "shared"]
+        if v.lower() not in valid_scopes:
+            raise ValueError(f"Rate limit bucket scope must be one of {valid_scopes}")
+        return v.lower()
+    
+    @validator("database_backend")
+    def validate_database_backend(cls, v):
+        """Validate database backend"""
+        valid_backends = ["rest", "postgres"]
+        if v.lower() not in valid_backends:
+            raise ValueError(f"Database backend must be one of {valid_backends}")
+        return v.lower()
+    
     @property
     def is_production(self) -> bool:
         """Check if running in production"""
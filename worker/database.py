@@ -1,46 +1,165 @@
 """
 Supabase database client initialization and management
+
+Talks to the Supabase REST API (PostgREST) over a pooled httpx.AsyncClient,
+so database round trips never block the event loop shared with the browser
+and the health server.
 """
 
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timezone
+import importlib.util
+from collections import Counter
+from contextlib import aclosing
+from typing import Optional, Dict, Any, AsyncIterator, Iterable, List, Tuple
+from datetime import datetime, timedelta, timezone
+import httpx
 import structlog
-from supabase import create_client, Client
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import RetryError, retry, stop_after_attempt, wait_exponential
 
 from config import config
+from domain_extractor import DomainExtractor
+from pg_backend import PostgresBulkLoader
 
 logger = structlog.get_logger()
 
 
+class DatabaseError(Exception):
+    """Error response from the Supabase REST API"""
+    
+    def __init__(self, status_code: int, message: str, code: Optional[str] = None):
+        super().__init__(f"{status_code} {code}: {message}" if code else f"{status_code}: {message}")
+        self.status_code = status_code
+        self.code = code
+
+
+def root_error(error: BaseException) -> BaseException:
+    """Unwrap tenacity's RetryError to the exception of the last attempt"""
+    if isinstance(error, RetryError):
+        return error.last_attempt.exception() or error
+    return error
+
+
+def is_payload_rejection(error: BaseException) -> bool:
+    """
+    Whether the database refused the rows themselves, so resending them cannot succeed
+    
+    Only 400/409/422 count (bad values, constraint violations), and not
+    PostgREST's PGRST2xx schema cache misses, which mean a migration has not
+    been applied yet. Auth failures (401/403), missing endpoints (404) and
+    throttling are transient: they are fixed by a deploy, not by the data.
+    """
+    return (
+        isinstance(error, DatabaseError)
+        and error.status_code in (400, 409, 422)
+        and not (error.code or "").startswith("PGRST2")
+    )
+
+
 class SupabaseClient:
-    """Supabase database client wrapper"""
+    """Async Supabase database client"""
     
-    def __init__(self):
-        """Initialize Supabase client"""
-        self._client: Optional[Client] = None
-        self._initialize_client()
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        service_key: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Initialize the client; the connection pool is created on first use.
+        
+        Args:
+            url: Supabase project URL (defaults to config)
+            service_key: Service role key (defaults to config)
+            pool_size: Maximum pooled connections (defaults to config)
+            transport: Custom httpx transport, for tests
+        """
+        self.url = (url or config.supabase_url).rstrip("/")
+        self._service_key = service_key or config.supabase_service_key
+        self.pool_size = pool_size or config.database_pool_size
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Optional direct Postgres backend for bulk comment/mention loads
+        self.bulk_loader: Optional[PostgresBulkLoader] = None
+        if config.database_backend == "postgres":
+            if not config.database_url:
+                raise ValueError("DATABASE_BACKEND=postgres requires DATABASE_URL")
+            self.bulk_loader = PostgresBulkLoader(
+                config.database_url,
+                max_size=self.pool_size
+            )
     
     def _initialize_client(self):
-        """Initialize the Supabase client with service role key"""
-        try:
-            self._client = create_client(
-                supabase_url=config.supabase_url,
-                supabase_key=config.supabase_service_key
-            )
-            logger.info("supabase_client_initialized", 
-                       url=config.supabase_url[:30] + "...")
-        except Exception as e:
-            logger.error("supabase_client_initialization_failed", error=str(e))
-            raise
+        """Create the pooled HTTP client with service role credentials"""
+        http2 = config.database_http2 and importlib.util.find_spec("h2") is not None
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.url}/rest/v1",
+            headers={
+                "apikey": self._service_key,
+                "Authorization": f"Bearer {self._service_key}",
+                "Content-Type": "application/json"
+            },
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=config.database_keepalive_seconds
+            ),
+            timeout=httpx.Timeout(config.database_timeout_seconds),
+            http2=http2,
+            transport=self._transport
+        )
+        logger.info("supabase_client_initialized",
+                   url=self.url[:30] + "...",
+                   pool_size=self.pool_size,
+                   http2=http2)
     
     @property
-    def client(self) -> Client:
-        """Get the Supabase client instance"""
-        if not self._client:
+    def client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client instance"""
+        if not self._client or self._client.is_closed:
             self._initialize_client()
         return self._client
     
+    async def _request(
+        self,
+        method: str,
+        table: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        prefer: Optional[str] = None
+    ) -> Any:
+        """
+        Send a PostgREST request for a table.
+        
+        Returns:
+            Decoded response body: rows for table requests, the function
+            result for RPCs (an empty list when there is no body)
+        """
+        headers = {"Prefer": prefer} if prefer else None
+        response = await self.client.request(method, f"/{table}", params=params,
+                                             json=json, headers=headers)
+        
+        if response.is_error:
+            try:
+                body = response.json()
+                message, code = body.get("message", response.text), body.get("code")
+            except ValueError:
+                message, code = response.text, None
+            raise DatabaseError(response.status_code, message, code)
+        
+        if not response.content:
+            return []
+        return response.json()
+    
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("supabase_client_closed")
+        self._client = None
+        if self.bulk_loader:
+            await self.bulk_loader.close()
+    
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10)
@@ -48,9 +167,10 @@ class SupabaseClient:
     async def insert_video(self, video_data: Dict[str, Any]) -> Dict[str, Any]:
         """Insert a new video record"""
         try:
-            result = self.client.table("video").insert(video_data).execute()
+            rows = await self._request("POST", "video", json=video_data,
+                                       prefer="return=representation")
             logger.info("video_inserted", video_id=video_data.get("video_id"))
-            return result.data[0] if result.data else {}
+            return rows[0] if rows else {}
         except Exception as e:
             logger.error("video_insert_failed", 
                         video_id=video_data.get("video_id"),
@@ -62,43 +182,101 @@ class SupabaseClient:
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
     async def insert_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Bulk insert comments"""
+        """
+        Bulk insert comments, skipping ones already stored for their video.
+        
+        Returns:
+            The inserted rows (comments already stored are left out)
+        """
         if not comments:
             return []
         
         try:
-            result = self.client.table("comment").insert(comments).execute()
-            logger.info("comments_inserted", count=len(comments))
-            return result.data
+            if self.bulk_loader:
+                rows = await self.bulk_loader.copy_comments(comments)
+            else:
+                rows = await self._request(
+                    "POST", "comment",
+                    params={"on_conflict": "video_id,dedup_key"},
+                    json=comments,
+                    prefer="return=representation,resolution=ignore-duplicates"
+                )
+            logger.info("comments_inserted", count=len(rows), duplicates=len(comments) - len(rows))
+            return rows
         except Exception as e:
             logger.error("comments_insert_failed", 
                         count=len(comments),
                         error=str(e))
             raise
     
+    async def upsert_domain(self, domain: str) -> Dict[str, Any]:
+        """Upsert a single domain, counting one mention"""
+        ids = await self.upsert_domains([domain])
+        for name, domain_id in ids.items():
+            return {"id": domain_id, "domain_name": name}
+        return {}
+    
+    async def upsert_domains(
+        self,
+        domains: Iterable[str],
+        count_mentions: bool = True,
+        seen_at: Optional[datetime] = None
+    ) -> Dict[str, str]:
+        """
+        Upsert many domains in one round trip via the upsert_domains RPC.
+        
+        Domains are normalized and counted in-process; the database keeps the
+        earliest first_seen_at and latest last_seen_at and adds the counts
+        to mention_count.
+        
+        Args:
+            domains: Domain names, repeated once per mention
+            count_mentions: Add the counts to mention_count; pass False when
+                the domain_mention rows are inserted too (a trigger counts those)
+            seen_at: Sighting time (defaults to now)
+            
+        Returns:
+            Mapping of normalized domain name to domain id
+        """
+        counts = Counter(
+            normalized for normalized in map(DomainExtractor.normalize_domain, domains)
+            if normalized
+        )
+        if not counts:
+            return {}
+        
+        seen = (seen_at or datetime.now(timezone.utc)).isoformat()
+        rows = []
+        for name, count in counts.items():
+            parts = DomainExtractor.split_domain(name)
+            rows.append({
+                "domain_name": name,
+                "tld": parts.suffix if parts else name.rsplit(".", 1)[-1],
+                "subdomain": (parts.subdomain or None) if parts else None,
+                "first_seen_at": seen,
+                "last_seen_at": seen,
+                "mention_count": count
+            })
+        
+        ids = await self._upsert_domain_rows(rows, count_mentions)
+        logger.debug("domains_upserted", count=len(rows), mentions=sum(counts.values()))
+        return ids
+    
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
-    async def upsert_domain(self, domain: str) -> Dict[str, Any]:
-        """Upsert a domain record"""
-        domain_data = {
-            "domain": domain.lower(),
-            "first_seen_at": datetime.now(timezone.utc).isoformat(),
-            "last_seen_at": datetime.now(timezone.utc).isoformat(),
-            "mention_count": 1
-        }
-        
+    async def _upsert_domain_rows(self, rows: List[Dict[str, Any]], count_mentions: bool) -> Dict[str, str]:
+        """Send prepared domain rows to the upsert_domains RPC (retried; rows are reusable)"""
         try:
-            result = self.client.table("domain").upsert(
-                domain_data,
-                on_conflict="domain"
-            ).execute()
-            logger.debug("domain_upserted", domain=domain)
-            return result.data[0] if result.data else {}
+            result = await self._request(
+                "POST", "rpc/upsert_domains",
+                json={"p_domains": rows, "p_count_mentions": count_mentions}
+            )
+            return {row["domain_name"]: row["id"] for row in result}
         except Exception as e:
-            logger.error("domain_upsert_failed", 
-                        domain=domain,
+            logger.error("domains_upsert_failed", 
+                        count=len(rows),
                         error=str(e))
             raise
     
@@ -109,10 +287,11 @@ class SupabaseClient:
     async def insert_domain_mention(self, mention_data: Dict[str, Any]) -> Dict[str, Any]:
         """Insert a domain mention record"""
         try:
-            result = self.client.table("domain_mention").insert(mention_data).execute()
+            rows = await self._request("POST", "domain_mention", json=mention_data,
+                                       prefer="return=representation")
             logger.debug("domain_mention_inserted", 
                         domain_id=mention_data.get("domain_id"))
-            return result.data[0] if result.data else {}
+            return rows[0] if rows else {}
         except Exception as e:
             logger.error("domain_mention_insert_failed", 
                         domain_id=mention_data.get("domain_id"),
@@ -123,19 +302,218 @@ class SupabaseClient:
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10)
     )
+    async def insert_domain_mentions(self, mentions: List[Dict[str, Any]]) -> int:
+        """Bulk insert domain mention records, returning how many were written"""
+        if not mentions:
+            return 0
+        
+        try:
+            if self.bulk_loader:
+                count = await self.bulk_loader.copy_domain_mentions(mentions)
+            else:
+                await self._request("POST", "domain_mention", json=mentions,
+                                    prefer="return=minimal")
+                count = len(mentions)
+            logger.info("domain_mentions_inserted", count=count)
+            return count
+        except Exception as e:
+            logger.error("domain_mentions_insert_failed", 
+                        count=len(mentions),
+                        error=str(e))
+            raise
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def get_top_domains(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get ids of the most mentioned domains (for warming the domain cache)"""
+        try:
+            rows = await self._request("GET", "v_domains_top_mentioned", params={
+                "select": "id,domain_name",
+                "order": "mention_count.desc",
+                "limit": limit
+            })
+            logger.debug("top_domains_fetched", count=len(rows))
+            return rows
+        except Exception as e:
+            logger.error("get_top_domains_failed", error=str(e))
+            raise
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _get_crawl_page(
+        self,
+        cutoff: str,
+        limit: int,
+        after: Optional[Tuple[Optional[str], str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch one keyset page of crawl candidates via the crawl_candidates RPC"""
+        after_crawled_at, after_id = after or (None, None)
+        return await self._request("POST", "rpc/crawl_candidates", json={
+            "p_cutoff": cutoff,
+            "p_limit": limit,
+            "p_after_crawled_at": after_crawled_at,
+            "p_after_id": after_id
+        })
+    
+    async def iter_videos_for_crawling(
+        self,
+        page_size: Optional[int] = None,
+        recrawl_interval: Optional[timedelta] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream videos that need comment crawling, stalest first.
+        
+        Never-crawled videos come first, then videos last crawled more than
+        recrawl_interval ago. Pages are fetched by keyset pagination on
+        (last_crawled_at, id), so each request is an index range scan no
+        matter how far the iteration goes.
+        
+        Args:
+            page_size: Videos per request
+            recrawl_interval: How long a crawled video rests before it is
+                a candidate again
+            
+        Yields:
+            Video rows (id, video_id, username, video_url, comment_count,
+            last_crawled_at)
+        """
+        page_size = page_size or config.crawl_page_size
+        recrawl_interval = recrawl_interval or timedelta(hours=config.recrawl_interval_hours)
+        cutoff = (datetime.now(timezone.utc) - recrawl_interval).isoformat()
+        
+        after = None
+        try:
+            while True:
+                rows = await self._get_crawl_page(cutoff, page_size, after)
+                for row in rows:
+                    yield row
+                if len(rows) < page_size:
+                    return
+                after = (rows[-1]["last_crawled_at"], rows[-1]["id"])
+        except Exception as e:
+            logger.error("iter_videos_for_crawling_failed", error=str(e))
+            raise
+    
     async def get_videos_for_crawling(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Get videos that need comment crawling"""
+        """Get the limit stalest videos that need comment crawling"""
+        rows = []
+        async with aclosing(self.iter_videos_for_crawling(page_size=limit)) as videos:
+            async for row in videos:
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        
+        logger.info("videos_fetched_for_crawling", count=len(rows))
+        return rows
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def claim_videos(
+        self,
+        worker_id: str,
+        limit: int = 10,
+        lease_seconds: Optional[int] = None,
+        recrawl_interval: Optional[timedelta] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lease videos due for crawling to this worker.
+        
+        Claims are atomic (FOR UPDATE SKIP LOCKED), so concurrent workers
+        never receive the same video while its lease is live.
+        
+        Args:
+            worker_id: Lease holder, usually config.worker_id
+            limit: Maximum videos to claim
+            lease_seconds: Lease length (defaults to config.video_lease_seconds)
+            recrawl_interval: How long a crawled video rests before it is due
+            
+        Returns:
+            Claimed video rows, stalest first, with lease_expires_at
+        """
+        lease_seconds = lease_seconds or config.video_lease_seconds
+        recrawl_interval = recrawl_interval or timedelta(hours=config.recrawl_interval_hours)
         try:
-            # Get videos that haven't been crawled or were crawled > 24 hours ago
-            result = self.client.table("video").select("*").or_(
-                "last_crawled_at.is.null",
-                f"last_crawled_at.lt.{datetime.now(timezone.utc).isoformat()}"
-            ).eq("is_active", True).limit(limit).execute()
+            rows = await self._request("POST", "rpc/claim_videos", json={
+                "p_worker_id": worker_id,
+                "p_limit": limit,
+                "p_lease_seconds": lease_seconds,
+                "p_cutoff": (datetime.now(timezone.utc) - recrawl_interval).isoformat()
+            })
+            logger.info("videos_claimed", worker_id=worker_id, count=len(rows))
+            return rows
+        except Exception as e:
+            logger.error("claim_videos_failed", worker_id=worker_id, error=str(e))
+            raise
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def release_videos(self, worker_id: str, video_ids: List[str], crawled: bool = False) -> int:
+        """
+        Give up this worker's leases on videos.
+        
+        Args:
+            worker_id: Lease holder
+            video_ids: Video row ids (not TikTok video ids)
+            crawled: Also mark the videos as crawled now
             
-            logger.info("videos_fetched_for_crawling", count=len(result.data))
-            return result.data
+        Returns:
+            Number of leases released (leases already taken over are skipped)
+        """
+        if not video_ids:
+            return 0
+        
+        try:
+            released = await self._request("POST", "rpc/release_videos", json={
+                "p_worker_id": worker_id,
+                "p_video_ids": list(video_ids),
+                "p_crawled": crawled
+            })
+            logger.debug("videos_released", worker_id=worker_id, count=released, crawled=crawled)
+            return released
+        except Exception as e:
+            logger.error("release_videos_failed", worker_id=worker_id, error=str(e))
+            raise
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def extend_lease(
+        self,
+        worker_id: str,
+        video_ids: List[str],
+        lease_seconds: Optional[int] = None
+    ) -> List[str]:
+        """
+        Extend this worker's leases on videos still being crawled.
+        
+        Returns:
+            Ids of the videos still held; any others were claimed by another
+            worker after their lease lapsed and should be abandoned
+        """
+        if not video_ids:
+            return []
+        
+        try:
+            rows = await self._request("POST", "rpc/extend_video_leases", json={
+                "p_worker_id": worker_id,
+                "p_video_ids": list(video_ids),
+                "p_lease_seconds": lease_seconds or config.video_lease_seconds
+            })
+            held = [row["id"] for row in rows]
+            if len(held) < len(video_ids):
+                logger.warning("video_leases_lost", worker_id=worker_id, lost=len(video_ids) - len(held))
+            return held
         except Exception as e:
-            logger.error("get_videos_for_crawling_failed", error=str(e))
+            logger.error("extend_lease_failed", worker_id=worker_id, error=str(e))
             raise
     
     @retry(
@@ -150,25 +528,80 @@ class SupabaseClient:
                 **status
             }
             
-            result = self.client.table("video").update(update_data).eq(
-                "id", video_id
-            ).execute()
+            rows = await self._request("PATCH", "video",
+                                       params={"id": f"eq.{video_id}"},
+                                       json=update_data,
+                                       prefer="return=representation")
             
             logger.info("video_crawl_status_updated", 
                        video_id=video_id,
                        status=status)
-            return result.data[0] if result.data else {}
+            return rows[0] if rows else {}
         except Exception as e:
             logger.error("update_video_crawl_status_failed", 
                         video_id=video_id,
                         error=str(e))
             raise
     
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def ingest_harvest(
+        self,
+        video: Dict[str, Any],
+        comments: List[Dict[str, Any]],
+        mentions: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Persist a harvested video in one request via the ingest_harvest RPC.
+        
+        The video's crawl status, its comments, the mentioned domains and the
+        mention rows are written in a single transaction.
+        
+        Args:
+            video: Video fields, identified by its TikTok "video_id"
+            comments: Comment rows (without video or row ids)
+            mentions: Mention rows with "domain_name" and "comment_index",
+                the position of their comment in comments
+            
+        Returns:
+            The video's row id and the number of comments, domains and
+            mentions written
+        """
+        payload_mentions = []
+        for mention in mentions:
+            name = DomainExtractor.normalize_domain(mention.get("domain_name"))
+            if not name:
+                continue
+            parts = DomainExtractor.split_domain(name)
+            payload_mentions.append({
+                **mention,
+                "domain_name": name,
+                "tld": parts.suffix if parts else name.rsplit(".", 1)[-1],
+                "subdomain": (parts.subdomain or None) if parts else None
+            })
+        
+        payload = {"video": video, "comments": comments, "mentions": payload_mentions}
+        try:
+            result = await self._request("POST", "rpc/ingest_harvest", json={"p_payload": payload})
+            logger.info("harvest_ingested",
+                       video_id=video.get("video_id"),
+                       **{key: result.get(key) for key in ("comments", "domains", "mentions")})
+            return result
+        except Exception as e:
+            logger.error("harvest_ingest_failed",
+                        video_id=video.get("video_id"),
+                        comments=len(comments),
+                        mentions=len(payload_mentions),
+                        error=str(e))
+            raise
+    
     async def health_check(self) -> bool:
         """Check if database connection is healthy"""
         try:
             # Simple query to check connection
-            result = self.client.table("video").select("id").limit(1).execute()
+            await self._request("GET", "video", params={"select": "id", "limit": 1})
             return True
         except Exception as e:
             logger.error("database_health_check_failed", error=str(e))
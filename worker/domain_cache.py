@@ -0,0 +1,194 @@
+"""
+In-process cache of domain name to domain id
+
+The same spam domains appear in thousands of comments, so resolving each
+mention's domain_id with an upsert costs a round trip per occurrence. The
+cache keeps the ids of recently seen domains in a bounded LRU, warmed at
+startup from the most mentioned domains, and remembers names the blocklist
+rejects so they never reach the database.
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, List
+import structlog
+
+from config import config
+from database import SupabaseClient, db_client
+from domain_extractor import DomainExtractor
+
+logger = structlog.get_logger()
+
+# Cached in place of an id for names the blocklist rejects
+BLOCKED = object()
+
+
+class DomainIdCache:
+    """Bounded LRU of normalized domain name -> domain id, with negative entries"""
+
+    def __init__(
+        self,
+        client: SupabaseClient,
+        capacity: Optional[int] = None,
+        warm_size: Optional[int] = None
+    ):
+        """
+        Initialize the cache
+
+        Args:
+            client: Database client used to upsert unknown domains
+            capacity: Maximum cached names (ids and blocked names together)
+            warm_size: Top mentioned domains loaded by warm()
+        """
+        self.client = client
+        self.capacity = capacity or config.domain_cache_size
+        self.warm_size = warm_size if warm_size is not None else config.domain_cache_warm_size
+
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._filter_generation = DomainExtractor.domain_filter.reload_count
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.warmed = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, name: str, value: Any):
+        self._entries[name] = value
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _check_filter(self):
+        """Re-evaluate cached entries after the blocklist was reloaded"""
+        domain_filter = DomainExtractor.domain_filter
+        if domain_filter.reload_count == self._filter_generation:
+            return
+        self._filter_generation = domain_filter.reload_count
+
+        for name, value in list(self._entries.items()):
+            if (value is BLOCKED) != domain_filter.is_blocked(name):
+                del self._entries[name]
+
+    async def warm(self, limit: Optional[int] = None) -> int:
+        """
+        Load the most mentioned domains so common spam resolves without a lookup
+
+        Returns:
+            Number of domains loaded
+        """
+        limit = self.warm_size if limit is None else limit
+        if limit <= 0:
+            return 0
+
+        try:
+            rows = await self.client.get_top_domains(min(limit, self.capacity))
+        except Exception as e:
+            logger.error("domain_cache_warm_failed", error=str(e))
+            return 0
+
+        # Least mentioned first, so the most mentioned end up most recently used
+        for row in reversed(rows):
+            self._put(row["domain_name"], row["id"])
+        self.warmed = len(rows)
+        logger.info("domain_cache_warmed", domains=len(rows))
+        return len(rows)
+
+    async def resolve(self, domains: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Map domain names to their ids, upserting the ones not cached
+
+        Unknown domains are upserted in one batch without counting mentions
+        (the domain_mention trigger counts those).
+
+        Args:
+            domains: Domain names as found in comments
+
+        Returns:
+            Mapping of normalized domain name to id; blocked names map to None
+        """
+        self._check_filter()
+        domain_filter = DomainExtractor.domain_filter
+
+        resolved: Dict[str, Optional[str]] = {}
+        missing: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for name in dict.fromkeys(filter(None, map(DomainExtractor.normalize_domain, domains))):
+            value = self._entries.get(name)
+            if value is BLOCKED:
+                self._entries.move_to_end(name)
+                self.negative_hits += 1
+                resolved[name] = None
+            elif value is not None:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                resolved[name] = value
+            elif domain_filter.is_blocked(name):
+                self.misses += 1
+                self._put(name, BLOCKED)
+                resolved[name] = None
+            elif name in self._inflight:
+                self.hits += 1
+                waiting[name] = self._inflight[name]
+            else:
+                self.misses += 1
+                missing.append(name)
+
+        if missing:
+            resolved.update(await self._fetch(missing))
+
+        for name, future in waiting.items():
+            resolved[name] = (await asyncio.shield(future)).get(name)
+
+        return resolved
+
+    async def _fetch(self, names: List[str]) -> Dict[str, str]:
+        """Upsert uncached names, sharing the result with concurrent callers"""
+        future = asyncio.get_running_loop().create_future()
+        for name in names:
+            self._inflight[name] = future
+
+        try:
+            ids = await self.client.upsert_domains(names, count_mentions=False)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here; waiters re-raise it
+            raise
+        else:
+            future.set_result(ids)
+        finally:
+            for name in names:
+                self._inflight.pop(name, None)
+
+        for name, domain_id in ids.items():
+            self._put(name, domain_id)
+        return ids
+
+    def clear(self):
+        """Drop every cached entry"""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size for monitoring"""
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "blocked_entries": sum(1 for value in self._entries.values() if value is BLOCKED),
+            "capacity": self.capacity,
+            "evictions": self.evictions,
+            "warmed": self.warmed
+        }
+
+
+# Global domain id cache instance
+domain_cache = DomainIdCache(db_client)
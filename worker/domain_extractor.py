@@ -1,16 +1,73 @@
 """Domain extraction utilities for TikTok comments."""
+import asyncio
 import re
-from typing import List, Set, Optional
+import string
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Set, Optional, Tuple, Union
 from urllib.parse import urlparse
 
+import public_suffix
+from domain_filter import DomainFilter
+from extraction_cache import ExtractionCache, text_key
+from public_suffix import DomainParts
+
+
+class DomainMatch(NamedTuple):
+    """A single domain found in a piece of text."""
+    text: str
+    normalized: str
+    start: int
+    end: int
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        """Character span of the match in the source text."""
+        return (self.start, self.end)
+
+
+class DomainClassification:
+    """Cached classification of a single domain (treat as read-only)."""
+    __slots__ = ('normalized', 'category', 'is_shortener', 'registrable_domain')
+    
+    def __init__(self, normalized: Optional[str], category: str,
+                 is_shortener: bool, registrable_domain: Optional[str]):
+        self.normalized = normalized
+        self.category = category
+        self.is_shortener = is_shortener
+        self.registrable_domain = registrable_domain
+    
+    def __repr__(self) -> str:
+        return (f"DomainClassification(normalized={self.normalized!r}, "
+                f"category={self.category!r}, is_shortener={self.is_shortener!r}, "
+                f"registrable_domain={self.registrable_domain!r})")
+
+
 class DomainExtractor:
     """Extract and normalize domains from text content."""
     
-    # URL pattern to match domains (negative lookbehind to exclude emails)
-    DOMAIN_PATTERN = re.compile(
-        r'(?<![@])(?:https?://)?(?:www\.)?([a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*\.[a-zA-Z]{2,})',
-        re.IGNORECASE
-    )
+    # Maximal runs of ASCII hostname characters that contain a dot. The
+    # lookbehind only lets a match start at the beginning of a run, so failed
+    # attempts cost O(1) and tokenizing stays linear in the length of the text;
+    # labels inside each run are then validated in one left-to-right pass.
+    HOST_RUN_PATTERN = re.compile(r'(?<![A-Za-z0-9.\-])[A-Za-z0-9\-]*\.[A-Za-z0-9.\-]*')
+    
+    # Same tokenizer for raw UTF-8 bytes (see extract_matches_bytes)
+    HOST_RUN_BYTES_PATTERN = re.compile(rb'(?<![A-Za-z0-9.\-])[A-Za-z0-9\-]*\.[A-Za-z0-9.\-]*')
+    
+    # Schemes that are folded into a match's span when they precede a host
+    SCHEME_PREFIXES = ('https://', 'http://')
+    
+    # Byte-level schemes, including the JSON-escaped form "https:\/\/"
+    SCHEME_BYTES_PREFIXES = (b'https://', b'http://', b'https:\\/\\/', b'http:\\/\\/')
+    
+    # A TLD is the run of these at the start of a label
+    TLD_LETTERS = string.ascii_letters
+    
+    MAX_LABEL_LENGTH = 63
+    MAX_DOMAIN_LENGTH = 253
     
     # URL shorteners to identify
     URL_SHORTENERS = {
@@ -18,27 +75,429 @@ class DomainExtractor:
         'buff.ly', 'short.link', 'surl.li', 'is.gd', 'cli.gs'
     }
     
-    # Domains to exclude from extraction
+    SUSPICIOUS_TLDS = ('.tk', '.ml', '.ga', '.cf')
+    IP_ADDRESS_PATTERN = re.compile(r'^\d+\.\d+\.\d+\.\d+$')
+    
+    # Upper bound on memoized classify() results
+    CLASSIFICATION_CACHE_SIZE = 65536
+    
+    # Domains to exclude from extraction, always blocked on top of the
+    # bundled blocklist file (data/domain_blocklist.txt)
     BLACKLISTED_DOMAINS = {
         'tiktok.com', 'instagram.com', 'facebook.com', 'twitter.com',
         'youtube.com', 'google.com', 'amazon.com', 'apple.com'
     }
     
+    # Suffix-aware block/allow lists; blocking a domain blocks its subdomains
+    domain_filter = DomainFilter(BLACKLISTED_DOMAINS)
+    
+    # Scan results for verbatim-repeated comments (None disables caching).
+    # Results are cached before blocklist filtering, so list reloads apply
+    # to cached comments too.
+    extraction_cache: Optional[ExtractionCache] = ExtractionCache()
+    
+    # Batches smaller than this are never worth shipping to another process
+    MIN_PARALLEL_BATCH = 2000
+    
+    # Long-lived process pool for batch extraction, created on first use
+    # and released by shutdown_pool() when the worker stops
+    _pool: Optional[ProcessPoolExecutor] = None
+    _pool_workers = 0
+    
+    # Pathological-input guard: text beyond MAX_TEXT_LENGTH is ignored, and
+    # longer texts are scanned in windows with the time budget checked in
+    # between. Windows read up to SCAN_OVERLAP characters past their end so
+    # a host (plus scheme) crossing a boundary is kept whole.
+    MAX_TEXT_LENGTH = 100_000
+    SCAN_WINDOW = 8192
+    SCAN_OVERLAP = MAX_DOMAIN_LENGTH + len('https://')
+    TIME_BUDGET_SECONDS = 0.05
+    
+    # Cheap fallback once the budget is spent: only hosts behind a scheme or "www."
+    ANCHORED_HOST_PATTERN = re.compile(r'(?:https?://|(?=www\.))([A-Za-z0-9\-]+(?:\.[A-Za-z0-9\-]+)+)', re.IGNORECASE)
+    
+    guard_stats = {'long_texts': 0, 'truncated': 0, 'over_budget': 0}
+    
     @classmethod
     def extract_domains(cls, text: str) -> List[str]:
         """Extract domains from text."""
-        if not text:
+        return [match.normalized for match in cls.extract_matches(text)]
+    
+    @classmethod
+    def extract_matches(cls, text: str) -> List[DomainMatch]:
+        """Extract domains from text along with their positions.
+        
+        Each normalized domain is reported once, at its first occurrence.
+        """
+        if not text or '.' not in text:
+            return []
+        
+        if len(text) > cls.SCAN_WINDOW:
+            # Too big to be worth caching, and the result may be degraded
+            candidates = cls._scan_long(text)
+        elif cls.extraction_cache is None:
+            candidates = cls._scan(text)
+        else:
+            cache = cls.extraction_cache
+            key = text_key(text)
+            candidates = cache.get(key)
+            if candidates is None:
+                candidates = cls._scan(text)
+                cache.put(key, candidates)
+        
+        is_blocked = cls.domain_filter.is_blocked
+        return [match for match in candidates if not is_blocked(match.normalized)]
+    
+    @classmethod
+    def _scan(cls, text: str) -> Tuple[DomainMatch, ...]:
+        """Scan text for domains, before blocklist filtering."""
+        seen = set()
+        results = []
+        
+        for run in cls.HOST_RUN_PATTERN.finditer(text):
+            start = run.start()
+            # Skip email addresses and tails of accented Latin words (e.g. "münchen.de")
+            if start and cls._continues_word(text[start - 1]):
+                continue
+            
+            for host_start, host_end, domain in cls._scan_run(run.group(), start):
+                if domain in seen:
+                    continue
+                seen.add(domain)
+                match_start = cls._scheme_start(text, host_start)
+                results.append(DomainMatch(text[match_start:host_end], domain, match_start, host_end))
+        
+        return tuple(results)
+    
+    @classmethod
+    def _scan_long(cls, text: str) -> Tuple[DomainMatch, ...]:
+        """Scan a long text window by window under the length and time limits.
+        
+        Each run is handled by the window it starts in. Once the time budget
+        is spent, the rest of the text goes through _scan_anchored instead.
+        """
+        stats = cls.guard_stats
+        stats['long_texts'] += 1
+        
+        limit = len(text)
+        if limit > cls.MAX_TEXT_LENGTH:
+            limit = cls.MAX_TEXT_LENGTH
+            stats['truncated'] += 1
+        
+        deadline = time.perf_counter() + cls.TIME_BUDGET_SECONDS
+        pattern = cls.HOST_RUN_PATTERN
+        seen = set()
+        results = []
+        pos = 0
+        
+        while pos < limit:
+            if time.perf_counter() > deadline:
+                stats['over_budget'] += 1
+                cls._scan_anchored(text, pos, limit, seen, results)
+                break
+            
+            end = min(limit, pos + cls.SCAN_WINDOW)
+            # Runs crossing the window end (or the length cap) are read on for
+            # up to SCAN_OVERLAP characters; later windows skip their tails
+            for run in pattern.finditer(text, pos, min(len(text), end + cls.SCAN_OVERLAP)):
+                start = run.start()
+                if start >= end:
+                    break
+                if start and cls._continues_word(text[start - 1]):
+                    continue
+                
+                for host_start, host_end, domain in cls._scan_run(run.group(), start):
+                    if domain in seen:
+                        continue
+                    seen.add(domain)
+                    match_start = cls._scheme_start(text, host_start)
+                    results.append(DomainMatch(text[match_start:host_end], domain, match_start, host_end))
+            pos = end
+        
+        return tuple(results)
+    
+    @classmethod
+    def _scan_anchored(cls, text: str, pos: int, limit: int, seen: Set[str], results: List[DomainMatch]):
+        """Find only scheme- or "www."-prefixed hosts in text[pos:limit]."""
+        for anchored in cls.ANCHORED_HOST_PATTERN.finditer(text, pos, limit):
+            host_start = anchored.start(1)
+            for start, host_end, domain in cls._scan_run(anchored.group(1), host_start):
+                if domain in seen:
+                    continue
+                seen.add(domain)
+                match_start = cls._scheme_start(text, start)
+                results.append(DomainMatch(text[match_start:host_end], domain, match_start, host_end))
+    
+    @classmethod
+    def extract_matches_bytes(cls, data: Union[bytes, bytearray, memoryview]) -> List[DomainMatch]:
+        """Extract domains from raw UTF-8 bytes without decoding the payload.
+        
+        Intended for HTTP/JSON comment bodies: only the ASCII bytes of each
+        hit are decoded, and byte spans are converted to character offsets
+        for hits alone, so payloads without domains are never decoded or
+        copied. JSON string escapes directly before a host ("\\n", "\\/",
+        "\\u00fc") are understood. Offsets are relative to the raw payload.
+        """
+        if not data:
             return []
         
-        domains = set()
-        matches = cls.DOMAIN_PATTERN.finditer(text)
+        view = memoryview(data)
+        if len(view) > cls.MAX_TEXT_LENGTH:
+            # The cap is applied in bytes here, which is never more text than the str path
+            view = view[:cls.MAX_TEXT_LENGTH]
+            cls.guard_stats['truncated'] += 1
+        seen = set()
+        results = []
+        last_byte = 0   # byte offset up to which characters have been counted
+        last_char = 0   # character offset corresponding to last_byte
         
-        for match in matches:
-            domain = cls.normalize_domain(match.group(1))
-            if domain and cls.is_valid_domain(domain):
-                domains.add(domain)
+        for run in cls.HOST_RUN_BYTES_PATTERN.finditer(view):
+            start = run.start()
+            run_bytes = run.group()
+            
+            skip = cls._bytes_prefix_skip(view, start, run_bytes)
+            if skip < 0:
+                continue
+            
+            run_text = run_bytes[skip:].decode('ascii')
+            for host_start, host_end, domain in cls._scan_run(run_text, start + skip):
+                if domain in seen or cls.domain_filter.is_blocked(domain):
+                    continue
+                seen.add(domain)
+                
+                match_start = cls._scheme_start_bytes(view, host_start)
+                last_char += len(str(view[last_byte:match_start], 'utf-8', 'replace'))
+                last_byte = match_start
+                
+                matched = bytes(view[match_start:host_end]).decode('ascii')
+                char_start = last_char
+                results.append(DomainMatch(matched, domain, char_start, char_start + len(matched)))
+        
+        return results
+    
+    @staticmethod
+    def _escapes_next(view: memoryview, start: int) -> bool:
+        """Whether the byte at start is escaped: an odd run of backslashes precedes it."""
+        count = 0
+        while count < start and view[start - 1 - count] == 0x5C:
+            count += 1
+        return count % 2 == 1
+    
+    @classmethod
+    def _bytes_prefix_skip(cls, view: memoryview, start: int, run: bytes) -> int:
+        """How many leading bytes of a run to drop, or -1 to skip the run.
+        
+        Mirrors _continues_word for bytes, decoding at most one preceding
+        character, and strips JSON escape letters glued to the run.
+        """
+        if not start:
+            return 0
+        
+        previous = view[start - 1]
+        if previous == 0x40:  # '@'
+            return -1
+        
+        if previous == 0x5C and cls._escapes_next(view, start):
+            # JSON escape such as \n or \u00fc
+            if run[:1] in (b'u', b'U') and len(run) >= 5:
+                try:
+                    escaped = chr(int(run[1:5], 16))
+                except ValueError:
+                    return 1
+                return -1 if cls._continues_word(escaped) else 5
+            return 1
+        
+        if previous >= 0x80:
+            # Walk back to the first byte of the preceding UTF-8 character
+            char_start = start - 1
+            while char_start > max(0, start - 4) and 0x80 <= view[char_start] < 0xC0:
+                char_start -= 1
+            char = str(view[char_start:start], 'utf-8', 'replace')
+            if char and cls._continues_word(char[-1]):
+                return -1
+        
+        return 0
+    
+    @classmethod
+    def _scheme_start_bytes(cls, view: memoryview, host_start: int) -> int:
+        """Byte-level counterpart of _scheme_start."""
+        prefix = bytes(view[max(0, host_start - 10):host_start]).lower()
+        for scheme in cls.SCHEME_BYTES_PREFIXES:
+            if prefix.endswith(scheme):
+                return host_start - len(scheme)
+        return host_start
+    
+    @staticmethod
+    def _continues_word(char: str) -> bool:
+        """Whether a host run preceded by char is part of a larger token.
+        
+        Only email addresses and accented Latin words ("münchen.de") qualify;
+        CJK or Cyrillic text glued to a domain ("请访问example.com") does not.
+        """
+        return char == '@' or (
+            char >= '\x80' and char.isalpha() and unicodedata.name(char, '').startswith('LATIN ')
+        )
+    
+    @classmethod
+    def _scheme_start(cls, text: str, host_start: int) -> int:
+        """Return the start of an http(s) scheme directly before host_start."""
+        if host_start < 3 or text[host_start - 3:host_start] != '://':
+            return host_start
         
-        return list(domains)
+        prefix = text[max(0, host_start - 8):host_start].lower()
+        for scheme in cls.SCHEME_PREFIXES:
+            if prefix.endswith(scheme):
+                return host_start - len(scheme)
+        return host_start
+    
+    @classmethod
+    def _scan_run(cls, run: str, offset: int) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, normalized domain) for each domain in a host run.
+        
+        The run is walked label by label. Consecutive well-formed labels form
+        a candidate, which ends at the leading letters of its last label that
+        starts with two or more letters, so "example.com123" and
+        "example.com-promo" yield example.com as DOMAIN_PATTERN used to.
+        Empty or malformed labels close the candidate.
+        """
+        if '.' not in run:
+            return
+        
+        first = -1          # index of the candidate's first label
+        first_pos = 0       # offset of the candidate's first label in run
+        tld = -1            # index of the candidate's last TLD-like label
+        tld_end = 0         # offset just past that label's leading letters
+        pos = 0
+        
+        for index, label in enumerate(run.split('.')):
+            label_end = pos + len(label)
+            
+            if first < 0:
+                # Leading hyphens are punctuation ("--example.com"), not part of the host
+                stripped = label.lstrip('-')
+                if stripped and cls._is_valid_label(stripped):
+                    first, first_pos, tld = index, label_end - len(stripped), -1
+            else:
+                letters = len(label) - len(label.lstrip(cls.TLD_LETTERS))
+                if letters >= 2:
+                    tld, tld_end = index, pos + letters
+                if not cls._is_valid_label(label):
+                    if tld >= 0:
+                        yield from cls._emit(run, offset, first_pos, tld_end)
+                    first, tld = -1, -1
+                    stripped = label.lstrip('-')
+                    if stripped and cls._is_valid_label(stripped):
+                        first, first_pos = index, label_end - len(stripped)
+            
+            pos = label_end + 1
+        
+        if first >= 0 and tld >= 0:
+            yield from cls._emit(run, offset, first_pos, tld_end)
+    
+    @classmethod
+    def _emit(cls, run: str, offset: int, first_pos: int, tld_end: int) -> Iterator[Tuple[int, int, str]]:
+        """Normalize a candidate found by _scan_run and yield it if valid."""
+        domain = run[first_pos:tld_end].lower()
+        
+        while domain.startswith('www.'):
+            domain = domain[4:]
+        
+        if '.' in domain and 4 <= len(domain) <= cls.MAX_DOMAIN_LENGTH:
+            yield (offset + first_pos, offset + tld_end, domain)
+    
+    @classmethod
+    def _is_valid_label(cls, label: str) -> bool:
+        """Check a single hostname label (characters are already ASCII host chars)."""
+        return (
+            0 < len(label) <= cls.MAX_LABEL_LENGTH
+            and label[0] != '-'
+            and label[-1] != '-'
+        )
+    
+    @classmethod
+    def extract_domains_batch(
+        cls,
+        texts: Iterable[str],
+        max_workers: Optional[int] = None,
+        chunk_size: int = 500
+    ) -> List[List[DomainMatch]]:
+        """Extract domains from many texts in one call.
+        
+        Blocks until the batch is done; use extract_domains_batch_async from
+        the event loop.
+        
+        Args:
+            texts: Comment texts to scan
+            max_workers: Spread the batch over this many processes; None or 1
+                keeps extraction in the calling process
+            chunk_size: Number of texts handed to a worker process at a time
+        
+        Returns:
+            One list of matches per input text, in input order
+        """
+        texts = list(texts)
+        
+        if not cls._use_pool(texts, max_workers):
+            return _extract_chunk(texts)
+        
+        results = []
+        pool = cls._get_pool(max_workers)
+        for chunk_result in pool.map(_extract_chunk, cls._chunks(texts, chunk_size)):
+            results.extend(chunk_result)
+        
+        return results
+    
+    @classmethod
+    async def extract_domains_batch_async(
+        cls,
+        texts: Iterable[str],
+        max_workers: Optional[int] = None,
+        chunk_size: int = 500
+    ) -> List[List[DomainMatch]]:
+        """Like extract_domains_batch, but runs off the event loop.
+        
+        Small batches go to the loop's default thread executor; larger ones
+        are spread over the shared process pool.
+        """
+        texts = list(texts)
+        loop = asyncio.get_running_loop()
+        
+        if not cls._use_pool(texts, max_workers):
+            return await loop.run_in_executor(None, _extract_chunk, texts)
+        
+        pool = cls._get_pool(max_workers)
+        chunk_results = await asyncio.gather(*(
+            loop.run_in_executor(pool, _extract_chunk, chunk)
+            for chunk in cls._chunks(texts, chunk_size)
+        ))
+        return [matches for chunk_result in chunk_results for matches in chunk_result]
+    
+    @classmethod
+    def _use_pool(cls, texts: List[str], max_workers: Optional[int]) -> bool:
+        """Whether a batch is worth shipping to worker processes."""
+        return bool(max_workers and max_workers > 1 and len(texts) >= cls.MIN_PARALLEL_BATCH)
+    
+    @staticmethod
+    def _chunks(texts: List[str], chunk_size: int) -> List[List[str]]:
+        """Split a batch into chunks of at most chunk_size texts."""
+        return [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    
+    @classmethod
+    def _get_pool(cls, max_workers: int) -> ProcessPoolExecutor:
+        """Return the shared process pool, (re)creating it for a new size."""
+        if cls._pool is None or cls._pool_workers != max_workers:
+            cls.shutdown_pool()
+            cls._pool = ProcessPoolExecutor(max_workers=max_workers)
+            cls._pool_workers = max_workers
+        return cls._pool
+    
+    @classmethod
+    def shutdown_pool(cls):
+        """Stop the batch extraction worker processes, if any were started."""
+        if cls._pool is not None:
+            cls._pool.shutdown(cancel_futures=True)
+            cls._pool = None
+            cls._pool_workers = 0
     
     @classmethod
     def normalize_domain(cls, domain: str) -> Optional[str]:
@@ -69,8 +528,8 @@ class DomainExtractor:
         if domain.startswith('.') or domain.endswith('.'):
             return False
         
-        # Check if blacklisted
-        if domain in cls.BLACKLISTED_DOMAINS:
+        # Check if blacklisted (including subdomains of blacklisted domains)
+        if cls.domain_filter.is_blocked(domain):
             return False
         
         # Basic validation
@@ -89,34 +548,115 @@ class DomainExtractor:
         
         return True
     
+    @classmethod
+    def split_domain(cls, domain: str) -> Optional[DomainParts]:
+        """Split a domain into subdomain, registrable domain and public suffix."""
+        normalized = cls.normalize_domain(domain)
+        if not normalized:
+            return None
+        return public_suffix.split_domain(normalized)
+    
+    @classmethod
+    def registrable_domain(cls, domain: str) -> Optional[str]:
+        """Get the registrable domain (eTLD+1), e.g. shop.example.co.uk -> example.co.uk."""
+        parts = cls.split_domain(domain)
+        return parts.registrable_domain if parts else None
+    
+    @classmethod
+    def public_suffix(cls, domain: str) -> Optional[str]:
+        """Get the public suffix of a domain, e.g. shop.example.co.uk -> co.uk."""
+        parts = cls.split_domain(domain)
+        return parts.suffix if parts else None
+    
     @classmethod
     def is_url_shortener(cls, domain: str) -> bool:
         """Check if a domain is a known URL shortener."""
-        normalized = cls.normalize_domain(domain)
-        return normalized in cls.URL_SHORTENERS if normalized else False
+        return cls.classify(domain).is_shortener
     
     @classmethod
     def categorize_domain(cls, domain: str) -> str:
         """Categorize a domain based on its characteristics."""
+        return cls.classify(domain).category
+    
+    @classmethod
+    def classify(cls, domain: str) -> DomainClassification:
+        """Normalize, categorize and split a domain in one memoized call.
+        
+        The same spam domains repeat across many comments, so results are
+        kept in a size-bounded LRU cache (see configure_classification_cache).
+        """
+        return _classify_cached(domain)
+    
+    @classmethod
+    def _classify(cls, domain: str) -> DomainClassification:
+        """Uncached classification behind classify()."""
         normalized = cls.normalize_domain(domain)
         if not normalized:
-            return 'invalid'
+            return DomainClassification(None, 'invalid', False, None)
         
-        if cls.is_url_shortener(normalized):
-            return 'shortener'
+        if normalized in cls.URL_SHORTENERS:
+            return DomainClassification(normalized, 'shortener', True, normalized)
         
-        # Check for IP addresses
-        if re.match(r'^\d+\.\d+\.\d+\.\d+$', normalized):
-            return 'suspicious'
+        # IP addresses have no registrable domain
+        if cls.IP_ADDRESS_PATTERN.match(normalized):
+            return DomainClassification(normalized, 'suspicious', False, None)
         
-        # Check for suspicious TLDs
-        suspicious_tlds = {'.tk', '.ml', '.ga', '.cf'}
-        for tld in suspicious_tlds:
-            if normalized.endswith(tld):
-                return 'suspicious'
+        category = 'standard'
         
-        # Check for excessive numbers
-        if len(re.findall(r'\d', normalized)) > 10:
-            return 'suspicious'
+        # Check for suspicious TLDs and excessive numbers
+        if normalized.endswith(cls.SUSPICIOUS_TLDS):
+            category = 'suspicious'
+        elif sum(map(str.isdigit, normalized)) > 10:
+            category = 'suspicious'
         
-        return 'standard'
\ No newline at end of file
+        registrable = public_suffix.split_domain(normalized).registrable_domain
+        return DomainClassification(normalized, category, False, registrable)
+    
+    @classmethod
+    def configure_classification_cache(cls, maxsize: int):
+        """Resize the classify() cache, discarding its current contents."""
+        global _classify_cached
+        cls.CLASSIFICATION_CACHE_SIZE = maxsize
+        _classify_cached = lru_cache(maxsize=maxsize)(cls._classify)
+    
+    @classmethod
+    def configure_extraction_cache(cls, max_bytes: int, path: Optional[str] = None):
+        """Replace the verbatim-comment cache; max_bytes <= 0 disables it."""
+        if max_bytes <= 0:
+            cls.extraction_cache = None
+            return
+        cls.extraction_cache = ExtractionCache(max_bytes=max_bytes, path=path)
+        cls.extraction_cache.load(DomainMatch)
+    
+    @classmethod
+    def configure_limits(cls, max_text_length: int, time_budget_ms: float):
+        """Set the per-comment length cap and scan time budget."""
+        cls.MAX_TEXT_LENGTH = max_text_length
+        cls.TIME_BUDGET_SECONDS = time_budget_ms / 1000
+    
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        """Cache and filter statistics for the /metrics endpoint."""
+        info = _classify_cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "classification_cache": {
+                "hits": info.hits,
+                "misses": info.misses,
+                "hit_rate": info.hits / lookups if lookups else 0.0,
+                "size": info.currsize,
+                "max_size": info.maxsize
+            },
+            "domain_filter": cls.domain_filter.stats(),
+            "text_cache": cls.extraction_cache.stats() if cls.extraction_cache else None,
+            "input_guard": dict(cls.guard_stats)
+        }
+
+
+_classify_cached = lru_cache(maxsize=DomainExtractor.CLASSIFICATION_CACHE_SIZE)(DomainExtractor._classify)
+
+
+def _extract_chunk(texts: List[str]) -> List[List[DomainMatch]]:
+    """Extract matches for a list of texts (module level so it pickles)."""
+    extract = DomainExtractor.extract_matches
+    return [extract(text) for text in texts]
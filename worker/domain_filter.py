@@ -0,0 +1,167 @@
+"""
+Suffix-aware domain block/allow lists
+
+Entries match a domain and all of its subdomains: blocking "tiktok.com"
+also blocks "m.tiktok.com" and "vm.tiktok.com". Lookups hash each suffix of
+the queried domain, so the cost is O(labels) regardless of list size, and
+the lists can be reloaded from disk while the worker is running.
+"""
+
+import os
+import threading
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_BLOCKLIST_PATH = os.path.join(DATA_DIR, "domain_blocklist.txt")
+
+
+def _normalize_entry(entry: str) -> Optional[str]:
+    """Normalize a list entry, dropping comments and wildcard prefixes"""
+    entry = entry.split("#", 1)[0].strip().lower()
+    if entry.startswith("*."):
+        entry = entry[2:]
+    entry = entry.strip(".")
+    return entry or None
+
+
+def _suffixes(domain: str) -> Iterator[str]:
+    """Yield domain and each parent domain, most specific first"""
+    yield domain
+    dot = domain.find(".")
+    while dot != -1:
+        yield domain[dot + 1:]
+        dot = domain.find(".", dot + 1)
+
+
+def _file_signature(path: Optional[str]) -> Optional[Tuple[float, int]]:
+    """Modification time and size used to detect list changes"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def _read_entries(path: Optional[str]) -> FrozenSet[str]:
+    """Read a list file into a set of normalized entries"""
+    if not path:
+        return frozenset()
+    
+    entries = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = _normalize_entry(line)
+            if entry:
+                entries.add(entry)
+    return frozenset(entries)
+
+
+class DomainFilter:
+    """Blocklist/allowlist matcher with file-backed hot reload"""
+    
+    def __init__(self, builtin_blocked: Iterable[str] = (),
+                 blocklist_path: Optional[str] = DEFAULT_BLOCKLIST_PATH,
+                 allowlist_path: Optional[str] = None):
+        """
+        Initialize the filter
+        
+        Args:
+            builtin_blocked: Entries that are always blocked, in addition to the file
+            blocklist_path: File of blocked domains (None for no file)
+            allowlist_path: File of allowed domains; an allow entry overrides a
+                less specific block entry (e.g. allow "shop.example.com" under
+                a block on "example.com")
+        """
+        self._builtin = frozenset(filter(None, map(_normalize_entry, builtin_blocked)))
+        self.blocklist_path = blocklist_path
+        self.allowlist_path = allowlist_path
+        self._rules: Optional[Dict[str, bool]] = None
+        self._signatures: Tuple = ()
+        self._lock = threading.Lock()
+        self.blocked_count = 0
+        self.allowed_count = 0
+        self.reload_count = 0
+    
+    def configure(self, blocklist_path: Optional[str] = None,
+                  allowlist_path: Optional[str] = None):
+        """Point the filter at new list files and load them"""
+        if blocklist_path:
+            self.blocklist_path = blocklist_path
+        if allowlist_path:
+            self.allowlist_path = allowlist_path
+        self.reload()
+    
+    def _current_signatures(self) -> Tuple:
+        return (_file_signature(self.blocklist_path), _file_signature(self.allowlist_path))
+    
+    def reload(self):
+        """Load both lists from disk and swap them in atomically"""
+        with self._lock:
+            signatures = self._current_signatures()
+            blocked = self._builtin | _read_entries(self.blocklist_path)
+            allowed = _read_entries(self.allowlist_path)
+            
+            # One dict keyed by entry: True = blocked, False = allowed.
+            # Allow entries win when the same name appears in both lists.
+            rules = dict.fromkeys(blocked, True)
+            rules.update(dict.fromkeys(allowed, False))
+            
+            self._rules = rules
+            self._signatures = signatures
+            self.allowed_count = len(allowed)
+            self.blocked_count = len(rules) - len(allowed)
+            self.reload_count += 1
+        
+        logger.info("domain_filter_loaded",
+                   blocked=len(blocked),
+                   allowed=len(allowed),
+                   blocklist_path=self.blocklist_path,
+                   allowlist_path=self.allowlist_path)
+    
+    def reload_if_changed(self) -> bool:
+        """Reload the lists if either file changed on disk"""
+        if self._rules is not None and self._current_signatures() == self._signatures:
+            return False
+        
+        try:
+            self.reload()
+            return True
+        except OSError as e:
+            logger.error("domain_filter_reload_failed", error=str(e))
+            return False
+    
+    def _load_initial(self) -> Dict[str, bool]:
+        """Load the lists on first use, falling back to the built-in entries"""
+        try:
+            self.reload()
+        except OSError as e:
+            logger.error("domain_filter_load_failed", error=str(e))
+            self._rules = dict.fromkeys(self._builtin, True)
+            self.blocked_count = len(self._builtin)
+        return self._rules
+    
+    def is_blocked(self, domain: str) -> bool:
+        """Check whether a normalized domain or any parent domain is blocked"""
+        rules = self._rules
+        if rules is None:
+            rules = self._load_initial()
+        
+        for suffix in _suffixes(domain):
+            verdict = rules.get(suffix)
+            if verdict is not None:
+                return verdict
+        return False
+    
+    def stats(self) -> Dict[str, int]:
+        """Entry counts for monitoring"""
+        return {
+            "blocked_entries": self.blocked_count,
+            "allowed_entries": self.allowed_count,
+            "reload_count": self.reload_count
+        }
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Streaming domain extraction over exported comment dumps.
+
+Reads NDJSON/JSONL rows (plain, gzip or zstd; "-" for stdin), extracts
+domains with DomainExtractor in chunks spread across worker processes, and
+writes one NDJSON result per row as soon as its chunk completes. Only a
+bounded number of chunks is in flight at a time, so memory use does not
+grow with the size of the input.
+
+Usage:
+    python extract_stream.py comments.jsonl.gz -o domains.ndjson --workers 4
+    zstdcat dump.zst | python extract_stream.py - --text-field body > out.ndjson
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, TextIO
+
+import structlog
+
+from domain_extractor import DomainExtractor
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def open_input(raw: io.BufferedReader) -> IO[bytes]:
+    """Wrap a binary stream, transparently decompressing gzip/zstd."""
+    magic = raw.peek(4)[:4]
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=raw)
+
+    if magic == ZSTD_MAGIC:
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("Error: zstd input requires the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+
+    return raw
+
+
+def open_output(path: str) -> TextIO:
+    """Open the output file (gzip-compressed when it ends in .gz) or stdout."""
+    if path == '-':
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+def iter_rows(paths: Iterable[str], stats: Dict[str, int]) -> Iterator[dict]:
+    """Yield JSON objects from every input line, counting malformed rows."""
+    for path in paths:
+        raw = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        with raw, open_input(raw) as stream:
+            for line in io.TextIOWrapper(stream, encoding='utf-8', errors='replace'):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    stats['bad_rows'] += 1
+                    continue
+                if isinstance(row, dict):
+                    yield row
+                else:
+                    stats['bad_rows'] += 1
+
+
+def iter_chunks(rows: Iterator[dict], chunk_size: int) -> Iterator[List[dict]]:
+    """Group rows into lists of at most chunk_size."""
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def process_chunk(rows: List[dict], text_field: str, id_field: str,
+                  include_empty: bool) -> List[str]:
+    """Extract domains for a chunk and return serialized output lines.
+
+    Runs inside worker processes; serializing there keeps the parent
+    process down to reading input and writing output.
+    """
+    lines = []
+    for row in rows:
+        text = row.get(text_field)
+        matches = DomainExtractor.extract_matches(text) if isinstance(text, str) else []
+        if not matches and not include_empty:
+            continue
+
+        lines.append(json.dumps({
+            'id': row.get(id_field),
+            'domains': [
+                {
+                    'domain': match.normalized,
+                    'text': match.text,
+                    'start': match.start,
+                    'end': match.end
+                }
+                for match in matches
+            ]
+        }, ensure_ascii=False))
+    return lines
+
+
+def run(paths: List[str], output: TextIO, text_field: str = 'text', id_field: str = 'id',
+        workers: int = 1, chunk_size: int = 1000, include_empty: bool = False,
+        progress_interval: float = 5.0, progress: Optional[TextIO] = sys.stderr) -> Dict[str, float]:
+    """
+    Stream rows from paths through the extractor into output.
+
+    Returns:
+        Summary counters (rows, written, bad_rows, elapsed_seconds, rows_per_second)
+    """
+    stats = {'rows': 0, 'written': 0, 'bad_rows': 0}
+    worker = partial(process_chunk, text_field=text_field, id_field=id_field,
+                     include_empty=include_empty)
+    started = last_report = time.monotonic()
+
+    def emit(chunk_rows: int, lines: List[str]):
+        nonlocal last_report
+        for line in lines:
+            output.write(line)
+            output.write('\n')
+        stats['rows'] += chunk_rows
+        stats['written'] += len(lines)
+
+        now = time.monotonic()
+        if progress and now - last_report >= progress_interval:
+            last_report = now
+            rate = stats['rows'] / (now - started)
+            print(f"{stats['rows']:,} rows, {stats['written']:,} with domains, "
+                  f"{rate:,.0f} rows/s", file=progress)
+
+    chunks = iter_chunks(iter_rows(paths, stats), chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            emit(len(chunk), worker(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a fixed window of chunks in flight; results are written in
+            # input order as the oldest chunk completes.
+            pending = deque()
+            for chunk in chunks:
+                pending.append((len(chunk), executor.submit(worker, chunk)))
+                if len(pending) >= workers * 2:
+                    size, future = pending.popleft()
+                    emit(size, future.result())
+            while pending:
+                size, future = pending.popleft()
+                emit(size, future.result())
+
+    output.flush()
+    elapsed = time.monotonic() - started
+    summary = {
+        **stats,
+        'elapsed_seconds': elapsed,
+        'rows_per_second': stats['rows'] / elapsed if elapsed > 0 else 0.0
+    }
+
+    if progress:
+        print(f"Done: {summary['rows']:,} rows ({summary['bad_rows']:,} malformed), "
+              f"{summary['written']:,} written in {elapsed:.1f}s "
+              f"({summary['rows_per_second']:,.0f} rows/s)", file=progress)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Extract domains from NDJSON comment dumps")
+    parser.add_argument('inputs', nargs='+', help="Input files (.jsonl, .gz, .zst) or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="Output NDJSON file (.gz to compress), default stdout")
+    parser.add_argument('--text-field', default='text', help="Field holding the comment text")
+    parser.add_argument('--id-field', default='id', help="Field copied to the output as the row id")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per chunk sent to a worker")
+    parser.add_argument('--include-empty', action='store_true', help="Also write rows without domains")
+    parser.add_argument('--progress-interval', type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    # stdout may carry the NDJSON results, so keep log lines on stderr
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(sys.stderr))
+
+    output = open_output(args.output)
+    try:
+        run(args.inputs, output,
+            text_field=args.text_field,
+            id_field=args.id_field,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            include_empty=args.include_empty,
+            progress_interval=args.progress_interval)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
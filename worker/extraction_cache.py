@@ -0,0 +1,162 @@
+"""
+Content-addressed cache of domain extraction results
+
+Spam comments are copy-pasted verbatim across thousands of videos. Keying
+scan results by a 64-bit hash of the comment text turns every repeat into a
+single hash lookup. The cache is bounded by an estimate of its memory use
+and can be persisted to disk between worker restarts.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+CACHE_FORMAT_VERSION = 1
+
+# Rough per-entry cost of the dict slot, key int and result tuple
+ENTRY_OVERHEAD_BYTES = 200
+MATCH_OVERHEAD_BYTES = 120
+
+
+def text_key(text: str) -> int:
+    """64-bit content hash of a comment text (stable across processes)"""
+    digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _entry_size(value: Sequence[Tuple]) -> int:
+    """Estimate the memory held by one cached result"""
+    size = ENTRY_OVERHEAD_BYTES
+    for match in value:
+        size += MATCH_OVERHEAD_BYTES + len(match[0]) + len(match[1])
+    return size
+
+
+class ExtractionCache:
+    """Size-bounded LRU mapping text hashes to extraction results"""
+    
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, path: Optional[str] = None):
+        """
+        Initialize the cache
+        
+        Args:
+            max_bytes: Approximate memory budget for cached results
+            path: File used by load()/save() to persist the cache (optional)
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self._entries: "OrderedDict[int, Tuple]" = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: int) -> Optional[Tuple]:
+        """Return the cached result for key, marking it recently used"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def put(self, key: int, value: Tuple):
+        """Store a result, evicting least recently used entries over budget"""
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes_used -= _entry_size(previous)
+        
+        self._entries[key] = value
+        self.bytes_used += _entry_size(value)
+        
+        while self.bytes_used > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes_used -= _entry_size(evicted)
+            self.evictions += 1
+    
+    def clear(self):
+        """Drop every cached entry"""
+        self._entries.clear()
+        self.bytes_used = 0
+    
+    def load(self, match_type: Any = tuple) -> int:
+        """
+        Load persisted entries from self.path
+        
+        Args:
+            match_type: Callable that rebuilds a match from its stored fields
+        
+        Returns:
+            Number of entries loaded
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_FORMAT_VERSION:
+                logger.warning("extraction_cache_version_mismatch", path=self.path)
+                return 0
+            
+            # Entries are stored least recently used first
+            for key, matches in data["entries"]:
+                self.put(int(key), tuple(match_type(*match) for match in matches))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error("extraction_cache_load_failed", path=self.path, error=str(e))
+            return 0
+        
+        logger.info("extraction_cache_loaded", path=self.path, entries=len(self._entries))
+        return len(self._entries)
+    
+    def save(self) -> bool:
+        """Atomically write the cache to self.path"""
+        if not self.path:
+            return False
+        
+        data = {
+            "version": CACHE_FORMAT_VERSION,
+            "entries": [[key, [list(match) for match in value]] for key, value in self._entries.items()]
+        }
+        
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            logger.error("extraction_cache_save_failed", path=self.path, error=str(e))
+            return False
+        
+        logger.info("extraction_cache_saved", path=self.path, entries=len(self._entries))
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory use for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
@@ -10,8 +10,13 @@ import structlog
 
 from config import config
 from database import db_client
+from write_buffer import write_buffer
+from comment_dedup import comment_dedup
+from domain_cache import domain_cache
+from outbox import outbox
 from rate_limiter import rate_limiter
 from browser import browser_manager
+from domain_extractor import DomainExtractor
 
 logger = structlog.get_logger()
 
@@ -125,7 +130,8 @@ class HealthCheckServer:
         response_data = {
             "ready": ready,
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "worker_id": config.worker_id
+            "worker_id": config.worker_id,
+            "outbox": outbox.status()
         }
         
         status_code = 200 if ready else 503
@@ -163,13 +169,19 @@ class HealthCheckServer:
                 "remaining_tokens": remaining_tokens,
                 "burst_size": burst_size,
                 "requests_per_minute": rate_limiter.requests_per_minute,
-                "using_local_fallback": rate_limiter.use_local_fallback
+                "using_local_fallback": rate_limiter.use_local_fallback,
+                **rate_limiter.metrics()
             },
             "browser": {
                 "max_concurrent": config.max_concurrent_browsers,
                 "active_contexts": len(browser_manager.contexts),
                 "headless": config.browser_headless
             },
+            "domain_extraction": DomainExtractor.metrics(),
+            "write_buffer": write_buffer.metrics(),
+            "domain_cache": domain_cache.stats(),
+            "comment_dedup": comment_dedup.stats(),
+            "outbox": outbox.status(),
             "scraping": {
                 "max_comment_pages": config.max_comment_pages,
                 "comments_per_page": config.comments_per_page,
@@ -239,9 +251,6 @@ class HealthCheckServer:
             except:
                 video_id = "test_video_123"
             
-            # Import domain extractor for testing
-            from domain_extractor import DomainExtractor
-            
             # Mock comment data for testing domain extraction
             mock_comments = [
                 "Check out this amazing deal at example.com!",
@@ -254,14 +263,18 @@ class HealthCheckServer:
             
             # Extract domains from mock comments
             extracted_domains = []
-            for comment_text in mock_comments:
-                domains = DomainExtractor.extract_domains(comment_text)
-                for domain in domains:
+            batch = await DomainExtractor.extract_domains_batch_async(mock_comments)
+            for comment_text, matches in zip(mock_comments, batch):
+                for match in matches:
+                    classification = DomainExtractor.classify(match.normalized)
                     extracted_domains.append({
-                        "domain": domain,
-                        "category": DomainExtractor.categorize_domain(domain),
-                        "is_shortener": DomainExtractor.is_url_shortener(domain),
-                        "source_comment": comment_text
+                        "domain": match.normalized,
+                        "category": classification.category,
+                        "is_shortener": classification.is_shortener,
+                        "registrable_domain": classification.registrable_domain,
+                        "source_comment": comment_text,
+                        "position_start": match.start,
+                        "position_end": match.end
                     })
             
             response_data = {
@@ -11,9 +11,13 @@ from datetime import datetime, timezone
 from logger import logger
 from config import config
 from database import db_client
+from write_buffer import write_buffer
+from domain_cache import domain_cache
+from outbox import outbox
 from rate_limiter import rate_limiter
 from browser import browser_manager
 from health import health_server
+from domain_extractor import DomainExtractor
 
 
 class Worker:
@@ -51,6 +55,31 @@ class Worker:
             if not await db_client.health_check():
                 raise Exception("Database connection failed")
             
+            # Start batching comment/domain/mention writes
+            write_buffer.start()
+            
+            # Open the durable outbox and replay anything left from the last run
+            await outbox.start()
+            
+            # Load domain block/allow lists
+            logger.info("loading_domain_filter")
+            DomainExtractor.domain_filter.configure(
+                blocklist_path=config.domain_blocklist_path,
+                allowlist_path=config.domain_allowlist_path
+            )
+            DomainExtractor.configure_classification_cache(config.classification_cache_size)
+            DomainExtractor.configure_extraction_cache(
+                config.extraction_cache_max_mb * 1024 * 1024,
+                path=config.extraction_cache_path
+            )
+            DomainExtractor.configure_limits(
+                config.extraction_max_text_length,
+                config.extraction_time_budget_ms
+            )
+            
+            # Preload ids of the most mentioned domains
+            await domain_cache.warm()
+            
             # Test rate limiter
             logger.info("testing_rate_limiter")
             if not await rate_limiter.health_check():
@@ -75,9 +104,25 @@ class Worker:
             # Stop health check server
             await health_server.stop()
             
+            # Wake tasks still waiting for rate limit tokens
+            await rate_limiter.close()
+            
             # Cleanup browser
             await browser_manager.cleanup()
             
+            # Stop draining the outbox (pending harvests stay on disk),
+            # flush buffered writes, then close pooled database connections
+            await outbox.close()
+            await write_buffer.close()
+            await db_client.aclose()
+            
+            # Persist the verbatim-comment cache for the next run
+            if DomainExtractor.extraction_cache:
+                DomainExtractor.extraction_cache.save()
+            
+            # Stop the batch extraction worker processes
+            DomainExtractor.shutdown_pool()
+            
             logger.info("all_components_cleaned_up")
             
         except Exception as e:
@@ -117,6 +162,9 @@ class Worker:
                 if self.shutdown_event.is_set():
                     break
                 
+                # Pick up edits to the domain block/allow lists
+                DomainExtractor.domain_filter.reload_if_changed()
+                
                 # In production, this would poll for jobs from a queue
                 # For now, we'll just sleep and log
                 logger.debug("worker_loop_iteration",
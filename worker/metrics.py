@@ -0,0 +1,64 @@
+"""
+Lightweight in-process metrics shared by worker components
+"""
+
+import bisect
+from typing import Dict, Any, Sequence
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with approximate percentiles"""
+
+    # Upper bucket bounds in milliseconds; anything slower lands in +Inf
+    DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets_ms: Sorted upper bounds of the buckets in milliseconds
+        """
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        """Record one duration given in seconds"""
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.buckets_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound (ms) of the bucket holding the given percentile"""
+        if not self.count:
+            return 0.0
+
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(self.buckets_ms):
+                    return min(float(self.buckets_ms[index]), self.max_ms)
+                break
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summary for the /metrics endpoint"""
+        return {
+            "count": self.count,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets_ms, self.counts)},
+                "le_inf": self.counts[-1]
+            }
+        }
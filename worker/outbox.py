@@ -0,0 +1,321 @@
+"""
+Durable local outbox for harvest results
+
+Every harvest is committed to a SQLite database (WAL mode, synchronous=FULL)
+before anything is sent to Supabase. A background task drains the outbox in
+batches, so a slow or unavailable database delays writes instead of losing
+them, and entries left over from a previous run are replayed on startup.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
+import structlog
+
+from config import config
+from database import SupabaseClient, db_client, is_payload_rejection, root_error
+
+logger = structlog.get_logger()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS outbox_dead (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+class Outbox:
+    """SQLite-backed outbox drained to Supabase in the background"""
+
+    def __init__(
+        self,
+        client: SupabaseClient,
+        path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        drain_interval: Optional[float] = None,
+        max_backoff: Optional[float] = None
+    ):
+        """
+        Initialize the outbox; the database file is opened by start().
+
+        Args:
+            client: Database client entries are drained to
+            path: SQLite database file
+            batch_size: Entries read per drain pass
+            drain_interval: Seconds between passes when the outbox is empty
+            max_backoff: Longest wait (seconds) between passes after failures
+        """
+        self.client = client
+        self.path = path or config.outbox_path
+        self.batch_size = batch_size or config.outbox_batch_size
+        self.drain_interval = drain_interval or config.outbox_drain_interval
+        self.max_backoff = max_backoff or config.outbox_max_backoff
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._retry_at: Optional[float] = None  # time.monotonic() of the next pass after a failure
+
+        self.depth = 0
+        self.oldest_created_at: Optional[float] = None
+        self.drained = 0
+        self.failures = 0
+        self.dead = 0
+        self.last_drain_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _open(self):
+        """Open the database and load current depth (runs in a thread)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        db.executescript(SCHEMA)
+        self._db = db
+        self._refresh_depth()
+        self.dead = db.execute("SELECT COUNT(*) FROM outbox_dead").fetchone()[0]
+
+    def _refresh_depth(self):
+        """Recount pending entries (caller holds the lock or owns the connection)"""
+        count, oldest = self._db.execute("SELECT COUNT(*), MIN(created_at) FROM outbox").fetchone()
+        self.depth = count
+        self.oldest_created_at = oldest
+
+    async def open(self):
+        """Open the database file without starting the drain task"""
+        if self._db is None:
+            await asyncio.to_thread(self._open)
+
+    async def start(self):
+        """Open the outbox and start draining, replaying entries from earlier runs"""
+        await self.open()
+        if self.depth:
+            logger.info("outbox_replaying", entries=self.depth, path=self.path)
+
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+            logger.info("outbox_started", path=self.path, depth=self.depth)
+
+    def _insert(self, kind: str, payload: str) -> int:
+        with self._db_lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (kind, payload, created_at) VALUES (?, ?, ?)",
+                (kind, payload, time.time())
+            )
+            self._refresh_depth()
+            return cursor.lastrowid
+
+    async def put_harvest(
+        self,
+        video: Dict[str, Any],
+        comments: List[Dict[str, Any]],
+        mentions: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Durably record a harvest for ingest_harvest.
+
+        Returns only after the entry is committed to disk.
+
+        Returns:
+            The outbox entry id
+        """
+        if self._db is None:
+            raise RuntimeError("outbox is not open")
+
+        payload = json.dumps({"video": video, "comments": comments, "mentions": mentions})
+        entry_id = await asyncio.to_thread(self._insert, "harvest", payload)
+        self._wakeup.set()
+        return entry_id
+
+    def _fetch(self) -> List[Tuple[int, str, str, int]]:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT id, kind, payload, attempts FROM outbox ORDER BY id LIMIT ?",
+                (self.batch_size,)
+            ).fetchall()
+
+    def _complete(self, done: List[int], dead: List[Tuple[int, str]], failed: Optional[Tuple[int, str]]):
+        """Delete drained entries, dead-letter rejected ones and note a failure, atomically"""
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in done])
+                now = time.time()
+                for entry_id, error in dead:
+                    self._db.execute(
+                        "INSERT INTO outbox_dead (id, kind, payload, created_at, attempts, last_error, failed_at) "
+                        "SELECT id, kind, payload, created_at, attempts + 1, ?, ? FROM outbox WHERE id = ?",
+                        (error, now, entry_id)
+                    )
+                    self._db.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+                if failed:
+                    self._db.execute(
+                        "UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                        (failed[1], failed[0])
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._refresh_depth()
+
+    async def _send(self, kind: str, payload: Dict[str, Any]):
+        """Deliver one entry to Supabase"""
+        if kind == "harvest":
+            await self.client.ingest_harvest(payload["video"], payload["comments"], payload["mentions"])
+        else:
+            raise ValueError(f"unknown outbox entry kind: {kind}")
+
+    async def drain_once(self) -> bool:
+        """
+        Deliver one batch of entries in order.
+
+        Stops at the first transient failure so entries are retried later.
+        Entries whose payload the database rejects (see is_payload_rejection)
+        are moved to outbox_dead; auth and missing-RPC errors are retried.
+
+        Returns:
+            True if the pass made no progress because of a failure
+        """
+        entries = await asyncio.to_thread(self._fetch)
+        done, dead, failed = [], [], None
+
+        for entry_id, kind, payload, attempts in entries:
+            try:
+                await self._send(kind, json.loads(payload))
+                done.append(entry_id)
+            except asyncio.CancelledError:
+                # Shutting down: keep what was delivered from being sent again
+                if done or dead:
+                    self._complete(done, dead, None)
+                raise
+            except Exception as e:
+                error = root_error(e)
+                if isinstance(error, ValueError) or is_payload_rejection(error):
+                    dead.append((entry_id, str(error)))
+                    logger.error("outbox_entry_rejected", entry_id=entry_id, kind=kind, error=str(error))
+                    continue
+                failed = (entry_id, str(error))
+                break
+
+        if done or dead or failed:
+            await asyncio.to_thread(self._complete, done, dead, failed)
+
+        self.drained += len(done)
+        self.dead += len(dead)
+        self.last_drain_at = time.time()
+        if failed:
+            self.failures += 1
+            self.last_error = failed[1]
+            logger.warning("outbox_drain_failed", entry_id=failed[0], error=failed[1], depth=self.depth)
+        elif done:
+            logger.debug("outbox_drained", entries=len(done), depth=self.depth)
+
+        return failed is not None and not done
+
+    async def _run(self):
+        """Drain continuously, backing off exponentially while Supabase fails"""
+        backoff = self.drain_interval
+        while not self._closing:
+            try:
+                stalled = await self.drain_once()
+            except Exception as e:
+                logger.error("outbox_drain_error", error=str(e))
+                stalled = True
+
+            if stalled:
+                backoff = min(backoff * 2, self.max_backoff)
+                self._retry_at = time.monotonic() + backoff
+            else:
+                backoff = self.drain_interval
+                self._retry_at = None
+                if self.depth:
+                    continue  # more entries waiting, keep going
+
+            await self._wait()
+
+    async def _wait(self):
+        """
+        Sleep until the next pass
+
+        New entries wake a healthy outbox at once, but after a failed pass
+        the loop sleeps until _retry_at however many entries arrive.
+        """
+        deadline = self._retry_at or time.monotonic() + self.drain_interval
+        while not self._closing:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return
+            if self._retry_at is None:
+                return
+
+    async def close(self):
+        """
+        Stop draining; pending entries stay on disk for the next start
+
+        An in-flight pass is cancelled rather than awaited, since with
+        Supabase down it could hold up shutdown for minutes of timeouts.
+        """
+        self._closing = True
+        self._wakeup.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._task = None
+
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+        logger.info("outbox_closed", pending=self.depth)
+
+    def status(self) -> Dict[str, Any]:
+        """Depth and drain lag for /ready and /metrics"""
+        lag = time.time() - self.oldest_created_at if self.oldest_created_at else 0.0
+        return {
+            "depth": self.depth,
+            "drain_lag_seconds": round(lag, 3),
+            "drained": self.drained,
+            "failures": self.failures,
+            "dead_letters": self.dead,
+            "last_drain_at": self.last_drain_at,
+            "last_error": self.last_error
+        }
+
+
+# Global outbox instance
+outbox = Outbox(db_client)
@@ -0,0 +1,206 @@
+"""
+Direct Postgres bulk-load backend using binary COPY
+
+Used by SupabaseClient for comment and domain_mention inserts when
+DATABASE_BACKEND=postgres. Rows are copied into a temporary staging table
+and merged into the real table in the same transaction, so the merge can
+skip duplicates and the domain_mention trigger still runs.
+"""
+
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Tuple
+
+import structlog
+
+try:
+    import asyncpg
+except ImportError:  # optional dependency, only needed for DATABASE_BACKEND=postgres
+    asyncpg = None
+
+logger = structlog.get_logger()
+
+
+def _uuid(value: Any) -> Optional[uuid.UUID]:
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+def _timestamp(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def _jsonb(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value if value is not None else {})
+
+
+# Columns loaded per table: (name, converter, client-side default). Omitted
+# columns (discovered_at, created_at, ...) keep their database defaults.
+COMMENT_COLUMNS: Tuple = (
+    ("id", _uuid, uuid.uuid4),
+    ("video_id", _uuid, None),
+    ("comment_id", None, None),
+    ("username", None, None),
+    ("text", None, None),
+    ("like_count", int, 0),
+    ("reply_count", int, 0),
+    ("is_reply", bool, False),
+    ("parent_comment_id", _uuid, None),
+    ("posted_at", _timestamp, None),
+    ("metadata", _jsonb, "{}"),
+)
+
+MENTION_COLUMNS: Tuple = (
+    ("id", _uuid, uuid.uuid4),
+    ("domain_id", _uuid, None),
+    ("comment_id", _uuid, None),
+    ("video_id", _uuid, None),
+    ("mention_text", None, None),
+    ("position_start", int, None),
+    ("position_end", int, None),
+    ("context", None, None),
+    ("confidence_score", Decimal, Decimal("1.00")),
+    ("extraction_method", None, "regex"),
+)
+
+
+def to_records(rows: List[Dict[str, Any]], columns: Tuple) -> List[Tuple]:
+    """Convert row dicts to COPY records, applying converters and defaults"""
+    records = []
+    for row in rows:
+        record = []
+        for name, convert, default in columns:
+            value = row.get(name)
+            if value is None:
+                value = default() if callable(default) else default
+            elif convert is not None:
+                value = convert(value)
+            record.append(value)
+        records.append(tuple(record))
+    return records
+
+
+class PostgresBulkLoader:
+    """Binary COPY loader on an asyncpg connection pool"""
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        server_settings: Optional[Dict[str, str]] = None
+    ):
+        """
+        Initialize the loader; the pool is created on first use.
+
+        Args:
+            dsn: Postgres connection string
+            min_size: Connections kept open
+            max_size: Maximum pooled connections
+            server_settings: Session settings for every connection (e.g. search_path)
+        """
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.server_settings = server_settings
+        self._pool = None
+
+    async def pool(self):
+        """Get the connection pool, creating it if needed"""
+        if self._pool is None:
+            if asyncpg is None:
+                raise RuntimeError(
+                    "DATABASE_BACKEND=postgres requires the 'asyncpg' package (pip install asyncpg)"
+                )
+            self._pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                server_settings=self.server_settings
+            )
+            logger.info("postgres_pool_created", min_size=self.min_size, max_size=self.max_size)
+        return self._pool
+
+    async def copy_rows(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        columns: Tuple,
+        returning: Optional[str] = None
+    ) -> Any:
+        """
+        COPY rows into a staging table and merge them into table.
+
+        Args:
+            returning: Column to return for each inserted row
+
+        Returns:
+            Number of rows inserted (duplicates are skipped), or the
+            returning column of the inserted rows
+        """
+        if not rows:
+            return [] if returning else 0
+
+        names = [name for name, _, _ in columns]
+        column_list = ", ".join(names)
+        stage = f"{table}_stage"
+        records = to_records(rows, columns)
+
+        pool = await self.pool()
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                await connection.execute(
+                    f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await connection.copy_records_to_table(stage, records=records, columns=names)
+                merge = (
+                    f"INSERT INTO {table} ({column_list}) "
+                    f"SELECT {column_list} FROM {stage} "
+                    f"ON CONFLICT DO NOTHING"
+                )
+                if returning:
+                    values = await connection.fetch(f"{merge} RETURNING {returning}")
+                    inserted = len(values)
+                else:
+                    status = await connection.execute(merge)
+                    inserted = int(status.rsplit(" ", 1)[-1])
+
+        logger.info("postgres_rows_copied", table=table, rows=len(records), inserted=inserted)
+        return [value[0] for value in values] if returning else inserted
+
+    async def copy_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Bulk load comments.
+
+        Returns:
+            The inserted comments with their ids (generated for rows without
+            one); comments already stored for their video are left out
+        """
+        with_ids = [{**comment, "id": comment.get("id") or str(uuid.uuid4())} for comment in comments]
+        inserted = set(map(str, await self.copy_rows("comment", with_ids, COMMENT_COLUMNS, returning="id")))
+        return [comment for comment in with_ids if str(comment["id"]) in inserted]
+
+    async def copy_domain_mentions(self, mentions: List[Dict[str, Any]]) -> int:
+        """Bulk load domain mentions, returning how many were inserted"""
+        return await self.copy_rows("domain_mention", mentions, MENTION_COLUMNS)
+
+    async def health_check(self) -> bool:
+        """Check that a pooled connection answers"""
+        try:
+            pool = await self.pool()
+            return await pool.fetchval("SELECT 1") == 1
+        except Exception as e:
+            logger.error("postgres_health_check_failed", error=str(e))
+            return False
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+            logger.info("postgres_pool_closed")
@@ -0,0 +1,265 @@
+"""
+Public Suffix List lookups backed by a compact, memory-mapped label trie
+
+The bundled list (data/public_suffix_list.dat) is compiled once into a
+binary file of fixed-size trie nodes keyed by reversed domain labels.
+Lookups walk one node per label, so resolving the registrable domain
+(eTLD+1) costs O(labels) and never loads the full list into Python objects.
+
+Run ``python public_suffix.py`` to (re)compile the binary ahead of time;
+otherwise it is built lazily on first lookup.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_SOURCE_PATH = os.path.join(DATA_DIR, "public_suffix_list.dat")
+DEFAULT_COMPILED_PATH = os.path.join(DATA_DIR, "public_suffix_list.bin")
+
+# Binary layout:
+#   header: magic, format version, source crc32, node count, labels offset
+#   nodes:  label offset, first child index, child count, label length, flags
+#   labels: concatenated ASCII labels referenced by the nodes
+# Children of a node are stored contiguously and sorted by label bytes.
+MAGIC = b"PSLT"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxxIII")
+NODE = struct.Struct("<IIHBB")
+
+FLAG_RULE = 1
+FLAG_EXCEPTION = 2
+
+WILDCARD = b"*"
+
+
+class DomainParts(NamedTuple):
+    """A hostname split along its public suffix."""
+    subdomain: str
+    registrable_domain: Optional[str]
+    suffix: str
+
+
+def _parse_rules(source: bytes) -> List[Tuple[List[bytes], int]]:
+    """Parse Public Suffix List text into (reversed labels, flags) rules."""
+    rules = []
+    for raw_line in source.decode("utf-8").splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("//"):
+            continue
+        
+        rule = line.split()[0]
+        flags = FLAG_RULE
+        if rule.startswith("!"):
+            rule = rule[1:]
+            flags = FLAG_EXCEPTION
+        
+        try:
+            labels = [
+                label.encode("ascii") if label.isascii() else label.encode("idna")
+                for label in rule.lower().split(".")
+            ]
+        except UnicodeError:
+            # A handful of IDN rules cannot be expressed in IDNA 2003; the
+            # extractor only produces ASCII hosts, so they would never match.
+            continue
+        
+        rules.append((labels[::-1], flags))
+    return rules
+
+
+def compile_suffix_list(source: bytes) -> bytes:
+    """Compile Public Suffix List text into the binary trie format."""
+    root: Dict = {"children": {}, "flags": 0}
+    for labels, flags in _parse_rules(source):
+        node = root
+        for label in labels:
+            node = node["children"].setdefault(label, {"children": {}, "flags": 0})
+        node["flags"] |= flags
+    
+    # Breadth-first layout keeps every node's children contiguous
+    nodes = [(b"", root)]
+    records = []
+    labels_blob = bytearray()
+    index = 0
+    while index < len(nodes):
+        label, node = nodes[index]
+        children = sorted(node["children"].items())
+        records.append((len(labels_blob), len(nodes), len(children), len(label), node["flags"]))
+        labels_blob += label
+        nodes.extend(children)
+        index += 1
+    
+    labels_offset = HEADER.size + NODE.size * len(records)
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, zlib.crc32(source), len(records), labels_offset))
+    for record in records:
+        out += NODE.pack(*record)
+    out += labels_blob
+    return bytes(out)
+
+
+class PublicSuffixTrie:
+    """Read-only view over a compiled suffix trie."""
+    
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        """Wrap a compiled trie held in memory or memory-mapped from disk"""
+        magic, version, self.source_crc, self.node_count, self._labels_offset = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a compiled public suffix trie")
+        self._buffer = buffer
+        self._root_children: Optional[Dict[bytes, int]] = None
+    
+    @classmethod
+    def open(cls, path: str) -> "PublicSuffixTrie":
+        """Memory-map a compiled trie from disk"""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    
+    def _node(self, index: int) -> Tuple[int, int, int, int, int]:
+        return NODE.unpack_from(self._buffer, HEADER.size + index * NODE.size)
+    
+    def _label(self, offset: int, length: int) -> bytes:
+        start = self._labels_offset + offset
+        return self._buffer[start:start + length]
+    
+    def _find_child(self, index: int, label: bytes) -> Optional[int]:
+        """Binary search a node's children for label"""
+        if index == 0:
+            return self._find_tld(label)
+        
+        _, lo, count, _, _ = self._node(index)
+        hi = lo + count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, _, _, length, _ = self._node(mid)
+            candidate = self._label(offset, length)
+            if candidate == label:
+                return mid
+            if candidate < label:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+    
+    def _find_tld(self, label: bytes) -> Optional[int]:
+        """Look up a root child through a small index built on first use.
+        
+        The root is the only node with a large fan-out (one child per TLD),
+        so it is the one place a hash lookup beats the binary search.
+        """
+        if self._root_children is None:
+            _, first, count, _, _ = self._node(0)
+            root_children = {}
+            for index in range(first, first + count):
+                offset, _, _, length, _ = self._node(index)
+                root_children[bytes(self._label(offset, length))] = index
+            self._root_children = root_children
+        return self._root_children.get(label)
+    
+    def suffix_length(self, labels: List[str]) -> int:
+        """Number of trailing labels that form the public suffix.
+        
+        Follows the PSL algorithm: the longest matching rule wins, wildcards
+        match any single label, exception rules drop their leftmost label,
+        and an unlisted TLD is its own suffix (the implicit "*" rule).
+        """
+        length = 1
+        index = 0
+        for depth, label in enumerate(reversed(labels), 1):
+            child = self._find_child(index, label.encode("ascii", "replace"))
+            if child is None:
+                child = self._find_child(index, WILDCARD)
+                if child is None:
+                    break
+            
+            flags = self._node(child)[4]
+            if flags & FLAG_EXCEPTION:
+                length = depth - 1
+                break
+            if flags & FLAG_RULE:
+                length = depth
+            index = child
+        return length
+    
+    def split(self, domain: str) -> DomainParts:
+        """Split a normalized hostname into subdomain, registrable domain and suffix"""
+        labels = domain.split(".")
+        length = self.suffix_length(labels)
+        suffix = ".".join(labels[-length:]) if length else ""
+        
+        if length >= len(labels):
+            return DomainParts("", None, suffix)
+        
+        return DomainParts(
+            ".".join(labels[:-length - 1]),
+            ".".join(labels[-length - 1:]),
+            suffix
+        )
+
+
+def compile_file(source_path: str = DEFAULT_SOURCE_PATH,
+                 compiled_path: str = DEFAULT_COMPILED_PATH) -> bytes:
+    """Compile the source list and atomically write it to compiled_path"""
+    with open(source_path, "rb") as f:
+        compiled = compile_suffix_list(f.read())
+    
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(compiled_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(compiled)
+        os.replace(tmp_path, compiled_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return compiled
+
+
+def load(source_path: str = DEFAULT_SOURCE_PATH,
+         compiled_path: str = DEFAULT_COMPILED_PATH) -> PublicSuffixTrie:
+    """Load the compiled trie, rebuilding it if missing or out of date"""
+    with open(source_path, "rb") as f:
+        source_crc = zlib.crc32(f.read())
+    
+    try:
+        trie = PublicSuffixTrie.open(compiled_path)
+        if trie.source_crc == source_crc:
+            return trie
+    except (OSError, ValueError, struct.error):
+        pass
+    
+    try:
+        compile_file(source_path, compiled_path)
+        return PublicSuffixTrie.open(compiled_path)
+    except OSError:
+        # Read-only deployment: keep the compiled trie in memory instead
+        with open(source_path, "rb") as f:
+            return PublicSuffixTrie(compile_suffix_list(f.read()))
+
+
+_trie: Optional[PublicSuffixTrie] = None
+
+
+def get_trie() -> PublicSuffixTrie:
+    """Return the process-wide trie, loading it on first use"""
+    global _trie
+    if _trie is None:
+        _trie = load()
+    return _trie
+
+
+def split_domain(domain: str) -> DomainParts:
+    """Split a normalized hostname using the bundled Public Suffix List"""
+    return get_trie().split(domain)
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOURCE_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_COMPILED_PATH
+    data = compile_file(source, target)
+    print(f"Compiled {source} -> {target} ({len(data)} bytes, "
+          f"{PublicSuffixTrie(data).node_count} nodes)")
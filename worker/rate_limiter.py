@@ -1,38 +1,326 @@
 """
-Rate limiting implementation using Upstash Redis with token bucket pattern
+Rate limiting implementation using Upstash Redis with token bucket pattern (GCRA)
+
+Waiting never blocks the event loop: tasks park on futures and are woken
+by loop timers, so many harvest tasks can share one limiter while the
+browser, database writes and health server keep running.
 """
 
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import math
 import time
-import json
-from typing import Optional, Tuple
+from collections import deque
+from typing import Optional, Any, Deque, Dict, List, Sequence, Tuple
 from datetime import datetime, timezone
 import structlog
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
 
 from config import config
+from metrics import LatencyHistogram
 
 logger = structlog.get_logger()
 
+# GCRA (generic cell rate algorithm) over every key in KEYS. Each key holds
+# its bucket's theoretical arrival time (TAT) as integer microseconds; a
+# bucket is full once its TAT is in the past. Takes up to ARGV[4] tokens (as
+# many as the emptiest bucket has) from all buckets or none, so a global
+# bucket never pays for a request a per-endpoint or per-proxy bucket refuses.
+# Returns {granted, retry_after_us}; when nothing was granted, retry_after_us
+# is how long until every bucket has a token again.
+TOKEN_BUCKET_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local granted = tonumber(ARGV[4])
+local tats = {}
+local retry_after = 0
+
+for i, key in ipairs(KEYS) do
+    local tat = math.max(tonumber(redis.call('GET', key)) or now, now)
+    tats[i] = tat
+    granted = math.min(granted, math.floor((now + tolerance - tat) / interval))
+    retry_after = math.max(retry_after, tat + interval - tolerance - now)
+end
+
+if granted < 1 then
+    return {0, math.ceil(retry_after)}
+end
+
+for i, key in ipairs(KEYS) do
+    local tat = tats[i] + granted * interval
+    redis.call('SET', key, string.format('%d', tat), 'PX', math.ceil((tat - now) / 1000))
+end
+return {granted, 0}
+"""
+
+# Gives ARGV[3] unused leased tokens back to every bucket in KEYS by moving
+# its TAT earlier
+TOKEN_RETURN_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local returned = tonumber(ARGV[3])
+
+for _, key in ipairs(KEYS) do
+    local tat = tonumber(redis.call('GET', key))
+    if tat then
+        tat = tat - returned * interval
+        if tat > now then
+            redis.call('SET', key, string.format('%d', tat), 'PX', math.ceil((tat - now) / 1000))
+        else
+            redis.call('DEL', key)
+        end
+    end
+end
+return returned
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def script_sha(script: str) -> str:
+    """SHA1 Redis uses to identify a script in EVALSHA"""
+    return hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+
+def _now_us() -> int:
+    """Wall clock in integer microseconds, the unit of GCRA arrival times"""
+    return time.time_ns() // 1000
+
+
+class RedisCommandError(Exception):
+    """Redis rejected a command (Upstash answers with {"error": ...})"""
+
+
+class TokenLease:
+    """
+    Tokens reserved from one set of Redis buckets and spent locally
+
+    Each lease is sized to the demand seen during the previous one, so busy
+    workers reserve blocks and idle ones fall back to a token per round trip.
+    Tokens not spent by expires_at are given back rather than used late.
+    """
+
+    def __init__(self, identifiers: List[str], ttl: float, max_tokens: int):
+        """
+        Initialize an empty lease
+
+        Args:
+            identifiers: Bucket identifiers the tokens are taken from
+            ttl: Seconds leased tokens stay spendable
+            max_tokens: Largest block reserved at once
+        """
+        self.identifiers = identifiers
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.expires_at = 0.0  # time.monotonic()
+        self.demand = 0.0  # tokens per second, smoothed over leases
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self._started: Optional[float] = None
+        self._spent = 0
+
+    def take(self) -> bool:
+        """Spend a leased token if one is left and the lease is still live"""
+        if self.tokens > 0 and time.monotonic() < self.expires_at:
+            self.tokens -= 1
+            self._spent += 1
+            return True
+        return False
+
+    def next_size(self) -> int:
+        """Tokens to reserve next: the demand expected over one lease"""
+        if self._started is not None:
+            elapsed = max(time.monotonic() - self._started, 1e-3)
+            observed = self._spent / elapsed
+            self.demand = observed if not self.demand else (self.demand + observed) / 2
+        return max(1, min(self.max_tokens, math.ceil(self.demand * self.ttl)))
+
+    def renew(self, granted: int):
+        """Add freshly reserved tokens, one of which the caller spends now"""
+        self._started = time.monotonic()
+        self.expires_at = self._started + self.ttl
+        self.tokens += granted - 1
+        self._spent = 1
+
+    def release(self) -> int:
+        """Give up the unspent tokens and return how many there were"""
+        unused, self.tokens = self.tokens, 0
+        return unused
+
+
+class LocalTokenBucket:
+    """
+    In-process token bucket that hands tokens to waiters in FIFO order
+
+    Waiters park on futures in a queue. A single loop timer fires when the
+    head waiter's token is due, so nobody polls and later arrivals cannot
+    overtake earlier ones.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize a full bucket
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated: Optional[float] = None  # loop.time() (monotonic) of the last refill
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._closed = False
+
+    @property
+    def waiting(self) -> int:
+        """Tasks currently queued for a token"""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def _refill(self, now: float):
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        """Tokens in the bucket right now"""
+        if self.updated is None:
+            return self.tokens
+        return min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+    async def acquire(self, wait: bool = True) -> bool:
+        """
+        Take one token
+
+        Args:
+            wait: Queue for the next token instead of failing when empty
+
+        Returns:
+            True if a token was taken, False if none was available (or the
+            bucket was closed while waiting)
+        """
+        if self._closed:
+            return False
+
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        if not wait:
+            return False
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self._schedule(loop)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                # Granted just as we were cancelled; hand the token to the next waiter
+                self.tokens += 1
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                self._schedule(loop)
+            raise
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop):
+        """Arm the timer for the head waiter's token"""
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        if not self._waiters or self._timer is not None:
+            return
+
+        due = self.updated + max(0.0, (1 - self.tokens) / self.rate)
+        self._timer = loop.call_at(due, self._grant)
+
+    def _grant(self):
+        """Hand out every token that is due, in queue order"""
+        self._timer = None
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.done():  # cancelled while queued
+                self._waiters.popleft()
+                continue
+            if self.tokens < 1 - 1e-9:
+                break
+            self.tokens -= 1
+            self._waiters.popleft()
+            waiter.set_result(True)
+
+        self._schedule(loop)
+
+    def reset(self):
+        """Refill the bucket to capacity"""
+        self.tokens = float(self.burst)
+        self.updated = None
+
+    def close(self):
+        """Stop the timer and release every waiter with False"""
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(False)
+
 
 class RateLimiter:
     """Token bucket rate limiter using Upstash Redis"""
     
-    def __init__(self):
-        """Initialize rate limiter"""
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Initialize rate limiter; the Upstash connection pool is created on first use.
+        
+        Args:
+            base_url: Upstash REST URL (defaults to config)
+            token: Upstash REST token (defaults to config)
+            transport: Custom httpx transport, for tests
+        """
         self.enabled = config.rate_limit_enabled
         self.requests_per_minute = config.rate_limit_requests_per_minute
         self.burst_size = config.rate_limit_burst_size
         self.refill_rate = self.requests_per_minute / 60.0  # tokens per second
+        self.interval_us = max(1, round(1_000_000 / self.refill_rate))  # GCRA emission interval
         
         # Upstash REST API configuration
-        self.base_url = config.upstash_redis_rest_url
-        self.token = config.upstash_redis_rest_token
+        self.base_url = base_url or config.upstash_redis_rest_url
+        self.token = token or config.upstash_redis_rest_token
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Round-trip latency and failures per Redis command
+        self.command_latency: Dict[str, LatencyHistogram] = {}
+        self.command_errors: Dict[str, int] = {}
         
         # Fallback to local rate limiting if Redis not configured
         self.use_local_fallback = not (self.base_url and self.token)
-        self.local_tokens = self.burst_size
-        self.local_last_refill = time.time()
+        self.local_bucket = LocalTokenBucket(self.refill_rate, self.burst_size)
+        
+        # Tasks waiting on the same Redis bucket queue here in FIFO order
+        self._redis_queues: Dict[str, asyncio.Lock] = {}
+        self._closed = False
+        self._close_event = asyncio.Event()  # wakes tasks sleeping for a Redis slot
+        
+        # Leasing: reserve blocks of Redis tokens per bucket set and spend them locally
+        self.leasing = config.rate_limit_leasing and not self.use_local_fallback
+        self._leases: Dict[str, TokenLease] = {}
+        self._lease_returns: set = set()
+        self.lease_stats = {"reservations": 0, "reserved": 0, "returned": 0}
         
         if self.use_local_fallback:
             logger.warning("rate_limiter_using_local_fallback",
@@ -42,40 +330,145 @@ class RateLimiter:
                        rpm=self.requests_per_minute,
                        burst=self.burst_size)
     
-    def _make_redis_request(self, command: list) -> Optional[dict]:
+    def _initialize_client(self):
+        """Create the pooled keep-alive HTTP client for Upstash"""
+        http2 = config.upstash_http2 and importlib.util.find_spec("h2") is not None
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "Authorization": f"Bearer {self.token}",
+                "Content-Type": "application/json"
+            },
+            limits=httpx.Limits(
+                max_connections=config.upstash_pool_size,
+                max_keepalive_connections=config.upstash_pool_size,
+                keepalive_expiry=config.upstash_keepalive_seconds
+            ),
+            timeout=httpx.Timeout(config.upstash_timeout_seconds),
+            http2=http2,
+            transport=self._transport
+        )
+        logger.info("upstash_client_initialized",
+                   pool_size=config.upstash_pool_size,
+                   http2=http2)
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client instance (not re-created once closed)"""
+        if not self._client or self._client.is_closed:
+            if self._closed:
+                raise RuntimeError("rate limiter is closed")
+            self._initialize_client()
+        return self._client
+    
+    async def _send(self, path: str, payload: list, name: str) -> Any:
+        """
+        POST to the Upstash REST API and return the decoded body
+        
+        Latency and failures are recorded under name. Raises RedisCommandError
+        when Redis rejects the command, httpx errors for transport failures.
+        """
+        started = time.monotonic()
+        try:
+            response = await self.client.post(path, json=payload)
+            if response.is_error:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+                if isinstance(body, dict) and "error" in body:
+                    raise RedisCommandError(body["error"])
+                response.raise_for_status()
+            return response.json()
+        except Exception:
+            self.command_errors[name] = self.command_errors.get(name, 0) + 1
+            raise
+        finally:
+            histogram = self.command_latency.get(name)
+            if histogram is None:
+                histogram = self.command_latency[name] = LatencyHistogram()
+            histogram.observe(time.monotonic() - started)
+    
+    async def _make_redis_request(self, command: list) -> Optional[dict]:
         """Make a request to Upstash Redis REST API"""
         if self.use_local_fallback:
             return None
         
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Content-Type": "application/json"
-        }
-        
+        name = str(command[0]).upper() if command else "UNKNOWN"
         try:
-            with httpx.Client() as client:
-                response = client.post(
-                    self.base_url,
-                    headers=headers,
-                    json=command,
-                    timeout=5.0
-                )
-                response.raise_for_status()
-                return response.json()
+            return await self._send("", command, name)
         except Exception as e:
             logger.error("redis_request_failed", 
-                        command=command[0] if command else None,
+                        command=name,
                         error=str(e))
             return None
     
+    async def _make_redis_pipeline(self, commands: List[list]) -> Optional[List[dict]]:
+        """
+        Send several commands in one round trip via the Upstash /pipeline endpoint
+        
+        Commands run in order but not atomically. Returns one {"result": ...}
+        or {"error": ...} per command, or None if the request failed.
+        """
+        if self.use_local_fallback or not commands:
+            return None
+        
+        try:
+            return await self._send("/pipeline", commands, "PIPELINE")
+        except Exception as e:
+            logger.error("redis_pipeline_failed",
+                        commands=[str(command[0]).upper() for command in commands],
+                        error=str(e))
+            return None
+    
+    async def _eval_script(self, script: str, keys: Sequence[str], args: Sequence[Any]) -> Optional[Any]:
+        """
+        Run a Lua script by its SHA, loading it when Redis does not have it
+        
+        Only the 40-byte SHA is sent normally. After a NOSCRIPT reply (fresh or
+        flushed Redis) the script is loaded and the call retried in one pipeline.
+        
+        Returns:
+            The script's result, or None if Redis could not run it
+        """
+        if self.use_local_fallback:
+            return None
+        
+        sha = script_sha(script)
+        command = ["EVALSHA", sha, len(keys), *keys, *(str(arg) for arg in args)]
+        try:
+            return (await self._send("", command, "EVALSHA")).get("result")
+        except RedisCommandError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                logger.error("redis_script_failed", sha=sha, error=str(e))
+                return None
+        except Exception as e:
+            logger.error("redis_request_failed", command="EVALSHA", error=str(e))
+            return None
+        
+        results = await self._make_redis_pipeline([["SCRIPT", "LOAD", script], command])
+        if results is None:
+            return None
+        if any("error" in result for result in results):
+            logger.error("redis_script_failed",
+                        sha=sha,
+                        error="; ".join(result["error"] for result in results if "error" in result))
+            return None
+        
+        logger.info("redis_script_loaded", sha=sha)
+        return results[1].get("result")
+    
     def _get_bucket_key(self, identifier: str = "global") -> str:
-        """Get the Redis key for a rate limit bucket"""
-        return f"rate_limit:{config.worker_id}:{identifier}"
+        """
+        Get the Redis key for a rate limit bucket
+        
+        With RATE_LIMIT_BUCKET_SCOPE=shared every worker draws from (and
+        returns leases to) the same bucket per identifier, so the limit is
+        cluster-wide; by default each worker has its own buckets.
+        """
+        scope = "shared" if config.rate_limit_bucket_scope == "shared" else config.worker_id
+        return f"rate_limit:{scope}:{identifier}"
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=0.5, min=0.5, max=2)
-    )
     async def acquire_token(self, identifier: str = "global", wait: bool = True) -> bool:
         """
         Acquire a token from the bucket
@@ -87,109 +480,137 @@ class RateLimiter:
         Returns:
             bool: True if token acquired, False otherwise
         """
+        return await self.acquire_tokens([identifier], wait)
+    
+    async def acquire_tokens(self, identifiers: Sequence[str], wait: bool = True) -> bool:
+        """
+        Acquire a token from several buckets at once in one Redis round trip
+        
+        Either every bucket gives a token or none does, e.g.
+        acquire_tokens(["global", "tiktok", "proxy:de-1"]).
+        
+        Args:
+            identifiers: Bucket identifiers
+            wait: Whether to wait for tokens if any bucket is empty
+        
+        Returns:
+            bool: True if tokens were acquired, False otherwise
+        """
         if not self.enabled:
             return True
         
+        if self._closed:
+            return False
+        
         if self.use_local_fallback:
-            return self._acquire_local_token(wait)
+            return await self.local_bucket.acquire(wait)
         
-        return await self._acquire_redis_token(identifier, wait)
-    
-    def _acquire_local_token(self, wait: bool) -> bool:
-        """Local fallback token acquisition"""
-        current_time = time.time()
-        
-        # Refill tokens based on elapsed time
-        elapsed = current_time - self.local_last_refill
-        tokens_to_add = elapsed * self.refill_rate
-        self.local_tokens = min(self.burst_size, self.local_tokens + tokens_to_add)
-        self.local_last_refill = current_time
-        
-        if self.local_tokens >= 1:
-            self.local_tokens -= 1
+        identifiers = list(dict.fromkeys(identifiers))
+        name = ",".join(identifiers)
+        lease = self._leases.get(name)
+        if lease is not None and lease.take():
             return True
         
-        if wait:
-            # Calculate wait time for next token
-            wait_time = (1 - self.local_tokens) / self.refill_rate
-            logger.debug("rate_limit_waiting", wait_seconds=wait_time)
-            time.sleep(wait_time)
-            return self._acquire_local_token(False)
+        if not wait:
+            return await self._acquire_redis_token(identifiers, False)
         
-        return False
+        # One waiter per bucket set talks to Redis at a time; the rest queue behind it
+        queue = self._redis_queues.setdefault(name, asyncio.Lock())
+        async with queue:
+            if self._closed:
+                return False
+            return await self._acquire_redis_token(identifiers, True)
     
-    async def _acquire_redis_token(self, identifier: str, wait: bool) -> bool:
-        """Redis-based token acquisition"""
-        bucket_key = self._get_bucket_key(identifier)
-        current_time = time.time()
-        
-        # Lua script for atomic token bucket operations
-        lua_script = """
-        local key = KEYS[1]
-        local burst_size = tonumber(ARGV[1])
-        local refill_rate = tonumber(ARGV[2])
-        local current_time = tonumber(ARGV[3])
-        
-        local bucket = redis.call('GET', key)
-        local tokens, last_refill
-        
-        if bucket then
-            local data = cjson.decode(bucket)
-            tokens = data.tokens
-            last_refill = data.last_refill
-        else
-            tokens = burst_size
-            last_refill = current_time
-        end
-        
-        -- Refill tokens
-        local elapsed = current_time - last_refill
-        local tokens_to_add = elapsed * refill_rate
-        tokens = math.min(burst_size, tokens + tokens_to_add)
-        
-        -- Try to acquire token
-        if tokens >= 1 then
-            tokens = tokens - 1
-            local new_data = cjson.encode({
-                tokens = tokens,
-                last_refill = current_time
-            })
-            redis.call('SET', key, new_data, 'EX', 3600)
-            return 1
-        else
-            return 0
-        end
-        """
+    async def _acquire_redis_token(self, identifiers: List[str], wait: bool) -> bool:
+        """Redis-based token acquisition, reserving a lease's worth when leasing"""
+        count = 1
+        lease = None
+        if self.leasing:
+            name = ",".join(identifiers)
+            lease = self._leases.get(name)
+            if lease is None:
+                lease = self._leases[name] = TokenLease(
+                    identifiers, config.rate_limit_lease_seconds, config.rate_limit_lease_max_tokens)
+            elif lease.take():
+                # Renewed by the task ahead of us in the queue
+                return True
+            await self._return_lease(lease)
+            count = lease.next_size()
+        
+        keys = [self._get_bucket_key(identifier) for identifier in identifiers]
+        while True:
+            result = await self._eval_script(
+                TOKEN_BUCKET_SCRIPT,
+                keys,
+                [self.interval_us, self.burst_size * self.interval_us, _now_us(), count]
+            )
+            
+            if result is None:
+                # Fallback to local rate limiting
+                return await self.local_bucket.acquire(wait)
+            
+            granted, retry_after_us = result
+            if granted or not wait or self._closed:
+                break
+            
+            # Sleep until the next slot opens; FIFO queueing keeps later callers behind us
+            wait_time = retry_after_us / 1_000_000
+            logger.debug("rate_limit_waiting", 
+                        identifiers=identifiers,
+                        wait_seconds=wait_time)
+            if not await self._sleep(wait_time):
+                return False
         
-        # Execute Lua script via REST API
-        command = [
-            "EVAL",
-            lua_script,
-            1,
-            bucket_key,
-            str(self.burst_size),
-            str(self.refill_rate),
-            str(current_time)
-        ]
+        if granted and lease is not None:
+            lease.renew(granted)
+            self._schedule_lease_return(lease)
+            self.lease_stats["reservations"] += 1
+            self.lease_stats["reserved"] += granted
         
-        result = self._make_redis_request(command)
+        return granted > 0
+    
+    async def _sleep(self, seconds: float) -> bool:
+        """Sleep for seconds; returns False early if close() is called meanwhile"""
+        closing = asyncio.ensure_future(self._close_event.wait())
+        try:
+            await asyncio.wait([closing], timeout=seconds)
+        finally:
+            closing.cancel()
+        return not self._closed
+    
+    def _schedule_lease_return(self, lease: TokenLease):
+        """Give a lease's unspent tokens back to Redis once it expires"""
+        if lease.timer is not None:
+            lease.timer.cancel()
+        
+        def expire():
+            lease.timer = None
+            if lease.tokens:
+                task = asyncio.ensure_future(self._return_lease(lease))
+                self._lease_returns.add(task)
+                task.add_done_callback(self._lease_returns.discard)
+        
+        lease.timer = asyncio.get_running_loop().call_later(lease.ttl, expire)
+    
+    async def _return_lease(self, lease: TokenLease) -> int:
+        """Put a lease's unspent tokens back into its Redis buckets"""
+        unused = lease.release()
+        if not unused:
+            return 0
         
+        result = await self._eval_script(
+            TOKEN_RETURN_SCRIPT,
+            [self._get_bucket_key(identifier) for identifier in lease.identifiers],
+            [self.interval_us, _now_us(), unused]
+        )
         if result is None:
-            # Fallback to local rate limiting
-            return self._acquire_local_token(wait)
-        
-        token_acquired = result.get("result", 0) == 1
-        
-        if not token_acquired and wait:
-            # Calculate wait time for next token
-            wait_time = 1.0 / self.refill_rate
-            logger.debug("rate_limit_waiting", 
-                        identifier=identifier,
-                        wait_seconds=wait_time)
-            time.sleep(wait_time)
-            return await self._acquire_redis_token(identifier, False)
+            logger.warning("rate_limit_lease_return_failed",
+                          identifiers=lease.identifiers,
+                          tokens=unused)
+            return 0
         
-        return token_acquired
+        self.lease_stats["returned"] += unused
+        return unused
     
     async def get_remaining_tokens(self, identifier: str = "global") -> Tuple[float, float]:
         """
@@ -202,25 +623,24 @@ class RateLimiter:
             return (float('inf'), float('inf'))
         
         if self.use_local_fallback:
-            return (self.local_tokens, self.burst_size)
+            return (self.local_bucket.available(), self.burst_size)
         
         bucket_key = self._get_bucket_key(identifier)
         command = ["GET", bucket_key]
-        result = self._make_redis_request(command)
+        result = await self._make_redis_request(command)
         
         if result is None or result.get("result") is None:
             return (self.burst_size, self.burst_size)
         
         try:
-            data = json.loads(result["result"])
-            current_time = time.time()
-            elapsed = current_time - data["last_refill"]
-            tokens_to_add = elapsed * self.refill_rate
-            tokens = min(self.burst_size, data["tokens"] + tokens_to_add)
-            return (tokens, self.burst_size)
-        except Exception as e:
+            tat = int(result["result"])
+        except (TypeError, ValueError) as e:
             logger.error("get_remaining_tokens_failed", error=str(e))
             return (self.burst_size, self.burst_size)
+        
+        # Each interval the TAT lies ahead of now is one token in use
+        in_use = max(0, tat - _now_us()) / self.interval_us
+        return (max(0.0, self.burst_size - in_use), self.burst_size)
     
     async def reset_bucket(self, identifier: str = "global") -> bool:
         """Reset a rate limit bucket to full capacity"""
@@ -228,20 +648,14 @@ class RateLimiter:
             return True
         
         if self.use_local_fallback:
-            self.local_tokens = self.burst_size
-            self.local_last_refill = time.time()
+            self.local_bucket.reset()
             return True
         
-        bucket_key = self._get_bucket_key(identifier)
-        data = json.dumps({
-            "tokens": self.burst_size,
-            "last_refill": time.time()
-        })
-        
-        command = ["SET", bucket_key, data, "EX", 3600]
-        result = self._make_redis_request(command)
+        # A bucket without a TAT is full
+        command = ["DEL", self._get_bucket_key(identifier)]
+        result = await self._make_redis_request(command)
         
-        return result is not None and result.get("result") == "OK"
+        return result is not None and "result" in result
     
     async def health_check(self) -> bool:
         """Check if rate limiter is healthy"""
@@ -253,12 +667,49 @@ class RateLimiter:
         
         try:
             command = ["PING"]
-            result = self._make_redis_request(command)
+            result = await self._make_redis_request(command)
             return result is not None and result.get("result") == "PONG"
         except Exception as e:
             logger.error("rate_limiter_health_check_failed", error=str(e))
             return False
 
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Redis command latencies and queued waiters for /metrics"""
+        return {
+            "waiting": self.local_bucket.waiting,
+            "leases": {
+                **self.lease_stats,
+                "held": sum(lease.tokens for lease in self._leases.values())
+            },
+            "redis_commands": {
+                name: {**histogram.snapshot(), "errors": self.command_errors.get(name, 0)}
+                for name, histogram in self.command_latency.items()
+            }
+        }
+    
+    async def close(self):
+        """Release waiting tasks (they get False), refuse new acquisitions and close connections"""
+        self._closed = True
+        self._close_event.set()
+        self.local_bucket.close()
+        
+        # Unspent leased tokens go back to the shared buckets for other workers
+        for lease in self._leases.values():
+            if lease.timer is not None:
+                lease.timer.cancel()
+                lease.timer = None
+        await asyncio.gather(
+            *self._lease_returns,
+            *(self._return_lease(lease) for lease in self._leases.values()),
+            return_exceptions=True
+        )
+        
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        logger.info("rate_limiter_closed")
+
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
\ No newline at end of file
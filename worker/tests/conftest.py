@@ -0,0 +1,6 @@
+"""Shared test setup for the worker."""
+import os
+
+# config requires Supabase credentials at import time
+os.environ.setdefault("SUPABASE_URL", "https://test-project.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
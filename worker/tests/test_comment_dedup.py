@@ -0,0 +1,51 @@
+"""Tests for the per-worker comment deduplicator."""
+import hashlib
+
+from comment_dedup import BloomFilter, CommentDeduplicator, comment_dedup_key
+
+
+class TestCommentDedup:
+    """Test suite for CommentDeduplicator and BloomFilter."""
+
+    def test_key_matches_sql(self):
+        """Test that keys follow comment_dedup_key() in the migration."""
+        assert comment_dedup_key({"comment_id": "7301", "text": "hi"}) == "7301"
+        expected = "h:" + hashlib.md5("user1\nvisit example.com".encode()).hexdigest()
+        assert comment_dedup_key({"username": "user1", "text": "visit example.com"}) == expected
+
+    def test_filter_new_drops_seen_comments(self):
+        """Test that a recrawl only yields comments not seen before."""
+        dedup = CommentDeduplicator(capacity=1000, error_rate=0.001)
+        first = [{"comment_id": "1"}, {"comment_id": "2"}, {"username": "a", "text": "spam.com"}]
+
+        assert dedup.filter_new("v1", first) == first
+        recrawl = first + [{"comment_id": "3"}, {"username": "b", "text": "spam.com"}]
+        assert dedup.filter_new("v1", recrawl) == recrawl[3:]
+
+        # Same comment on another video is a different comment
+        assert dedup.filter_new("v2", [{"comment_id": "1"}]) == [{"comment_id": "1"}]
+        assert dedup.stats()["duplicates"] == 3
+
+    def test_repeats_within_batch(self):
+        """Test that a comment repeated in one batch is kept once."""
+        dedup = CommentDeduplicator(capacity=1000, error_rate=0.001)
+        assert dedup.filter_new("v1", [{"comment_id": "1"}, {"comment_id": "1"}]) == [{"comment_id": "1"}]
+
+    def test_rotation_keeps_previous_generation(self):
+        """Test that comments survive one generation rotation."""
+        dedup = CommentDeduplicator(capacity=100, error_rate=0.001)
+        for i in range(150):
+            assert dedup.seen("v1", {"comment_id": str(i)}) is False
+
+        assert dedup.stats()["rotations"] == 1
+        assert all(dedup.seen("v1", {"comment_id": str(i)}) for i in range(150))
+
+    def test_false_positive_rate(self):
+        """Test that the filter stays near its configured error rate."""
+        bloom = BloomFilter(capacity=2000, error_rate=0.01)
+        for i in range(2000):
+            bloom.add(f"seen-{i}")
+
+        assert all(f"seen-{i}" in bloom for i in range(2000))
+        false_positives = sum(f"new-{i}" in bloom for i in range(20000))
+        assert false_positives / 20000 < 0.02
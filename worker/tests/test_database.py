@@ -0,0 +1,265 @@
+"""Tests for the async Supabase REST client."""
+import json
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from tenacity import wait_none
+
+from database import DatabaseError, SupabaseClient
+
+
+class TestSupabaseClient:
+    """Test SupabaseClient against a mocked PostgREST API"""
+
+    @pytest.fixture
+    def requests(self):
+        return []
+
+    def make_client(self, requests, handler):
+        def record(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return handler(request)
+
+        return SupabaseClient(
+            url="https://test-project.supabase.co",
+            service_key="test-service-key",
+            pool_size=4,
+            transport=httpx.MockTransport(record)
+        )
+
+    async def test_insert_video(self, requests):
+        """Test that inserts POST to the table and return the created row."""
+        client = self.make_client(
+            requests, lambda request: httpx.Response(201, json=[{"id": "v1", "video_id": "123"}])
+        )
+
+        row = await client.insert_video({"video_id": "123"})
+        await client.aclose()
+
+        assert row == {"id": "v1", "video_id": "123"}
+        request = requests[0]
+        assert request.method == "POST"
+        assert request.url.path == "/rest/v1/video"
+        assert request.headers["apikey"] == "test-service-key"
+        assert request.headers["authorization"] == "Bearer test-service-key"
+        assert request.headers["prefer"] == "return=representation"
+        assert json.loads(request.content) == {"video_id": "123"}
+
+    async def test_insert_comments_skips_stored(self, requests):
+        """Test that comment inserts ignore rows conflicting on the dedup key."""
+        client = self.make_client(
+            requests, lambda request: httpx.Response(201, json=[{"id": "c2", "comment_id": "2"}])
+        )
+
+        rows = await client.insert_comments([{"comment_id": "1"}, {"comment_id": "2"}])
+
+        assert rows == [{"id": "c2", "comment_id": "2"}]
+        assert requests[0].url.params["on_conflict"] == "video_id,dedup_key"
+        assert requests[0].headers["prefer"] == "return=representation,resolution=ignore-duplicates"
+
+    async def test_iter_videos_for_crawling_pages_by_keyset(self, requests):
+        """Test that each page continues after the last row of the previous one."""
+        pages = [
+            [{"id": "a", "last_crawled_at": None}, {"id": "b", "last_crawled_at": None}],
+            [{"id": "c", "last_crawled_at": "2026-01-01T00:00:00+00:00"},
+             {"id": "d", "last_crawled_at": "2026-01-02T00:00:00+00:00"}],
+            [{"id": "e", "last_crawled_at": "2026-01-03T00:00:00+00:00"}],
+        ]
+        client = self.make_client(requests, lambda request: httpx.Response(200, json=pages[len(requests) - 1]))
+
+        videos = [row["id"] async for row in client.iter_videos_for_crawling(
+            page_size=2, recrawl_interval=timedelta(hours=6))]
+
+        assert videos == ["a", "b", "c", "d", "e"]
+        bodies = [json.loads(request.content) for request in requests]
+        assert all(request.url.path == "/rest/v1/rpc/crawl_candidates" for request in requests)
+        assert [(body["p_after_crawled_at"], body["p_after_id"]) for body in bodies] == [
+            (None, None), (None, "b"), ("2026-01-02T00:00:00+00:00", "d")]
+        cutoff = datetime.fromisoformat(bodies[0]["p_cutoff"])
+        assert abs(datetime.now(timezone.utc) - timedelta(hours=6) - cutoff) < timedelta(minutes=1)
+
+    async def test_get_videos_for_crawling_limit(self, requests):
+        """Test that the list helper stops after limit videos."""
+        client = self.make_client(
+            requests, lambda request: httpx.Response(200, json=[{"id": "a", "last_crawled_at": None}] * 5)
+        )
+
+        assert len(await client.get_videos_for_crawling(limit=5)) == 5
+        assert len(requests) == 1
+        assert json.loads(requests[0].content)["p_limit"] == 5
+
+    async def test_video_leases(self, requests):
+        """Test the claim, extend and release RPC calls."""
+        responses = {
+            "/rest/v1/rpc/claim_videos": [{"id": "a", "video_id": "1"}, {"id": "b", "video_id": "2"}],
+            "/rest/v1/rpc/extend_video_leases": [{"id": "a", "lease_expires_at": "2026-01-01T00:10:00+00:00"}],
+            "/rest/v1/rpc/release_videos": 1,
+        }
+        client = self.make_client(requests, lambda request: httpx.Response(200, json=responses[request.url.path]))
+
+        claimed = await client.claim_videos("worker-1", 2, lease_seconds=300)
+        assert [row["id"] for row in claimed] == ["a", "b"]
+        assert await client.extend_lease("worker-1", ["a", "b"]) == ["a"]
+        assert await client.release_videos("worker-1", ["a"], crawled=True) == 1
+
+        claim, extend, release = (json.loads(request.content) for request in requests)
+        assert claim["p_worker_id"] == "worker-1"
+        assert (claim["p_limit"], claim["p_lease_seconds"]) == (2, 300)
+        assert extend["p_video_ids"] == ["a", "b"]
+        assert release == {"p_worker_id": "worker-1", "p_video_ids": ["a"], "p_crawled": True}
+
+    async def test_update_video_crawl_status(self, requests):
+        """Test that updates PATCH the row selected by id."""
+        client = self.make_client(
+            requests, lambda request: httpx.Response(200, json=[{"id": "v1", "comment_count": 3}])
+        )
+
+        row = await client.update_video_crawl_status("v1", {"comment_count": 3})
+
+        assert row["comment_count"] == 3
+        assert requests[0].method == "PATCH"
+        assert requests[0].url.params["id"] == "eq.v1"
+        assert "last_crawled_at" in json.loads(requests[0].content)
+
+    async def test_error_response_raises(self, requests):
+        """Test that PostgREST errors surface as DatabaseError."""
+        client = self.make_client(
+            requests,
+            lambda request: httpx.Response(409, json={"code": "23505", "message": "duplicate key"})
+        )
+
+        with pytest.raises(DatabaseError) as excinfo:
+            await client._request("POST", "comment", json=[{"text": "hi"}])
+
+        assert excinfo.value.status_code == 409
+        assert excinfo.value.code == "23505"
+
+    async def test_health_check(self, requests):
+        """Test health check success and failure."""
+        healthy = self.make_client(requests, lambda request: httpx.Response(200, json=[]))
+        unhealthy = self.make_client(requests, lambda request: httpx.Response(503, text="down"))
+
+        assert await healthy.health_check() is True
+        assert await unhealthy.health_check() is False
+
+    async def test_aclose_reopens_on_use(self, requests):
+        """Test that the pool is recreated after being closed."""
+        client = self.make_client(requests, lambda request: httpx.Response(200, json=[]))
+
+        await client.health_check()
+        await client.aclose()
+        assert client._client is None
+
+        assert await client.health_check() is True
+        assert len(requests) == 2
+
+    async def test_upsert_domains_counts_in_process(self, requests):
+        """Test that domains are deduplicated and counted into a single RPC call."""
+        def handler(request):
+            rows = json.loads(request.content)["p_domains"]
+            return httpx.Response(200, json=[
+                {"id": f"id-{row['domain_name']}", "domain_name": row["domain_name"]} for row in rows
+            ])
+
+        client = self.make_client(requests, handler)
+        ids = await client.upsert_domains(
+            ["shop.example.co.uk", "Example.com", "www.example.com", "shop.example.co.uk", ""]
+        )
+
+        assert ids == {"shop.example.co.uk": "id-shop.example.co.uk", "example.com": "id-example.com"}
+        assert len(requests) == 1
+        assert requests[0].url.path == "/rest/v1/rpc/upsert_domains"
+
+        body = json.loads(requests[0].content)
+        assert body["p_count_mentions"] is True
+        rows = {row["domain_name"]: row for row in body["p_domains"]}
+        assert rows["example.com"]["mention_count"] == 2
+        assert rows["example.com"]["subdomain"] is None
+        assert rows["shop.example.co.uk"]["mention_count"] == 2
+        assert rows["shop.example.co.uk"]["tld"] == "co.uk"
+        assert rows["shop.example.co.uk"]["subdomain"] == "shop"
+
+    async def test_upsert_domains_retries_generator_input(self, requests, monkeypatch):
+        """Test that a retried upsert still sends the domains from a one-shot iterable."""
+        monkeypatch.setattr(SupabaseClient._upsert_domain_rows.retry, "wait", wait_none())
+
+        def handler(request):
+            if len(requests) == 1:
+                return httpx.Response(503, text="unavailable")
+            rows = json.loads(request.content)["p_domains"]
+            return httpx.Response(200, json=[
+                {"id": f"id-{row['domain_name']}", "domain_name": row["domain_name"]} for row in rows
+            ])
+
+        client = self.make_client(requests, handler)
+        ids = await client.upsert_domains(name for name in ["spam.com", "deals.net", "spam.com"])
+
+        assert ids == {"spam.com": "id-spam.com", "deals.net": "id-deals.net"}
+        assert len(requests) == 2
+        assert json.loads(requests[0].content) == json.loads(requests[1].content)
+
+    async def test_upsert_domains_empty(self, requests):
+        """Test that an empty batch makes no request."""
+        client = self.make_client(requests, lambda request: httpx.Response(200, json=[]))
+
+        assert await client.upsert_domains([]) == {}
+        assert requests == []
+
+    async def test_upsert_domain_uses_domain_name(self, requests):
+        """Test the single-domain wrapper."""
+        client = self.make_client(
+            requests, lambda request: httpx.Response(200, json=[{"id": "d1", "domain_name": "example.com"}])
+        )
+
+        assert await client.upsert_domain("example.com") == {"id": "d1", "domain_name": "example.com"}
+        assert json.loads(requests[0].content)["p_domains"][0]["domain_name"] == "example.com"
+
+    async def test_ingest_harvest_single_request(self, requests):
+        """Test that a whole harvest is sent as one RPC payload."""
+        client = self.make_client(
+            requests,
+            lambda request: httpx.Response(200, json={"video_id": "v1", "comments": 2, "domains": 1, "mentions": 1})
+        )
+
+        result = await client.ingest_harvest(
+            {"video_id": "7300000000000000001", "comment_count": 2},
+            [{"username": "a", "text": "hello"}, {"username": "b", "text": "visit WWW.Shop.co.uk"}],
+            [{"comment_index": 1, "domain_name": "WWW.Shop.co.uk", "mention_text": "WWW.Shop.co.uk"},
+             {"comment_index": 0, "domain_name": ""}]
+        )
+
+        assert result["mentions"] == 1
+        assert len(requests) == 1
+        assert requests[0].url.path == "/rest/v1/rpc/ingest_harvest"
+
+        payload = json.loads(requests[0].content)["p_payload"]
+        assert payload["video"]["video_id"] == "7300000000000000001"
+        assert len(payload["comments"]) == 2
+        assert payload["mentions"] == [{
+            "comment_index": 1,
+            "domain_name": "shop.co.uk",
+            "mention_text": "WWW.Shop.co.uk",
+            "tld": "co.uk",
+            "subdomain": None
+        }]
+
+    async def test_bulk_loader_backend(self, requests):
+        """Test that comment and mention inserts use the COPY loader when configured."""
+        class FakeLoader:
+            async def copy_comments(self, comments):
+                return [{**comment, "id": "c1"} for comment in comments]
+
+            async def copy_domain_mentions(self, mentions):
+                return len(mentions) - 1
+
+            async def close(self):
+                pass
+
+        client = self.make_client(requests, lambda request: httpx.Response(500))
+        client.bulk_loader = FakeLoader()
+
+        assert await client.insert_comments([{"text": "hi"}]) == [{"text": "hi", "id": "c1"}]
+        assert await client.insert_domain_mentions([{"mention_text": "a.com"}] * 2) == 1
+        assert requests == []
+        await client.aclose()
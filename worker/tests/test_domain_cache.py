@@ -0,0 +1,114 @@
+"""Tests for the domain name -> id cache."""
+import asyncio
+
+import pytest
+
+from domain_cache import DomainIdCache
+from write_buffer import WriteBuffer
+
+
+class FakeClient:
+    """Counts upserts and serves a fixed top-domains list."""
+
+    def __init__(self, top=()):
+        self.top = list(top)
+        self.upserts = []
+        self.mentions = []
+        self.delay = 0
+
+    async def get_top_domains(self, limit):
+        return self.top[:limit]
+
+    async def upsert_domains(self, domains, count_mentions=True):
+        domains = list(domains)
+        self.upserts.append((sorted(domains), count_mentions))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return {name: f"id-{name}" for name in domains}
+
+    async def insert_domain_mentions(self, mentions):
+        self.mentions.extend(mentions)
+        return len(mentions)
+
+
+class TestDomainIdCache:
+    """Test suite for DomainIdCache."""
+
+    async def test_warm_then_hit(self):
+        """Test that warmed domains resolve without touching the database."""
+        client = FakeClient(top=[{"id": "id-spam.com", "domain_name": "spam.com"}])
+        cache = DomainIdCache(client, capacity=100, warm_size=10)
+
+        assert await cache.warm() == 1
+        assert await cache.resolve(["SPAM.com", "www.spam.com"]) == {"spam.com": "id-spam.com"}
+        assert client.upserts == []
+        assert cache.stats()["hits"] == 1
+
+    async def test_miss_upserts_once(self):
+        """Test that unknown domains are upserted uncounted, then cached."""
+        client = FakeClient()
+        cache = DomainIdCache(client, capacity=100, warm_size=0)
+
+        assert await cache.resolve(["shop.io", "deals.net", "shop.io"]) == {
+            "shop.io": "id-shop.io", "deals.net": "id-deals.net"}
+        assert await cache.resolve(["shop.io"]) == {"shop.io": "id-shop.io"}
+
+        assert client.upserts == [(["deals.net", "shop.io"], False)]
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 2)
+        assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+    async def test_blocked_names_are_negative_cached(self):
+        """Test that blocklisted names map to None and are never upserted."""
+        client = FakeClient()
+        cache = DomainIdCache(client, capacity=100, warm_size=0)
+
+        assert await cache.resolve(["tiktok.com"]) == {"tiktok.com": None}
+        assert await cache.resolve(["vm.tiktok.com", "tiktok.com"]) == {
+            "vm.tiktok.com": None, "tiktok.com": None}
+
+        assert client.upserts == []
+        stats = cache.stats()
+        assert stats["negative_hits"] == 1
+        assert stats["blocked_entries"] == 2
+
+    async def test_lru_eviction(self):
+        """Test that the least recently used name is evicted at capacity."""
+        client = FakeClient()
+        cache = DomainIdCache(client, capacity=2, warm_size=0)
+
+        await cache.resolve(["a.com", "b.com"])
+        await cache.resolve(["a.com"])
+        await cache.resolve(["c.com"])
+        await cache.resolve(["a.com", "b.com"])
+
+        assert client.upserts[-1] == (["b.com"], False)
+        assert cache.stats()["evictions"] == 2
+
+    async def test_concurrent_misses_share_one_upsert(self):
+        """Test that callers missing the same name wait on a single upsert."""
+        client = FakeClient()
+        client.delay = 0.05
+        cache = DomainIdCache(client, capacity=100, warm_size=0)
+
+        first, second = await asyncio.gather(cache.resolve(["shop.io"]), cache.resolve(["shop.io"]))
+
+        assert first == second == {"shop.io": "id-shop.io"}
+        assert len(client.upserts) == 1
+
+    async def test_write_buffer_resolves_through_cache(self):
+        """Test that buffered mentions use cached ids and skip blocked domains."""
+        client = FakeClient(top=[{"id": "id-spam.com", "domain_name": "spam.com"}])
+        cache = DomainIdCache(client, capacity=100, warm_size=10)
+        await cache.warm()
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000, domain_cache=cache)
+
+        await buffer.add_mentions([
+            {"comment_id": "c1", "domain_name": "spam.com"},
+            {"comment_id": "c2", "domain_name": "tiktok.com"},
+        ])
+        await buffer.flush()
+
+        assert client.upserts == []
+        assert client.mentions == [{"comment_id": "c1", "domain_id": "id-spam.com"}]
+        assert buffer.metrics()["tables"]["domain_mention"]["dropped"] == 0
@@ -130,4 +130,229 @@ class TestDomainExtractor:
     ])
     def test_categorize_various_domains(self, domain, expected):
         """Test categorization of various domain types."""
-        assert DomainExtractor.categorize_domain(domain) == expected
\ No newline at end of file
+        assert DomainExtractor.categorize_domain(domain) == expected
+    
+    def test_extract_matches_spans(self):
+        """Test that matches carry the matched text and its position."""
+        text = "Go to https://www.Example.com/deal now"
+        matches = DomainExtractor.extract_matches(text)
+        assert len(matches) == 1
+        match = matches[0]
+        assert match.normalized == 'example.com'
+        assert text[match.start:match.end] == match.text
+        assert match.span == (match.start, match.end)
+    
+    def test_extract_domains_batch(self):
+        """Test batch extraction keeps one result list per input text."""
+        texts = ["Visit example.com", "", "nothing here", "test.org and blog.test.org"]
+        results = DomainExtractor.extract_domains_batch(texts)
+        assert len(results) == len(texts)
+        assert [m.normalized for m in results[0]] == ['example.com']
+        assert results[1] == []
+        assert results[2] == []
+        assert [m.normalized for m in results[3]] == ['test.org', 'blog.test.org']
+    
+    def test_extract_domains_batch_process_pool(self, monkeypatch):
+        """Test that the process pool path returns the same results in order."""
+        monkeypatch.setattr(DomainExtractor, 'MIN_PARALLEL_BATCH', 1)
+        texts = [f"comment {i} at site{i}.com" for i in range(50)]
+        serial = DomainExtractor.extract_domains_batch(texts)
+        try:
+            parallel = DomainExtractor.extract_domains_batch(texts, max_workers=2, chunk_size=7)
+            pool = DomainExtractor._pool
+            again = DomainExtractor.extract_domains_batch(texts, max_workers=2, chunk_size=7)
+            assert DomainExtractor._pool is pool
+        finally:
+            DomainExtractor.shutdown_pool()
+        assert parallel == serial == again
+        assert parallel[49][0].normalized == 'site49.com'
+        assert DomainExtractor._pool is None
+    
+    async def test_extract_domains_batch_async(self, monkeypatch):
+        """Test the async batch matches the blocking one, in-process and pooled."""
+        texts = [f"comment {i} at site{i}.com" for i in range(50)]
+        serial = DomainExtractor.extract_domains_batch(texts)
+        assert await DomainExtractor.extract_domains_batch_async(texts) == serial
+        
+        monkeypatch.setattr(DomainExtractor, 'MIN_PARALLEL_BATCH', 1)
+        try:
+            parallel = await DomainExtractor.extract_domains_batch_async(texts, max_workers=2, chunk_size=7)
+        finally:
+            DomainExtractor.shutdown_pool()
+        assert parallel == serial
+    
+    def test_email_addresses_not_extracted(self):
+        """Test that the host part of an email address is not reported."""
+        assert DomainExtractor.extract_domains('Email me at user@gmail.com') == []
+        assert DomainExtractor.extract_domains('me@x.com or visit site.com') == ['site.com']
+    
+    @pytest.mark.parametrize("text", [
+        'Version 2.0.1 released',
+        'The price is $19.99',
+        'test..com is invalid',
+        '192.168.1.1 is local',
+        'a.b.c.d.e.f.g.h',
+    ])
+    def test_non_domain_dotted_tokens(self, text):
+        """Test that dotted tokens without a real TLD are ignored."""
+        assert DomainExtractor.extract_domains(text) == []
+    
+    @pytest.mark.parametrize("text", ['see www.example', 'www.co', 'www.www.shop'])
+    def test_www_prefix_without_domain(self, text):
+        """Test that "www." is stripped even when nothing dotted is left."""
+        assert DomainExtractor.extract_domains(text) == []
+    
+    @pytest.mark.parametrize("text,expected", [
+        ('example.com-promo', ['example.com']),
+        ('example.com123', ['example.com']),
+        ('cheap.shop2024 deals', ['cheap.shop']),
+        ('www.example.com-', ['example.com']),
+        ('a.bc1.de2', ['a.bc1.de']),
+    ])
+    def test_tld_ends_at_letters(self, text, expected):
+        """Test that a TLD followed by digits or a hyphen still yields the domain."""
+        assert DomainExtractor.extract_domains(text) == expected
+    
+    def test_pathological_dot_runs(self):
+        """Test that long runs of dotted tokens are scanned in linear time."""
+        import time
+        
+        text = '1.' * 20000 + 'x ' + 'a' * 50000 + ' visit example.com'
+        started = time.perf_counter()
+        domains = DomainExtractor.extract_domains(text)
+        assert domains == ['example.com']
+        assert time.perf_counter() - started < 1.0
+    
+    def test_split_domain(self):
+        """Test registrable domain, suffix and subdomain from the bundled list."""
+        parts = DomainExtractor.split_domain('https://shop.example.co.uk/path')
+        assert parts.subdomain == 'shop'
+        assert parts.registrable_domain == 'example.co.uk'
+        assert parts.suffix == 'co.uk'
+        
+        assert DomainExtractor.registrable_domain('shop.example.co.uk') == 'example.co.uk'
+        assert DomainExtractor.registrable_domain('example.co.uk') == 'example.co.uk'
+        assert DomainExtractor.public_suffix('blog.example.com') == 'com'
+        assert DomainExtractor.split_domain('') is None
+    
+    def test_blacklisted_subdomains_filtered(self):
+        """Test that subdomains of blacklisted domains are filtered out."""
+        text = "Watch m.tiktok.com, vm.tiktok.com and shop.amazon.com or mysite.com"
+        assert DomainExtractor.extract_domains(text) == ['mysite.com']
+        assert DomainExtractor.is_valid_domain('cdn.fbcdn.net') is False
+    
+    def test_classify(self):
+        """Test the combined classification record."""
+        result = DomainExtractor.classify('https://Shop.Example.co.uk/x')
+        assert result.normalized == 'shop.example.co.uk'
+        assert result.category == 'standard'
+        assert result.is_shortener is False
+        assert result.registrable_domain == 'example.co.uk'
+        
+        shortener = DomainExtractor.classify('bit.ly')
+        assert shortener.category == 'shortener'
+        assert shortener.is_shortener is True
+        
+        assert DomainExtractor.classify('192.168.1.1').registrable_domain is None
+        assert DomainExtractor.classify(None).category == 'invalid'
+    
+    def test_classification_cache(self):
+        """Test that repeated classifications are served from the bounded cache."""
+        original_size = DomainExtractor.CLASSIFICATION_CACHE_SIZE
+        DomainExtractor.configure_classification_cache(2)
+        try:
+            DomainExtractor.classify('one.com')
+            DomainExtractor.classify('one.com')
+            DomainExtractor.classify('two.com')
+            DomainExtractor.classify('three.com')
+            
+            stats = DomainExtractor.metrics()['classification_cache']
+            assert stats['hits'] == 1
+            assert stats['misses'] == 3
+            assert stats['size'] == 2
+            assert stats['max_size'] == 2
+        finally:
+            DomainExtractor.configure_classification_cache(original_size)
+    
+    def test_repeated_comments_use_text_cache(self):
+        """Test that verbatim repeats are answered from the extraction cache."""
+        cache = DomainExtractor.extraction_cache
+        text = "Copy-pasted spam: go to cached-deals.shop now!!"
+        hits_before = cache.hits
+        
+        first = DomainExtractor.extract_domains(text)
+        second = DomainExtractor.extract_domains(text)
+        assert first == second == ['cached-deals.shop']
+        assert cache.hits == hits_before + 1
+    
+    @pytest.mark.parametrize("text", [
+        "Check out https://example.com and www.test.org for more info",
+        "🔥 Hot deals at myshop.store 🔥 and blog.example.com",
+        "Email me at user@gmail.com or visit münchen.de, site.tk",
+        "Regular comment without any domains",
+    ])
+    def test_bytes_extraction_matches_text_extraction(self, text):
+        """Test that the bytes path reports the same matches and character offsets."""
+        assert DomainExtractor.extract_matches_bytes(text.encode('utf-8')) == \
+            DomainExtractor.extract_matches(text)
+    
+    @pytest.mark.parametrize("text,expected", [
+        ('请访问example.com获取', ['example.com']),
+        ('詳しくはshop-deal.comへ', ['shop-deal.com']),
+        ('ценыdeal.ru', ['deal.ru']),
+        ('Besuche münchen.de', []),
+    ])
+    def test_non_latin_text_touching_domain(self, text, expected):
+        """Test that CJK and Cyrillic text glued to a domain does not hide it."""
+        assert DomainExtractor.extract_domains(text) == expected
+        assert [m.normalized for m in DomainExtractor.extract_matches_bytes(text.encode('utf-8'))] == expected
+    
+    def test_bytes_extraction_from_json_payload(self):
+        """Test extraction from a raw JSON body with escapes."""
+        body = (b'{"comments":[{"text":"hi\\nnew-deal.com"},'
+                b'{"text":"see https:\\/\\/www.shop.io\\/x \\ud83d\\udd25"},'
+                b'{"text":"m\\u00fcnchen.de"}]}')
+        matches = DomainExtractor.extract_matches_bytes(memoryview(body))
+        assert [m.normalized for m in matches] == ['new-deal.com', 'shop.io']
+        
+        decoded = body.decode('utf-8')
+        for match in matches:
+            assert decoded[match.start:match.end] == match.text
+    
+    @pytest.mark.parametrize("body, expected", [
+        (b'{"text":"C:\\\\example.com"}', ['example.com']),
+        (b'{"text":"C:\\\\\\nexample.com"}', ['example.com']),
+        (b'{"text":"C:\\\\\\\\shop.io"}', ['shop.io']),
+    ])
+    def test_bytes_escaped_backslash_before_domain(self, body, expected):
+        """Test that an escaped backslash is not taken for the start of an escape."""
+        assert [m.normalized for m in DomainExtractor.extract_matches_bytes(body)] == expected
+    
+    def test_long_text_window_boundaries(self):
+        """Test that hosts crossing a scan window boundary are found whole."""
+        window = DomainExtractor.SCAN_WINDOW
+        for shift in range(-12, 4):
+            padding = 'x ' * ((window + shift) // 2)
+            text = padding + "https://boundary-shop.com and " + padding + "tail.org"
+            assert DomainExtractor.extract_domains(text) == ['boundary-shop.com', 'tail.org']
+    
+    def test_long_text_truncated(self, monkeypatch):
+        """Test that text past the length cap is not scanned."""
+        monkeypatch.setattr(DomainExtractor, 'MAX_TEXT_LENGTH', 20000)
+        truncated_before = DomainExtractor.guard_stats['truncated']
+        text = "early.com " + 'x ' * 15000 + "late.com"
+        
+        assert DomainExtractor.extract_domains(text) == ['early.com']
+        assert DomainExtractor.guard_stats['truncated'] == truncated_before + 1
+    
+    def test_time_budget_falls_back_to_anchored_scan(self, monkeypatch):
+        """Test that over-budget texts only report scheme or www-prefixed hosts."""
+        monkeypatch.setattr(DomainExtractor, 'TIME_BUDGET_SECONDS', 0.0)
+        over_budget_before = DomainExtractor.guard_stats['over_budget']
+        text = 'x ' * 5000 + "bare.com https://Linked.net/x www.prefixed.org"
+        
+        matches = DomainExtractor.extract_matches(text)
+        assert [m.normalized for m in matches] == ['linked.net', 'prefixed.org']
+        assert [m.text for m in matches] == ['https://Linked.net', 'www.prefixed.org']
+        assert DomainExtractor.guard_stats['over_budget'] == over_budget_before + 1
+        assert DomainExtractor.metrics()['input_guard']['over_budget'] == over_budget_before + 1
@@ -0,0 +1,82 @@
+"""Tests for suffix-aware domain block/allow lists."""
+import os
+import pytest
+from domain_filter import DomainFilter
+
+
+@pytest.fixture
+def list_files(tmp_path):
+    """Blocklist and allowlist files in a temporary directory."""
+    blocklist = tmp_path / "block.txt"
+    allowlist = tmp_path / "allow.txt"
+    blocklist.write_text("# social\ntiktok.com\n*.amazon.com\n.cdn.example.net  # inline comment\n")
+    allowlist.write_text("shop.amazon.com\n")
+    return blocklist, allowlist
+
+
+class TestDomainFilter:
+    """Test suite for DomainFilter class."""
+    
+    def test_blocks_domain_and_subdomains(self, list_files):
+        """Test that an entry blocks the domain and everything under it."""
+        blocklist, _ = list_files
+        domain_filter = DomainFilter(blocklist_path=str(blocklist))
+        
+        assert domain_filter.is_blocked('tiktok.com') is True
+        assert domain_filter.is_blocked('m.tiktok.com') is True
+        assert domain_filter.is_blocked('vm.tiktok.com') is True
+        assert domain_filter.is_blocked('images.cdn.example.net') is True
+        assert domain_filter.is_blocked('nottiktok.com') is False
+        assert domain_filter.is_blocked('example.net') is False
+    
+    def test_allowlist_overrides_parent_block(self, list_files):
+        """Test that a more specific allow entry wins over a block entry."""
+        blocklist, allowlist = list_files
+        domain_filter = DomainFilter(blocklist_path=str(blocklist), allowlist_path=str(allowlist))
+        
+        assert domain_filter.is_blocked('amazon.com') is True
+        assert domain_filter.is_blocked('smile.amazon.com') is True
+        assert domain_filter.is_blocked('shop.amazon.com') is False
+        assert domain_filter.is_blocked('deals.shop.amazon.com') is False
+    
+    def test_builtin_entries(self):
+        """Test that built-in entries apply without any list file."""
+        domain_filter = DomainFilter(['Facebook.com'], blocklist_path=None)
+        assert domain_filter.is_blocked('facebook.com') is True
+        assert domain_filter.is_blocked('business.facebook.com') is True
+        assert domain_filter.stats()['blocked_entries'] == 1
+    
+    @pytest.mark.parametrize("domain", [
+        'promo-deals.s3.amazonaws.com',
+        'd1x2y3z4.cloudfront.net',
+        'cheapstuff.blob.core.windows.net',
+        'giveaway.azureedge.net',
+        'raw.githubusercontent.com',
+        't.me',
+        'discord.gg',
+    ])
+    def test_bundled_list_keeps_tenant_hosts(self, domain):
+        """Test that shared hosting and link hubs in the bundled list are not suffix-blocked."""
+        domain_filter = DomainFilter()
+        assert domain_filter.is_blocked(domain) is False
+        assert domain_filter.is_blocked('vm.tiktok.com') is True
+    
+    def test_missing_file_falls_back_to_builtin(self, tmp_path):
+        """Test that a missing list file doesn't disable the built-in entries."""
+        domain_filter = DomainFilter(['facebook.com'], blocklist_path=str(tmp_path / "missing.txt"))
+        assert domain_filter.is_blocked('facebook.com') is True
+    
+    def test_hot_reload(self, list_files):
+        """Test that changes to the list file are picked up without a restart."""
+        blocklist, _ = list_files
+        domain_filter = DomainFilter(blocklist_path=str(blocklist))
+        assert domain_filter.is_blocked('spam.example') is False
+        assert domain_filter.reload_if_changed() is False
+        
+        blocklist.write_text(blocklist.read_text() + "spam.example\n")
+        stat = os.stat(blocklist)
+        os.utime(blocklist, (stat.st_atime, stat.st_mtime + 10))
+        
+        assert domain_filter.reload_if_changed() is True
+        assert domain_filter.is_blocked('www.spam.example') is True
+        assert domain_filter.stats()['reload_count'] == 2
@@ -0,0 +1,56 @@
+"""Tests for the streaming NDJSON extraction CLI."""
+import gzip
+import io
+import json
+import pytest
+from extract_stream import main, run
+
+
+@pytest.fixture
+def dump_file(tmp_path):
+    """Gzip-compressed JSONL comment dump with one malformed line."""
+    path = tmp_path / "comments.jsonl.gz"
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({'id': 1, 'text': 'Visit example.com now'}) + '\n')
+        f.write(json.dumps({'id': 2, 'text': 'no domains here'}) + '\n')
+        f.write('not json\n')
+        f.write('\n')
+        f.write(json.dumps({'id': 3, 'text': 'https://www.shop.io and blog.test.org'}) + '\n')
+    return path
+
+
+class TestExtractStream:
+    """Test suite for the streaming extraction entry point."""
+    
+    def test_run_in_process(self, dump_file):
+        """Test extraction of a gzip dump without worker processes."""
+        output = io.StringIO()
+        summary = run([str(dump_file)], output, workers=1, chunk_size=2, progress=None)
+        
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert [row['id'] for row in rows] == [1, 3]
+        assert [d['domain'] for d in rows[1]['domains']] == ['shop.io', 'blog.test.org']
+        assert summary['rows'] == 3
+        assert summary['written'] == 2
+        assert summary['bad_rows'] == 1
+    
+    def test_worker_processes_preserve_order(self, tmp_path):
+        """Test that multi-process output is identical to in-process output."""
+        path = tmp_path / "comments.jsonl"
+        path.write_text(''.join(
+            json.dumps({'id': i, 'text': f'deal at site{i}.shop'}) + '\n' for i in range(500)
+        ))
+        
+        serial, parallel = io.StringIO(), io.StringIO()
+        run([str(path)], serial, workers=1, chunk_size=32, progress=None)
+        run([str(path)], parallel, workers=2, chunk_size=32, progress=None)
+        assert parallel.getvalue() == serial.getvalue()
+        assert len(parallel.getvalue().splitlines()) == 500
+    
+    def test_main_include_empty(self, dump_file, tmp_path):
+        """Test the command-line entry point writing every row."""
+        output = tmp_path / "out.ndjson"
+        assert main([str(dump_file), '-o', str(output), '--workers', '1', '--include-empty']) == 0
+        rows = [json.loads(line) for line in output.read_text().splitlines()]
+        assert [row['id'] for row in rows] == [1, 2, 3]
+        assert rows[1]['domains'] == []
@@ -0,0 +1,58 @@
+"""Tests for the verbatim-comment extraction cache."""
+from domain_extractor import DomainMatch
+from extraction_cache import ExtractionCache, text_key
+
+
+class TestExtractionCache:
+    """Test suite for ExtractionCache class."""
+    
+    def test_text_key_is_stable(self):
+        """Test that keys are 64-bit and depend only on the text."""
+        key = text_key("Visit example.com 🔥")
+        assert key == text_key("Visit example.com 🔥")
+        assert key != text_key("Visit example.com")
+        assert 0 <= key < 2 ** 64
+    
+    def test_hit_and_miss_counters(self):
+        """Test hit/miss accounting."""
+        cache = ExtractionCache()
+        assert cache.get(1) is None
+        cache.put(1, ())
+        assert cache.get(1) == ()
+        
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['entries'] == 1
+    
+    def test_evicts_least_recently_used_over_budget(self):
+        """Test that the memory budget evicts the oldest entries first."""
+        match = DomainMatch('example.com', 'example.com', 0, 11)
+        cache = ExtractionCache(max_bytes=1000)
+        for key in range(10):
+            cache.put(key, (match,))
+            cache.get(0)  # keep entry 0 hot
+        
+        assert cache.bytes_used <= 1000
+        assert cache.evictions > 0
+        assert cache.get(0) is not None
+        assert cache.get(1) is None
+    
+    def test_persistence_round_trip(self, tmp_path):
+        """Test saving to disk and loading into a new cache."""
+        path = tmp_path / "cache.json"
+        match = DomainMatch('https://example.com', 'example.com', 6, 25)
+        cache = ExtractionCache(path=str(path))
+        cache.put(text_key("Go to https://example.com"), (match,))
+        cache.put(text_key("nothing.here"), ())
+        assert cache.save() is True
+        
+        restored = ExtractionCache(path=str(path))
+        assert restored.load(DomainMatch) == 2
+        assert restored.get(text_key("Go to https://example.com")) == (match,)
+        assert restored.get(text_key("nothing.here")) == ()
+    
+    def test_load_missing_file(self, tmp_path):
+        """Test that a missing cache file is not an error."""
+        cache = ExtractionCache(path=str(tmp_path / "missing.json"))
+        assert cache.load() == 0
@@ -0,0 +1,173 @@
+"""Tests for the durable SQLite outbox."""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from database import DatabaseError
+from outbox import Outbox
+
+
+class FakeClient:
+    """Records ingest_harvest calls, failing on demand."""
+
+    def __init__(self):
+        self.calls = []
+        self.errors = []
+        self.attempts = []
+        self.stall_on = set()
+
+    async def ingest_harvest(self, video, comments, mentions):
+        self.attempts.append(time.monotonic())
+        if video["video_id"] in self.stall_on:
+            await asyncio.Event().wait()
+        if self.errors:
+            raise self.errors.pop(0)
+        self.calls.append((video["video_id"], len(comments), len(mentions)))
+        return {"comments": len(comments), "mentions": len(mentions)}
+
+
+class TestOutbox:
+    """Test suite for Outbox."""
+
+    @pytest.fixture
+    def client(self):
+        return FakeClient()
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "data" / "outbox.db")
+
+    def make_outbox(self, client, path):
+        return Outbox(client, path=path, batch_size=10, drain_interval=60, max_backoff=60)
+
+    async def test_put_and_drain(self, client, path):
+        """Test that entries are delivered in order and removed."""
+        outbox = self.make_outbox(client, path)
+        await outbox.open()
+
+        await outbox.put_harvest({"video_id": "1"}, [{"text": "a"}], [{"comment_index": 0}])
+        await outbox.put_harvest({"video_id": "2"}, [], [])
+        assert outbox.status()["depth"] == 2
+
+        assert await outbox.drain_once() is False
+        assert client.calls == [("1", 1, 1), ("2", 0, 0)]
+        assert outbox.status()["depth"] == 0
+        assert outbox.status()["drained"] == 2
+        await outbox.close()
+
+    async def test_entries_survive_restart(self, client, path):
+        """Test that undrained entries are replayed by a new process."""
+        outbox = self.make_outbox(client, path)
+        await outbox.open()
+        await outbox.put_harvest({"video_id": "1"}, [], [])
+        await outbox.close()
+
+        reopened = self.make_outbox(client, path)
+        await reopened.start()
+        for _ in range(50):
+            if client.calls:
+                break
+            await asyncio.sleep(0.01)
+
+        assert client.calls == [("1", 0, 0)]
+        assert reopened.status()["depth"] == 0
+        await reopened.close()
+
+    async def test_transient_failure_keeps_entry(self, client, path):
+        """Test that a 5xx stops the pass and leaves entries in order."""
+        client.errors = [DatabaseError(503, "unavailable")]
+        outbox = self.make_outbox(client, path)
+        await outbox.open()
+        await outbox.put_harvest({"video_id": "1"}, [], [])
+        await outbox.put_harvest({"video_id": "2"}, [], [])
+
+        assert await outbox.drain_once() is True
+        status = outbox.status()
+        assert status["depth"] == 2
+        assert status["failures"] == 1
+        assert "unavailable" in status["last_error"]
+        assert outbox._db.execute("SELECT attempts FROM outbox ORDER BY id").fetchall() == [(1,), (0,)]
+
+        assert await outbox.drain_once() is False
+        assert client.calls == [("1", 0, 0), ("2", 0, 0)]
+        await outbox.close()
+
+    async def test_new_entries_do_not_cut_backoff_short(self, client, path):
+        """Test that puts during a failing drain wait for the retry deadline."""
+        client.errors = [DatabaseError(503, "unavailable")] * 100
+        outbox = Outbox(client, path=path, batch_size=10, drain_interval=0.05, max_backoff=60)
+        await outbox.start()
+
+        await outbox.put_harvest({"video_id": "0"}, [], [])
+        for i in range(20):
+            await asyncio.sleep(0.01)
+            await outbox.put_harvest({"video_id": str(i + 1)}, [], [])
+
+        # Failed at once, then retried only after the doubled interval (0.1s)
+        assert len(client.attempts) == 2
+        assert client.attempts[1] - client.attempts[0] >= 0.09
+        assert outbox.status()["depth"] == 21
+        await outbox.close()
+
+    @pytest.mark.parametrize("error", [
+        DatabaseError(401, "JWT expired"),
+        DatabaseError(403, "permission denied", "42501"),
+        DatabaseError(404, "Could not find the function public.ingest_harvest", "PGRST202"),
+        DatabaseError(400, "Could not find the 'dedup_key' column", "PGRST204"),
+    ])
+    async def test_deploy_errors_are_retried(self, client, path, error):
+        """Test that auth and missing-schema errors keep entries queued."""
+        client.errors = [error]
+        outbox = self.make_outbox(client, path)
+        await outbox.open()
+        await outbox.put_harvest({"video_id": "1"}, [], [])
+
+        assert await outbox.drain_once() is True
+        assert outbox.status()["depth"] == 1
+        assert outbox.status()["dead_letters"] == 0
+
+        assert await outbox.drain_once() is False
+        assert client.calls == [("1", 0, 0)]
+        await outbox.close()
+
+    async def test_close_cancels_in_flight_drain(self, client, path):
+        """Test that close does not wait for a hung send and keeps delivered entries done."""
+        client.stall_on = {"2"}
+        outbox = self.make_outbox(client, path)
+        await outbox.open()
+        await outbox.put_harvest({"video_id": "1"}, [], [])
+        await outbox.put_harvest({"video_id": "2"}, [], [])
+        await outbox.start()
+        while len(client.attempts) < 2:
+            await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(outbox.close(), timeout=1)
+
+        client.stall_on = set()
+        reopened = self.make_outbox(client, path)
+        await reopened.open()
+        assert reopened.status()["depth"] == 1
+        await reopened.drain_once()
+        assert client.calls == [("1", 0, 0), ("2", 0, 0)]
+        await reopened.close()
+
+    async def test_rejected_entry_is_dead_lettered(self, client, path):
+        """Test that a 4xx moves the entry aside without blocking the rest."""
+        client.errors = [DatabaseError(400, "invalid input syntax")]
+        outbox = self.make_outbox(client, path)
+        await outbox.open()
+        await outbox.put_harvest({"video_id": "bad"}, [], [])
+        await outbox.put_harvest({"video_id": "2"}, [], [])
+
+        await outbox.drain_once()
+        assert client.calls == [("2", 0, 0)]
+        assert outbox.status()["depth"] == 0
+        assert outbox.status()["dead_letters"] == 1
+        await outbox.close()
+
+        dead = sqlite3.connect(path).execute("SELECT payload, last_error FROM outbox_dead").fetchall()
+        assert len(dead) == 1
+        assert '"bad"' in dead[0][0]
+        assert "invalid input syntax" in dead[0][1]
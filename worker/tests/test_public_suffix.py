@@ -0,0 +1,57 @@
+"""Tests for the compiled Public Suffix List trie."""
+import pytest
+from public_suffix import PublicSuffixTrie, compile_suffix_list, load
+
+
+SAMPLE_LIST = b"""
+// Comment lines and blank lines are ignored
+com
+uk
+co.uk
+*.ck
+!www.ck
+github.io
+"""
+
+
+@pytest.fixture
+def trie():
+    """Trie compiled from a small in-memory list."""
+    return PublicSuffixTrie(compile_suffix_list(SAMPLE_LIST))
+
+
+class TestPublicSuffixTrie:
+    """Test suite for PublicSuffixTrie."""
+    
+    @pytest.mark.parametrize("domain,expected", [
+        ('example.com', ('', 'example.com', 'com')),
+        ('shop.example.co.uk', ('shop', 'example.co.uk', 'co.uk')),
+        ('a.b.example.co.uk', ('a.b', 'example.co.uk', 'co.uk')),
+        ('foo.bar.ck', ('', 'foo.bar.ck', 'bar.ck')),  # wildcard rule
+        ('www.ck', ('', 'www.ck', 'ck')),  # exception rule
+        ('user.github.io', ('', 'user.github.io', 'github.io')),
+        ('example.unlisted', ('', 'example.unlisted', 'unlisted')),  # implicit * rule
+        ('co.uk', ('', None, 'co.uk')),
+    ])
+    def test_split(self, trie, domain, expected):
+        """Test splitting domains along their public suffix."""
+        assert tuple(trie.split(domain)) == expected
+    
+    def test_rejects_invalid_buffer(self):
+        """Test that a buffer without the trie header is rejected."""
+        with pytest.raises(ValueError):
+            PublicSuffixTrie(b"\0" * 64)
+    
+    def test_load_compiles_and_memory_maps(self, tmp_path):
+        """Test that load() builds the binary file and rebuilds it when the source changes."""
+        source = tmp_path / "list.dat"
+        compiled = tmp_path / "list.bin"
+        source.write_bytes(SAMPLE_LIST)
+        
+        trie = load(str(source), str(compiled))
+        assert compiled.exists()
+        assert trie.split('example.co.uk').suffix == 'co.uk'
+        
+        source.write_bytes(SAMPLE_LIST + b"example.co.uk\n")
+        trie = load(str(source), str(compiled))
+        assert trie.split('shop.example.co.uk').suffix == 'example.co.uk'
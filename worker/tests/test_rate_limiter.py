@@ -0,0 +1,493 @@
+"""Tests for the asyncio rate limiter."""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from config import config
+from rate_limiter import (TOKEN_BUCKET_SCRIPT, TOKEN_RETURN_SCRIPT, LocalTokenBucket, RateLimiter,
+                          TokenLease, _now_us, script_sha)
+
+# Optional: runs the Redis scripts under Lua 5.1, the version Redis embeds
+try:
+    from lupa.lua51 import LuaRuntime
+except ImportError:
+    LuaRuntime = None
+
+
+class TestLocalTokenBucket:
+    """Test suite for LocalTokenBucket."""
+
+    async def test_burst_then_paced(self):
+        """Test that the burst is immediate and later tokens arrive at the rate."""
+        bucket = LocalTokenBucket(rate=50, burst=2)
+        started = time.monotonic()
+
+        for _ in range(4):
+            assert await bucket.acquire() is True
+
+        elapsed = time.monotonic() - started
+        assert 0.035 <= elapsed < 0.2  # two tokens at 20ms each
+
+    async def test_no_wait_fails_when_empty(self):
+        """Test that wait=False returns immediately without a token."""
+        bucket = LocalTokenBucket(rate=1, burst=1)
+
+        assert await bucket.acquire(wait=False) is True
+        assert await bucket.acquire(wait=False) is False
+
+    async def test_waiters_are_served_fifo(self):
+        """Test that queued tasks get tokens in arrival order."""
+        bucket = LocalTokenBucket(rate=100, burst=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(name):
+            await bucket.acquire()
+            order.append(name)
+
+        tasks = []
+        for name in range(5):
+            tasks.append(asyncio.create_task(take(name)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+        assert order == [0, 1, 2, 3, 4]
+
+    async def test_loop_keeps_running_while_waiting(self):
+        """Test that waiting does not block other tasks on the loop."""
+        bucket = LocalTokenBucket(rate=10, burst=1)
+        await bucket.acquire()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await bucket.acquire()
+        task.cancel()
+
+        assert ticks >= 5
+
+    async def test_cancelled_waiter_does_not_consume_token(self):
+        """Test that a cancelled waiter leaves its token for the next one."""
+        bucket = LocalTokenBucket(rate=20, burst=1)
+        await bucket.acquire()
+
+        first = asyncio.create_task(bucket.acquire())
+        second = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        first.cancel()
+
+        started = time.monotonic()
+        assert await second is True
+        assert time.monotonic() - started < 0.09  # one token interval, not two
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    async def test_close_releases_waiters(self):
+        """Test that shutdown wakes waiters with False."""
+        bucket = LocalTokenBucket(rate=0.01, burst=1)
+        await bucket.acquire()
+
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        assert bucket.waiting == 1
+        bucket.close()
+
+        assert await waiter is False
+        assert await bucket.acquire() is False
+
+
+class TestRateLimiterRedis:
+    """Test RateLimiter against a mocked Upstash REST API."""
+
+    def make_limiter(self, handler):
+        requests = []
+
+        def record(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return handler(request)
+
+        limiter = RateLimiter(base_url="https://redis.test", token="test-token",
+                              transport=httpx.MockTransport(record))
+        return limiter, requests
+
+    async def test_commands_share_pooled_client(self):
+        """Test that commands reuse one client and record latency per command."""
+        limiter, requests = self.make_limiter(lambda request: httpx.Response(200, json={"result": "PONG"}))
+
+        assert await limiter.health_check() is True
+        client = limiter.client
+        assert await limiter.health_check() is True
+
+        assert limiter.client is client
+        assert len(requests) == 2
+        assert requests[0].headers["authorization"] == "Bearer test-token"
+        assert limiter.metrics()["redis_commands"]["PING"]["count"] == 2
+
+        await limiter.close()
+        assert client.is_closed
+
+    async def test_failed_command_falls_back_to_local(self):
+        """Test that Redis errors are counted and the local bucket is used."""
+        limiter, _ = self.make_limiter(lambda request: httpx.Response(503))
+
+        assert await limiter.acquire_token(wait=False) is True
+        assert limiter.metrics()["redis_commands"]["EVALSHA"]["errors"] == 1
+        await limiter.close()
+
+    async def test_noscript_loads_script_once(self):
+        """Test that the script is loaded on NOSCRIPT and then called by SHA only."""
+        loaded = set()
+
+        def handler(request):
+            body = json.loads(request.content)
+            if request.url.path == "/pipeline":
+                results = []
+                for command in body:
+                    if command[:2] == ["SCRIPT", "LOAD"]:
+                        loaded.add(script_sha(command[2]))
+                        results.append({"result": script_sha(command[2])})
+                    else:
+                        results.append({"result": [1, 0]})
+                return httpx.Response(200, json=results)
+            if body[1] not in loaded:
+                return httpx.Response(400, json={"error": "NOSCRIPT No matching script. Please use EVAL."})
+            return httpx.Response(200, json={"result": [1, 0]})
+
+        limiter, requests = self.make_limiter(handler)
+
+        assert await limiter.acquire_token(wait=False) is True
+        assert await limiter.acquire_token(wait=False) is True
+
+        paths = [request.url.path for request in requests]
+        assert paths == ["/", "/pipeline", "/"]
+        evalsha = json.loads(requests[2].content)
+        assert evalsha[:3] == ["EVALSHA", script_sha(TOKEN_BUCKET_SCRIPT), 1]
+        assert TOKEN_BUCKET_SCRIPT not in requests[2].content.decode()
+        await limiter.close()
+
+    async def test_several_buckets_in_one_call(self):
+        """Test that multi-bucket acquisition is one EVALSHA over all keys."""
+        limiter, requests = self.make_limiter(lambda request: httpx.Response(200, json={"result": [0, 1000]}))
+
+        assert await limiter.acquire_tokens(["global", "tiktok", "global"], wait=False) is False
+
+        assert len(requests) == 1
+        command = json.loads(requests[0].content)
+        assert command[2] == 2
+        assert [key.rsplit(":", 1)[1] for key in command[3:5]] == ["global", "tiktok"]
+        await limiter.close()
+
+    async def test_wait_sleeps_until_retry_after(self):
+        """Test that a denied waiter sleeps for the returned retry-after, then retries."""
+        replies = iter([[0, 150_000], [1, 0]])
+        limiter, requests = self.make_limiter(
+            lambda request: httpx.Response(200, json={"result": next(replies)}))
+
+        started = time.monotonic()
+        assert await limiter.acquire_token() is True
+
+        assert 0.14 <= time.monotonic() - started < 0.5
+        assert len(requests) == 2
+        await limiter.close()
+
+    async def test_close_releases_queued_redis_waiters(self):
+        """Test that close() wakes the sleeping waiter and the queued one gets False without Redis."""
+        limiter, requests = self.make_limiter(
+            lambda request: httpx.Response(200, json={"result": [0, 5_000_000]}))
+
+        sleeping = asyncio.create_task(limiter.acquire_token())
+        queued = asyncio.create_task(limiter.acquire_token())
+        while not requests:
+            await asyncio.sleep(0.01)
+
+        await limiter.close()
+
+        assert await asyncio.wait_for(sleeping, 1) is False
+        assert await asyncio.wait_for(queued, 1) is False
+        assert len(requests) == 1
+        with pytest.raises(RuntimeError):
+            limiter.client
+        assert limiter._client is None
+
+    async def test_remaining_tokens_from_tat(self):
+        """Test that remaining tokens are derived from how far the TAT is ahead."""
+        limiter, _ = self.make_limiter(lambda request: httpx.Response(
+            200, json={"result": str(time.time_ns() // 1000 + 4 * limiter.interval_us)}))
+
+        remaining, burst = await limiter.get_remaining_tokens()
+
+        assert burst == limiter.burst_size
+        assert remaining == pytest.approx(limiter.burst_size - 4, abs=0.01)
+        await limiter.close()
+
+    async def test_other_script_errors_fall_back_to_local(self):
+        """Test that a script error other than NOSCRIPT is not retried."""
+        limiter, requests = self.make_limiter(
+            lambda request: httpx.Response(400, json={"error": "ERR wrong number of arguments"}))
+
+        assert await limiter.acquire_token(wait=False) is True
+        assert len(requests) == 1
+        await limiter.close()
+
+
+class FakeBucket:
+    """Upstash stand-in holding never-refilling buckets, created full on first use."""
+
+    def __init__(self, tokens):
+        self.initial = tokens
+        self.buckets = {}
+        self.calls = 0
+
+    def left(self, identifier="global"):
+        return self.buckets.get(f"rate_limit:shared:{identifier}", self.initial)
+
+    def __call__(self, request):
+        self.calls += 1
+        sha, key_count, *rest = json.loads(request.content)[1:]
+        keys, count = rest[:key_count], int(rest[-1])
+        for key in keys:
+            self.buckets.setdefault(key, self.initial)
+        if sha == script_sha(TOKEN_BUCKET_SCRIPT):
+            granted = min([count] + [self.buckets[key] for key in keys])
+            for key in keys:
+                self.buckets[key] -= granted
+            return httpx.Response(200, json={"result": [granted, 0 if granted else 60_000_000]})
+        assert sha == script_sha(TOKEN_RETURN_SCRIPT)
+        for key in keys:
+            self.buckets[key] += count
+        return httpx.Response(200, json={"result": count})
+
+
+class TestTokenLeasing:
+    """Test leased blocks of Redis tokens."""
+
+    @pytest.fixture(autouse=True)
+    def leasing(self, monkeypatch):
+        monkeypatch.setattr(config, "rate_limit_leasing", True)
+        monkeypatch.setattr(config, "rate_limit_bucket_scope", "shared")
+        monkeypatch.setattr(config, "rate_limit_lease_seconds", 0.2)
+        monkeypatch.setattr(config, "rate_limit_lease_max_tokens", 8)
+
+    def make_limiter(self, bucket):
+        return RateLimiter(base_url="https://redis.test", token="test-token",
+                           transport=httpx.MockTransport(bucket))
+
+    async def test_busy_worker_reserves_blocks(self):
+        """Test that sustained demand is served by fewer, larger reservations."""
+        bucket = FakeBucket(tokens=100)
+        limiter = self.make_limiter(bucket)
+
+        for _ in range(40):
+            assert await limiter.acquire_token(wait=False) is True
+
+        leases = limiter.metrics()["leases"]
+        assert bucket.calls < 15
+        assert leases["reserved"] == 40 + leases["held"]
+        assert bucket.left() == 100 - leases["reserved"]
+
+        await limiter.close()
+        assert bucket.left() == 60
+
+    async def test_expired_lease_is_returned(self):
+        """Test that unspent tokens go back to Redis when the lease runs out."""
+        bucket = FakeBucket(tokens=100)
+        limiter = self.make_limiter(bucket)
+
+        for _ in range(10):
+            await limiter.acquire_token(wait=False)
+        held = limiter.metrics()["leases"]["held"]
+        assert held > 0
+
+        await asyncio.sleep(0.3)
+        assert limiter.metrics()["leases"]["returned"] == held
+        assert bucket.left() == 90
+        await limiter.close()
+
+    async def test_never_leases_more_than_available(self):
+        """Test that leasing cannot hand out more tokens than the shared bucket had."""
+        bucket = FakeBucket(tokens=5)
+        limiter = self.make_limiter(bucket)
+
+        results = [await limiter.acquire_token(wait=False) for _ in range(20)]
+
+        assert results.count(True) == 5
+        await limiter.close()
+        assert bucket.left() == 0
+
+    async def test_workers_share_one_budget(self, monkeypatch):
+        """Test that leasing workers draw from, and return to, the same buckets."""
+        bucket = FakeBucket(tokens=10)
+        first = self.make_limiter(bucket)
+        monkeypatch.setattr(config, "worker_id", "worker-2")
+        second = self.make_limiter(bucket)
+
+        assert all([await first.acquire_token(wait=False) for _ in range(6)])
+        assert first.metrics()["leases"]["held"] > 0
+        await first.close()
+
+        results = [await second.acquire_token(wait=False) for _ in range(20)]
+        assert results.count(True) == 4
+        assert list(bucket.buckets) == ["rate_limit:shared:global"]
+        await second.close()
+
+    async def test_leasing_keeps_worker_scope(self, monkeypatch):
+        """Test that leasing alone does not merge per-worker buckets."""
+        monkeypatch.setattr(config, "rate_limit_bucket_scope", "worker")
+        bucket = FakeBucket(tokens=10)
+        limiter = self.make_limiter(bucket)
+
+        assert await limiter.acquire_token(wait=False) is True
+        assert list(bucket.buckets) == [f"rate_limit:{config.worker_id}:global"]
+        await limiter.close()
+
+    def test_lease_size_follows_demand(self):
+        """Test that the next lease is sized to the demand seen during the last one."""
+        lease = TokenLease(["global"], ttl=1.0, max_tokens=50)
+        assert lease.next_size() == 1
+
+        lease.renew(4)
+        assert all(lease.take() for _ in range(3))
+        lease._started -= 0.5  # 4 tokens spent over half a second
+        assert lease.next_size() == 8
+
+        lease.renew(8)
+        lease._started -= 10  # then one token in ten seconds
+        assert lease.next_size() == 5
+        lease._started -= 100
+        assert lease.next_size() == 3
+
+
+class LuaRedis:
+    """Upstash stand-in that runs the real scripts under Lua against an in-memory keyspace."""
+
+    def __init__(self):
+        self.lua = LuaRuntime(unpack_returned_tuples=True)
+        self.run_script = self.lua.eval("""function(script, call, keys, argv)
+            redis = {call = call}
+            KEYS = keys
+            ARGV = argv
+            return assert(loadstring(script))()
+        end""")
+        self.scripts = {script_sha(script): script for script in (TOKEN_BUCKET_SCRIPT, TOKEN_RETURN_SCRIPT)}
+        self.data = {}  # key -> (value, expires_at_us)
+        self.now_us = _now_us()
+
+    def call(self, command, key, *args):
+        if command == "GET":
+            value, expires_at = self.data.get(key, (None, 0))
+            if value is None or expires_at <= self.now_us:
+                self.data.pop(key, None)
+                return False
+            return value
+        if command == "SET":
+            value, px, ttl = args
+            assert px == "PX" and ttl >= 1 and ttl == int(ttl)
+            self.data[key] = (value, self.now_us + int(ttl) * 1000)
+            return "OK"
+        assert command == "DEL"
+        return 1 if self.data.pop(key, None) else 0
+
+    def ttl_ms(self, key):
+        return (self.data[key][1] - self.now_us) // 1000
+
+    def eval(self, script, keys, args):
+        result = self.run_script(script, self.call, self.lua.table(*keys),
+                                 self.lua.table(*[str(arg) for arg in args]))
+        # Redis truncates Lua numbers to integers in replies
+        if isinstance(result, (int, float)):
+            return int(result)
+        return [int(value) for value in result.values()]
+
+    def __call__(self, request):
+        self.now_us = _now_us()
+        sha, key_count, *rest = json.loads(request.content)[1:]
+        return httpx.Response(200, json={"result": self.eval(self.scripts[sha], rest[:key_count], rest[key_count:])})
+
+
+@pytest.mark.skipif(LuaRuntime is None, reason="lupa is not installed")
+class TestRedisScripts:
+    """Test the GCRA Lua scripts themselves, not a model of them."""
+
+    INTERVAL = 2_000_000
+    BURST = 5
+
+    def take(self, redis, keys, count=1):
+        return redis.eval(TOKEN_BUCKET_SCRIPT, keys,
+                          [self.INTERVAL, self.BURST * self.INTERVAL, redis.now_us, count])
+
+    def test_burst_then_one_per_interval(self):
+        """Test that a full bucket grants the burst, then one token per interval."""
+        redis = LuaRedis()
+
+        assert self.take(redis, ["a"], count=3) == [3, 0]
+        assert [self.take(redis, ["a"]) for _ in range(3)] == [[1, 0], [1, 0], [0, self.INTERVAL]]
+
+        redis.now_us += self.INTERVAL // 2
+        assert self.take(redis, ["a"]) == [0, self.INTERVAL // 2]
+        redis.now_us += self.INTERVAL // 2
+        assert self.take(redis, ["a"], count=5) == [1, 0]
+
+        redis.now_us += 3 * self.INTERVAL
+        assert self.take(redis, ["a"], count=5) == [3, 0]
+
+    def test_several_keys_grant_what_all_allow(self):
+        """Test that one call grants the smallest budget and charges every key for it."""
+        redis = LuaRedis()
+        self.take(redis, ["a"], count=4)
+
+        assert self.take(redis, ["a", "b"], count=3) == [1, 0]
+        assert self.take(redis, ["a", "b"]) == [0, self.INTERVAL]
+        assert self.take(redis, ["b"], count=10) == [4, 0]
+
+    def test_denied_call_writes_nothing(self):
+        """Test that a denial leaves every key's arrival time untouched."""
+        redis = LuaRedis()
+        self.take(redis, ["a"], count=5)
+        before = dict(redis.data)
+
+        assert self.take(redis, ["a", "b"]) == [0, self.INTERVAL]
+        assert redis.data == before
+
+    def test_key_expires_once_bucket_is_full_again(self):
+        """Test that PX matches the time until the bucket has fully refilled."""
+        redis = LuaRedis()
+        self.take(redis, ["a"], count=2)
+
+        assert redis.ttl_ms("a") == 2 * self.INTERVAL // 1000
+        redis.now_us += 2 * self.INTERVAL
+        assert self.take(redis, ["a"], count=10) == [self.BURST, 0]
+        assert redis.ttl_ms("a") == self.BURST * self.INTERVAL // 1000
+
+    def test_return_moves_arrival_time_back(self):
+        """Test that returned tokens can be taken again and a fully returned key is deleted."""
+        redis = LuaRedis()
+        self.take(redis, ["a", "b"], count=4)
+        self.take(redis, ["b"])
+
+        assert redis.eval(TOKEN_RETURN_SCRIPT, ["a", "b"], [self.INTERVAL, redis.now_us, 4]) == 4
+        assert "a" not in redis.data
+        assert redis.ttl_ms("b") == self.INTERVAL // 1000
+        assert self.take(redis, ["a", "b"], count=10) == [4, 0]
+
+    async def test_limiter_waits_for_real_retry_after(self, monkeypatch):
+        """Test the limiter end to end against the script: burst, then paced by retry-after."""
+        monkeypatch.setattr(config, "rate_limit_requests_per_minute", 600)
+        monkeypatch.setattr(config, "rate_limit_burst_size", 2)
+        redis = LuaRedis()
+        limiter = RateLimiter(base_url="https://redis.test", token="test-token",
+                              transport=httpx.MockTransport(redis))
+
+        started = time.monotonic()
+        assert [await limiter.acquire_token(wait=False) for _ in range(3)] == [True, True, False]
+        assert await limiter.acquire_token() is True
+
+        assert 0.05 <= time.monotonic() - started < 0.5
+        await limiter.close()
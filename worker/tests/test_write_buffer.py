@@ -0,0 +1,213 @@
+"""Tests for the write-behind buffer."""
+import asyncio
+import time
+
+import pytest
+
+from database import DatabaseError
+from domain_extractor import DomainExtractor
+from metrics import LatencyHistogram
+from write_buffer import WriteBuffer
+
+
+class FakeClient:
+    """Records batched writes instead of calling Supabase."""
+
+    def __init__(self):
+        self.calls = []
+        self.fail_comments = 0
+        self.comment_error = DatabaseError(503, "unavailable")
+        self.comment_attempts = []
+
+    async def insert_comments(self, comments):
+        self.comment_attempts.append(time.monotonic())
+        if self.fail_comments:
+            self.fail_comments -= 1
+            raise self.comment_error
+        self.calls.append(("comment", list(comments)))
+        return comments
+
+    async def upsert_domains(self, domains, count_mentions=True):
+        domains = list(domains)
+        self.calls.append(("domain", sorted(domains), count_mentions))
+        normalized = (DomainExtractor.normalize_domain(name) for name in domains)
+        return {name: f"id-{name}" for name in normalized}
+
+    async def insert_domain_mentions(self, mentions):
+        self.calls.append(("domain_mention", list(mentions)))
+        return len(mentions)
+
+
+class TestWriteBuffer:
+    """Test suite for WriteBuffer."""
+
+    @pytest.fixture
+    def client(self):
+        return FakeClient()
+
+    async def test_coalesces_until_flush(self, client):
+        """Test that rows from several producers go out in one batch per table."""
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000)
+
+        await asyncio.gather(*(
+            buffer.add_comments([{"id": f"c{i}", "text": "hi"}]) for i in range(5)
+        ))
+        await buffer.add_domains(["example.com", "example.com", "shop.io"])
+        assert client.calls == []
+        assert buffer.pending == 7
+
+        await buffer.flush()
+
+        assert client.calls[0] == ("comment", [{"id": f"c{i}", "text": "hi"} for i in range(5)])
+        assert client.calls[1] == ("domain", ["example.com", "example.com", "shop.io"], True)
+        assert buffer.pending == 0
+        assert buffer.metrics()["tables"]["comment"]["last_flush_size"] == 5
+
+    async def test_mentions_resolve_domain_ids(self, client):
+        """Test that mentions by domain name get the upserted domain id."""
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000)
+
+        await buffer.add_comments([{"id": "c1", "text": "see www.Example.com"}])
+        await buffer.add_mentions([{"comment_id": "c1", "domain_name": "www.Example.com"}])
+        await buffer.flush()
+
+        assert [call[0] for call in client.calls] == ["comment", "domain", "domain_mention"]
+        assert client.calls[1] == ("domain", ["www.Example.com"], False)
+        assert client.calls[2] == ("domain_mention", [{"comment_id": "c1", "domain_id": "id-example.com"}])
+
+    async def test_size_threshold_triggers_background_flush(self, client):
+        """Test that reaching flush_size wakes the flush task."""
+        buffer = WriteBuffer(client, flush_size=3, max_age=60, max_pending=1000)
+        buffer.start()
+
+        await buffer.add_comments([{"id": "c1"}, {"id": "c2"}, {"id": "c3"}])
+        for _ in range(20):
+            if client.calls:
+                break
+            await asyncio.sleep(0.01)
+
+        assert client.calls == [("comment", [{"id": "c1"}, {"id": "c2"}, {"id": "c3"}])]
+        await buffer.close()
+
+    async def test_age_threshold_triggers_flush(self, client):
+        """Test that rows are flushed after max_age even below flush_size."""
+        buffer = WriteBuffer(client, flush_size=100, max_age=0.05, max_pending=1000)
+        buffer.start()
+
+        await buffer.add_comments([{"id": "c1"}])
+        await asyncio.sleep(0.2)
+
+        assert client.calls == [("comment", [{"id": "c1"}])]
+        await buffer.close()
+
+    async def test_backpressure_waits_for_flush(self, client):
+        """Test that producers block while the buffer is full."""
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=2)
+        buffer.start()
+
+        await buffer.add_comments([{"id": "c1"}, {"id": "c2"}])
+        await asyncio.wait_for(buffer.add_comments([{"id": "c3"}]), timeout=1)
+
+        assert buffer.backpressure_waits >= 1
+        assert client.calls[0] == ("comment", [{"id": "c1"}, {"id": "c2"}])
+        assert buffer.pending == 1
+        await buffer.close()
+
+    async def test_repeated_domains_reserve_distinct_rows(self, client):
+        """Test that repeat sightings of buffered domains do not count against max_pending."""
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=3)
+
+        await buffer.add_domains(["spam.com", "deals.net"])
+        await buffer.add_domains(["spam.com"] * 50 + ["deals.net"] * 50 + ["shop.io"])
+
+        assert buffer.backpressure_waits == 0
+        assert client.calls == []
+        assert buffer.pending == 3
+
+    async def test_failed_flush_is_requeued(self, client):
+        """Test that rows survive a transient failure."""
+        client.fail_comments = 1
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000)
+
+        await buffer.add_comments([{"id": "c1"}])
+        await buffer.add_mentions([{"comment_id": "c1", "domain_name": "example.com"}])
+        await buffer.flush()
+        assert client.calls == []
+        assert buffer.pending == 2
+        assert buffer.metrics()["tables"]["comment"]["failures"] == 1
+
+        await buffer.flush()
+        assert [call[0] for call in client.calls] == ["comment", "domain", "domain_mention"]
+
+    @pytest.mark.parametrize("status,dropped", [(401, 0), (404, 0), (400, 1), (409, 1)])
+    async def test_only_payload_rejections_drop_rows(self, client, status, dropped):
+        """Test that auth and routing errors requeue rows while bad data is dropped."""
+        client.fail_comments = 1
+        client.comment_error = DatabaseError(status, "error")
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000)
+
+        await buffer.add_comments([{"id": "c1"}])
+        await buffer.flush()
+
+        assert buffer.metrics()["tables"]["comment"]["dropped"] == dropped
+        assert buffer.pending == 1 - dropped
+
+    async def test_failed_flush_backs_off(self, client, monkeypatch):
+        """Test that flush requests during the backoff do not retry early."""
+        monkeypatch.setattr(WriteBuffer, "RETRY_BASE_BACKOFF", 0.1)
+        client.fail_comments = 100
+        buffer = WriteBuffer(client, flush_size=1, max_age=60, max_pending=1000)
+        buffer.start()
+
+        for i in range(20):
+            await buffer.add_comments([{"id": f"c{i}"}])
+            await asyncio.sleep(0.01)
+
+        # Failed at once, then retried only after the 0.1s backoff
+        assert len(client.comment_attempts) == 2
+        assert client.comment_attempts[1] - client.comment_attempts[0] >= 0.09
+        client.fail_comments = 0
+        await buffer.close()
+        assert buffer.pending == 0
+
+    async def test_mentions_of_stored_comments_are_dropped(self, client):
+        """Test that mentions are skipped when their comment was already stored."""
+        async def insert_new(comments):
+            return [comment for comment in comments if comment["id"] != "c1"]
+        client.insert_comments = insert_new
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000)
+
+        await buffer.add_comments([{"id": "c1"}, {"id": "c2"}])
+        await buffer.add_mentions([
+            {"comment_id": "c1", "domain_id": "d1"},
+            {"comment_id": "c2", "domain_id": "d1"},
+        ])
+        await buffer.flush()
+
+        assert client.calls == [("domain_mention", [{"comment_id": "c2", "domain_id": "d1"}])]
+        assert buffer.metrics()["tables"]["comment"]["duplicates"] == 1
+
+    async def test_close_flushes_and_rejects_new_rows(self, client):
+        """Test that shutdown writes everything still buffered."""
+        buffer = WriteBuffer(client, flush_size=100, max_age=60, max_pending=1000)
+        buffer.start()
+
+        await buffer.add_domains(["example.com"])
+        await buffer.close()
+
+        assert client.calls == [("domain", ["example.com"], True)]
+        with pytest.raises(RuntimeError):
+            await buffer.add_domains(["late.com"])
+
+    def test_latency_histogram(self):
+        """Test histogram counts and bucketed percentiles."""
+        histogram = LatencyHistogram(buckets_ms=(1, 10, 100))
+        for seconds in (0.0005, 0.002, 0.003, 0.05, 2.0):
+            histogram.observe(seconds)
+
+        snapshot = histogram.snapshot()
+        assert snapshot["count"] == 5
+        assert snapshot["buckets"] == {"le_1": 1, "le_10": 2, "le_100": 1, "le_inf": 1}
+        assert snapshot["p50_ms"] == 10
+        assert snapshot["max_ms"] == pytest.approx(2000)
+        assert snapshot["p99_ms"] == pytest.approx(2000)
@@ -0,0 +1,352 @@
+"""
+Write-behind buffer coalescing comment, domain and mention writes
+"""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Optional, Dict, Any, Iterable, List
+import structlog
+
+from config import config
+from database import SupabaseClient, db_client, is_payload_rejection, root_error
+from domain_cache import DomainIdCache, domain_cache
+from domain_extractor import DomainExtractor
+from metrics import LatencyHistogram
+
+logger = structlog.get_logger()
+
+
+class WriteBuffer:
+    """
+    Collects rows from concurrent harvest tasks and writes them in batches.
+
+    Rows are coalesced per table and flushed when any table reaches
+    flush_size rows or the oldest buffered row is max_age seconds old.
+    Each flush writes comments, then domains, then mentions, so mention
+    rows may reference comment ids chosen by the caller (set "id" on the
+    comment rows) and domains by name (set "domain_name" instead of
+    "domain_id"). Those names are resolved through domain_cache when one is
+    given, so only uncached domains are upserted. Once max_pending rows are
+    buffered, producers wait until a flush makes room. Rows from a failed
+    flush are requeued and retried with exponential backoff; only rows the
+    database rejects as invalid are dropped.
+    """
+
+    TABLES = ("comment", "domain", "domain_mention")
+
+    # Seconds the flush loop waits after a failed flush, doubling per failure
+    RETRY_BASE_BACKOFF = 1.0
+    RETRY_MAX_BACKOFF = 30.0
+
+    def __init__(
+        self,
+        client: SupabaseClient,
+        flush_size: Optional[int] = None,
+        max_age: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        domain_cache: Optional[DomainIdCache] = None
+    ):
+        """
+        Initialize the buffer.
+
+        Args:
+            client: Database client used for flushes
+            flush_size: Rows in one table that trigger a flush
+            max_age: Seconds a row may wait before it is flushed
+            max_pending: Buffered rows across all tables before producers block
+            domain_cache: Name -> id cache for mentions by domain name (optional)
+        """
+        self.client = client
+        self.domain_cache = domain_cache
+        self.flush_size = flush_size or config.write_buffer_flush_size
+        self.max_age = max_age or config.write_buffer_max_age_seconds
+        self.max_pending = max_pending or config.write_buffer_max_pending
+
+        self._comments: List[Dict[str, Any]] = []
+        self._domains: Counter = Counter()          # counted mentions per domain
+        self._mentions: List[Dict[str, Any]] = []
+        self._oldest: Optional[float] = None
+
+        self._flush_requested = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._backoff = 0.0
+        self._retry_at: Optional[float] = None  # time.monotonic() of the next flush after a failure
+
+        self.flush_latency = {table: LatencyHistogram() for table in self.TABLES}
+        self.stats = {
+            table: {"flushes": 0, "rows": 0, "last_flush_size": 0, "max_flush_size": 0,
+                    "failures": 0, "dropped": 0, "duplicates": 0}
+            for table in self.TABLES
+        }
+        self.backpressure_waits = 0
+
+    @property
+    def pending(self) -> int:
+        """Rows currently buffered across all tables"""
+        return len(self._comments) + len(self._domains) + len(self._mentions)
+
+    def start(self):
+        """Start the background flush task"""
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+            logger.info("write_buffer_started",
+                       flush_size=self.flush_size,
+                       max_age=self.max_age,
+                       max_pending=self.max_pending)
+
+    async def add_comments(self, comments: Iterable[Dict[str, Any]]):
+        """Buffer comment rows for insertion"""
+        comments = list(comments)
+        await self._reserve(len(comments))
+        self._comments.extend(comments)
+        self._after_add(len(self._comments))
+
+    async def add_domains(self, domains: Iterable[str]):
+        """
+        Buffer domain sightings (one entry per mention) for a counted upsert
+
+        Sightings of a buffered domain only raise its count, so only new
+        domains take up room (pending counts distinct domains).
+        """
+        domains = list(domains)
+        await self._reserve(len(set(domains) - self._domains.keys()))
+        self._domains.update(domains)
+        self._after_add(len(self._domains))
+
+    async def add_mentions(self, mentions: Iterable[Dict[str, Any]]):
+        """
+        Buffer domain mention rows.
+
+        Rows carrying "domain_name" rather than "domain_id" have the domain
+        upserted and its id filled in at flush time. Their mention count is
+        left to the domain_mention trigger.
+        """
+        mentions = list(mentions)
+        await self._reserve(len(mentions))
+        self._mentions.extend(mentions)
+        self._after_add(len(self._mentions))
+
+    async def _reserve(self, rows: int):
+        """Wait until the buffer has room (a single oversized batch is let through)"""
+        if self._closing:
+            raise RuntimeError("write buffer is closed")
+
+        while self.pending and self.pending + rows > self.max_pending:
+            self.backpressure_waits += 1
+            if self._task is None:
+                # No background flusher running; make room directly
+                if self._retry_at is not None:
+                    await asyncio.sleep(max(0.0, self._retry_at - time.monotonic()))
+                await self.flush()
+                continue
+            self._space_available.clear()
+            self._flush_requested.set()
+            await self._space_available.wait()
+
+    def _after_add(self, table_rows: int):
+        """Track buffer age and request a flush at the size threshold"""
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if table_rows >= self.flush_size:
+            self._flush_requested.set()
+
+    async def _run(self):
+        """Flush on request or when the oldest row reaches max_age"""
+        while not self._closing:
+            if self._retry_at is not None:
+                delay = self._retry_at - time.monotonic()
+                if delay > 0:
+                    # After a failed flush, new rows and flush requests do not cut the backoff short
+                    self._flush_requested.clear()
+                    try:
+                        await asyncio.wait_for(self._flush_requested.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+            else:
+                timeout = self.max_age
+                if self._oldest is not None:
+                    timeout = max(0.0, self._oldest + self.max_age - time.monotonic())
+
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            if self.pending:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    logger.error("write_buffer_flush_loop_error", error=str(e))
+                    await asyncio.sleep(1)
+
+    async def flush(self):
+        """Write out everything currently buffered"""
+        async with self._flush_lock:
+            self._flush_requested.clear()
+            comments, self._comments = self._comments, []
+            domains, self._domains = self._domains, Counter()
+            mentions, self._mentions = self._mentions, []
+            self._oldest = None
+            self._retry_at = None
+
+            try:
+                if comments:
+                    inserted = await self._write("comment", comments, self.client.insert_comments)
+                    if inserted is None:
+                        self._requeue(comments, domains, mentions)
+                        return
+                    if isinstance(inserted, list):
+                        mentions = self._drop_duplicate_comments(comments, inserted, mentions)
+
+                mention_domains = [m["domain_name"] for m in mentions if "domain_id" not in m]
+                domain_ids = {}
+                if domains:
+                    written = await self._write(
+                        "domain", domains,
+                        lambda batch: self.client.upsert_domains(list(batch.elements()))
+                    )
+                    if written is None:
+                        self._requeue([], domains, mentions)
+                        return
+                if mention_domains:
+                    domain_ids = await self._write(
+                        "domain", mention_domains,
+                        self.domain_cache.resolve if self.domain_cache else
+                        lambda batch: self.client.upsert_domains(batch, count_mentions=False)
+                    )
+                    if domain_ids is None:
+                        self._requeue([], Counter(), mentions)
+                        return
+
+                if mentions:
+                    rows = self._resolve_mentions(mentions, domain_ids)
+                    if rows and await self._write("domain_mention", rows,
+                                                  self.client.insert_domain_mentions) is None:
+                        self._requeue([], Counter(), mentions)
+            finally:
+                if self._retry_at is None:
+                    self._backoff = 0.0
+                if self.pending < self.max_pending:
+                    self._space_available.set()
+
+    async def _write(self, table: str, rows, write) -> Optional[Any]:
+        """
+        Run one batched write, recording its size and latency.
+
+        Returns:
+            The write's result (True when it returned nothing), or None when
+            the rows should be requeued
+        """
+        started = time.monotonic()
+        stats = self.stats[table]
+        try:
+            result = await write(rows)
+        except Exception as e:
+            error = root_error(e)
+            stats["failures"] += 1
+            if is_payload_rejection(error):
+                # The rows themselves are rejected; retrying them cannot succeed
+                stats["dropped"] += len(rows)
+                logger.error("write_buffer_rows_rejected", table=table, rows=len(rows), error=str(error))
+                return {}
+            logger.error("write_buffer_flush_failed", table=table, rows=len(rows), error=str(error))
+            return None
+
+        elapsed = time.monotonic() - started
+        self.flush_latency[table].observe(elapsed)
+        stats["flushes"] += 1
+        stats["rows"] += len(rows)
+        stats["last_flush_size"] = len(rows)
+        stats["max_flush_size"] = max(stats["max_flush_size"], len(rows))
+        logger.debug("write_buffer_flushed", table=table, rows=len(rows), seconds=round(elapsed, 3))
+        return result if result is not None else True
+
+    def _drop_duplicate_comments(
+        self,
+        comments: List[Dict[str, Any]],
+        inserted: List[Dict[str, Any]],
+        mentions: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Drop mentions of comments the database skipped as already stored"""
+        inserted_ids = {str(row.get("id")) for row in inserted}
+        skipped = {str(comment["id"]) for comment in comments
+                   if "id" in comment and str(comment["id"]) not in inserted_ids}
+        if not skipped:
+            return mentions
+
+        self.stats["comment"]["duplicates"] += len(skipped)
+        return [mention for mention in mentions if str(mention.get("comment_id")) not in skipped]
+
+    def _resolve_mentions(self, mentions: List[Dict[str, Any]], domain_ids: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Replace domain_name with the upserted domain_id"""
+        rows = []
+        for mention in mentions:
+            if "domain_id" in mention:
+                rows.append(mention)
+                continue
+
+            row = dict(mention)
+            name = row.pop("domain_name")
+            normalized = DomainExtractor.normalize_domain(name)
+            domain_id = domain_ids.get(normalized)
+            if domain_id is None and normalized in domain_ids:
+                continue  # blocked domain, cached as such by domain_cache
+            if domain_id is None:
+                self.stats["domain_mention"]["dropped"] += 1
+                logger.warning("write_buffer_mention_domain_unresolved", domain=name)
+                continue
+            row["domain_id"] = domain_id
+            rows.append(row)
+        return rows
+
+    def _requeue(self, comments: List[Dict[str, Any]], domains: Counter, mentions: List[Dict[str, Any]]):
+        """Put rows from a failed flush back in front of newer rows and back off"""
+        self._comments[:0] = comments
+        self._domains.update(domains)
+        self._mentions[:0] = mentions
+        if self.pending and self._oldest is None:
+            self._oldest = time.monotonic()
+        self._backoff = min(max(self._backoff * 2, self.RETRY_BASE_BACKOFF), self.RETRY_MAX_BACKOFF)
+        self._retry_at = time.monotonic() + self._backoff
+
+    async def close(self):
+        """Stop the flush task and write out whatever is buffered"""
+        self._closing = True
+        self._flush_requested.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+        if self.pending:
+            await self.flush()
+        if self.pending:
+            logger.error("write_buffer_unflushed_on_close", rows=self.pending)
+        logger.info("write_buffer_closed")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, flush sizes and latencies for the /metrics endpoint"""
+        return {
+            "pending_rows": self.pending,
+            "queue_depth": {
+                "comment": len(self._comments),
+                "domain": len(self._domains),
+                "domain_mention": len(self._mentions)
+            },
+            "max_pending": self.max_pending,
+            "backpressure_waits": self.backpressure_waits,
+            "tables": {
+                table: {**self.stats[table], "latency": self.flush_latency[table].snapshot()}
+                for table in self.TABLES
+            }
+        }
+
+
+# Global write buffer instance
+write_buffer = WriteBuffer(db_client, domain_cache=domain_cache)